@@ -12,6 +12,7 @@ import uuid
 import logging
 from typing import Optional, Dict, Any
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
@@ -20,6 +21,7 @@ import uvicorn
 sys.path.append(os.path.abspath('.'))
 sys.path.append(os.path.abspath('./AGENT'))
 
+from core.Connections import ConnectionManager
 from core.Context import Context
 from AGENT.unit.general_code_check import general_code_check
 from AGENT.system.FUNCTION3 import process_student_solution
@@ -81,7 +83,8 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # 各请求共享的 Redis / RabbitMQ / MinIO 连接池的使用情况
+    return {"status": "healthy", "pools": ConnectionManager.shared().stats()}
 
 @app.post("/api/code-check", response_model=CodeCheckResponse)
 async def code_check(request: CodeCheckRequest):
@@ -91,9 +94,13 @@ async def code_check(request: CodeCheckRequest):
     try:
         logger.info(f"收到代码检查请求，代码长度: {len(request.code)}")
         
-        with Context(task_id=str(uuid.uuid4().hex)):
-            result = general_code_check(request.code, request.model)
-            
+        def run():
+            with Context.pooled().scope(str(uuid.uuid4().hex), priority="interactive", finish_on_exit=True):
+                return general_code_check(request.code, request.model)
+
+        # 分析流程内部会阻塞等待 .result()，放到线程池中执行，避免卡住事件循环
+        result = await run_in_threadpool(run)
+
         return CodeCheckResponse(
             status="success",
             result=result,
@@ -111,33 +118,37 @@ async def problem_analysis(request: ProblemAnalysisRequest):
     try:
         logger.info(f"收到题目分析请求，题目代码: {request.problem_code}")
 
-        with Context(task_id=str(uuid.uuid4().hex)):
-            # 1. 生成简化的数学形式题目描述
-            simplified_desc = generate_problem_simplified(
-                request.problem_description,
-                "deepseek/deepseek-chat"
-            )
-
-            # 2. 生成边缘测试用例
-            edge_cases = generate_edge_cases(
-                simplified_desc,
-                "deepseek/deepseek-chat"
-            )
-
-            # 3. 生成可能的错误类型
-            possible_errors = generate_possible_errors(
-                simplified_desc,
-                "deepseek/deepseek-chat"
-            )
-
-            result = {
-                "problem_code": request.problem_code,
-                "simplified_description": simplified_desc,
-                "edge_cases": edge_cases,
-                "possible_errors": possible_errors,
-                "solutions": [],  # 解法生成功能待实现
-                "std_code": None  # 标准代码生成功能待实现
-            }
+        def run():
+            with Context.pooled().scope(str(uuid.uuid4().hex), priority="interactive", finish_on_exit=True):
+                # 1. 生成简化的数学形式题目描述
+                simplified_desc = generate_problem_simplified(
+                    request.problem_description,
+                    "deepseek/deepseek-chat"
+                )
+
+                # 2. 生成边缘测试用例
+                edge_cases = generate_edge_cases(
+                    simplified_desc,
+                    "deepseek/deepseek-chat"
+                )
+
+                # 3. 生成可能的错误类型
+                possible_errors = generate_possible_errors(
+                    simplified_desc,
+                    "deepseek/deepseek-chat"
+                )
+
+                result = {
+                    "problem_code": request.problem_code,
+                    "simplified_description": simplified_desc,
+                    "edge_cases": edge_cases,
+                    "possible_errors": possible_errors,
+                    "solutions": [],  # 解法生成功能待实现
+                    "std_code": None  # 标准代码生成功能待实现
+                }
+            return result
+
+        result = await run_in_threadpool(run)
 
         return ProblemAnalysisResponse(
             status="success",
@@ -156,19 +167,22 @@ async def student_code_analysis(request: StudentCodeAnalysisRequest):
     try:
         logger.info(f"收到学生代码分析请求，题目ID: {request.problem_id}")
         
-        with Context(task_id=str(uuid.uuid4().hex)):
-            # 注意：这里需要session参数，但原函数需要requests.Session
-            import requests
-            session = requests.Session()
-
-            result = process_student_solution(
-                problem_id=request.problem_id,
-                student_code=request.student_code,
-                problem_desc=request.problem_description,
-                session=session,
-                submission_history=request.submission_history
-            )
-            
+        def run():
+            with Context.pooled().scope(str(uuid.uuid4().hex), priority="interactive", finish_on_exit=True):
+                # 注意：这里需要session参数，但原函数需要requests.Session
+                import requests
+                session = requests.Session()
+
+                return process_student_solution(
+                    problem_id=request.problem_id,
+                    student_code=request.student_code,
+                    problem_desc=request.problem_description,
+                    session=session,
+                    submission_history=request.submission_history
+                )
+
+        result = await run_in_threadpool(run)
+
         return StudentCodeAnalysisResponse(
             status="success",
             result=result,
@@ -1,13 +1,27 @@
 import os
 import requests
 from core.Computable import Computable
+from core.Retry import RetryPolicy, transient_errors
 from typing import Union, List
 from dotenv import load_dotenv
 
 
+class _Unavailable(Exception):
+    """嵌入服务限流（429）或暂时不可用（5xx）。"""
+
+
+def _retryable_errors():
+    return transient_errors() + (requests.exceptions.ConnectionError, requests.exceptions.Timeout, _Unavailable)
+
+
 class Embedding(Computable):
     """Generate embeddings for text."""
 
+    queue_class = "llm"
+    memoize = True
+    # 同一输入的嵌入不变，可以安全重试：连接失败、超时、限流与服务端错误按指数退避重试
+    retry = RetryPolicy(max_attempts=4, base_delay=1.0, retry_on=_retryable_errors)
+
     def __init__(self):
         super().__init__()
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,6 +40,9 @@ class Embedding(Computable):
 
         Returns:
             A list of float vectors or ``None`` if the request fails.
+
+        Raises:
+            Connection errors, timeouts, 429 and 5xx responses, which Runner retries.
         """
         
         headers = {
@@ -61,6 +78,14 @@ class Embedding(Computable):
             else:
                 return None
                 
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            # 交给 Runner 按 retry 策略重试
+            raise
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and (e.response.status_code == 429 or e.response.status_code >= 500):
+                raise _Unavailable(f"API请求失败: {e}") from e
+            print(f"API请求失败: {e}")
+            return None
         except requests.exceptions.RequestException as e:
             print(f"API请求失败: {e}")
             return None
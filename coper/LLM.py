@@ -1,7 +1,7 @@
 from core.Computable import Computable
+from core.Retry import RetryPolicy, transient_errors
 from dotenv import load_dotenv
 import os
-import litellm
 from typing import Optional, Union, Type
 from pydantic import BaseModel, Field, create_model
 
@@ -16,6 +16,18 @@ type_mapping = {
 }
 
 
+def _retryable_errors():
+    # litellm 导入耗时数秒，只在 Runner 第一次判断是否重试时导入
+    import litellm
+    return transient_errors() + (
+        litellm.RateLimitError,
+        litellm.APIConnectionError,
+        litellm.Timeout,
+        litellm.InternalServerError,
+        litellm.ServiceUnavailableError,
+    )
+
+
 def restore_model_from_schema(schema: dict) -> type[BaseModel]:
     """
     根据JSON Schema恢复Pydantic模型
@@ -65,6 +77,12 @@ class LLMOutput(BaseModel):
 class LLM(Computable):
     """LLM operator based on LiteLLM."""
 
+    queue_class = "llm"
+    # 相同模型、提示词的调用跨任务复用结果；需要新采样时用 Context(memo_bypass=True)
+    memoize = True
+    # 限流、连接失败与服务端错误按指数退避重试
+    retry = RetryPolicy(max_attempts=5, base_delay=2.0, retry_on=_retryable_errors)
+
     """
     基于LiteLLM封装的LLM调用类。
 
@@ -116,6 +134,7 @@ class LLM(Computable):
             A dictionary representation of :class:`LLMResponse`.
         """
         # 调用litellm接口
+        import litellm
         response = litellm.completion(
             model=self.model,
             api_key=self.api_key,
@@ -148,6 +167,7 @@ class LLM(Computable):
         """
 
         # 调用litellm接口
+        import litellm
         response = litellm.completion(
             model=self.model,
             api_key=self.api_key,
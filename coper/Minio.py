@@ -1,12 +1,9 @@
 from io import BytesIO
 
-from minio import S3Error
-
 from core.Computable import Computable
 from typing import Optional, Union
 import base64
 import os
-from minio.deleteobjects import DeleteObject
 
 def get_image_mime_type(file_path):
     ext = os.path.splitext(file_path)[1].lower()
@@ -32,6 +29,9 @@ class Minio(Computable):
 
     def delete_bucket(self, bucket: str) -> str:
         """Delete a bucket in Minio."""
+        # minio（及其依赖的 urllib3）在用到时才导入，import coper.Minio 不加载它们
+        from minio.deleteobjects import DeleteObject
+
         if self.minio.bucket_exists(bucket):
             objects = self.minio.list_objects(bucket, recursive=True)
             delete_list = [DeleteObject(obj.object_name) for obj in objects]
@@ -61,6 +61,7 @@ class Minio(Computable):
 
     def read(self, bucket: str, object_name: str, output_format: str='bytes') -> Optional[Union[bytes, str]]:
         """Read data from Minio and return it."""
+        from minio import S3Error
 
         try:
             self.minio.stat_object(bucket, object_name)
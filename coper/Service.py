@@ -1,8 +1,6 @@
 import json
 import uuid
 
-import pika
-
 from core.Computable import Computable
 from core.Utils import serialize
 
@@ -10,9 +8,23 @@ from core.Utils import serialize
 class Service(Computable):
     """Invoke a remote service."""
 
+    # 调用方线程会阻塞到服务返回；沙箱调用单独成类，避免占满其他服务的 Runner
+    queue_classes = {
+        "code-sandbox": "sandbox-client",
+        "interactive-sandbox": "sandbox-client",
+    }
+    queue_class = "service-client"
+    # 结果只取决于请求参数的服务，跨任务缓存结果。code-sandbox 不在其中：参数只是 MinIO 对象名，
+    # 同名对象的内容可能已更新，且调用会把 output_file 写回 MinIO，命中缓存会跳过这一步
+    memoized_services = frozenset()
+    # 等待响应期间检查任务是否已取消 / 超时的间隔（秒）
+    cancel_poll_interval = 1
+
     def __init__(self, service_id):
         super().__init__(service_id)
         self.service_id = service_id
+        self.queue_class = self.queue_classes.get(service_id, Service.queue_class)
+        self.memoize = service_id in self.memoized_services
 
 
     def compute(self, *args, **kwargs) -> object:
@@ -27,16 +39,15 @@ class Service(Computable):
             'kwargs': kwargs,
         }
 
-        self.ch.basic_publish(
-            exchange='',
-            routing_key=f"service.request.{self.service_id}",
-            body=serialize(request)[0],
-            properties=pika.BasicProperties(
-                delivery_mode=2
-            )
-        )
+        self.ctx.publish(serialize(request)[0], routing_key=f"service.request.{self.service_id}")
 
-        _, res = self.redis.blpop([return_queue])
+        while True:
+            item = self.redis.blpop([return_queue], timeout=self.cancel_poll_interval)
+            if item is not None:
+                break
+            # 任务已取消或超过 deadline 时放弃等待，抛出 TaskCancelled
+            self.ctx.check_cancelled()
+        _, res = item
         self.redis.delete(return_queue)
         response = json.loads(res)
         if response['status'] == 'error':
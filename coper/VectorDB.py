@@ -1,32 +1,32 @@
-from pymilvus import (
-    FieldSchema, CollectionSchema, DataType,
-    Collection, utility
-)
 from typing import Optional
 from core.Computable import Computable
+from core.Connections import connect_milvus
 
 
 
 class VectorDBOperations:
     def __init__(self):
-        pass
+        # pymilvus 导入较慢，只在执行向量库操作时导入并连接 Milvus
+        import pymilvus
+        connect_milvus()
+        self.milvus = pymilvus
 
     def create_collection(self, collection_name: str, dimension: int):
-        if utility.has_collection(collection_name, using="agent_vectorDB"):
+        if self.milvus.utility.has_collection(collection_name, using="agent_vectorDB"):
             print(f"[WARNING] Collection '{collection_name}' 已存在，跳过创建")
             return
-        id_field = FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True)
-        vec_field = FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dimension)
-        content_field = FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=10240)
-        label_field = FieldSchema(name="label", dtype=DataType.VARCHAR, max_length=1024)
+        id_field = self.milvus.FieldSchema(name="id", dtype=self.milvus.DataType.INT64, is_primary=True, auto_id=True)
+        vec_field = self.milvus.FieldSchema(name="embedding", dtype=self.milvus.DataType.FLOAT_VECTOR, dim=dimension)
+        content_field = self.milvus.FieldSchema(name="content", dtype=self.milvus.DataType.VARCHAR, max_length=10240)
+        label_field = self.milvus.FieldSchema(name="label", dtype=self.milvus.DataType.VARCHAR, max_length=1024)
 
-        schema = CollectionSchema(fields=[id_field, vec_field, content_field, label_field])
-        Collection(name=collection_name, schema=schema, using="agent_vectorDB")
+        schema = self.milvus.CollectionSchema(fields=[id_field, vec_field, content_field, label_field])
+        self.milvus.Collection(name=collection_name, schema=schema, using="agent_vectorDB")
         print(f"[INFO] Collection '{collection_name}' 创建成功，向量维度 = {dimension}")
 
     def drop_collection(self, collection_name: str):
-        if utility.has_collection(collection_name, using="agent_vectorDB"):
-            utility.drop_collection(collection_name, using="agent_vectorDB")
+        if self.milvus.utility.has_collection(collection_name, using="agent_vectorDB"):
+            self.milvus.utility.drop_collection(collection_name, using="agent_vectorDB")
             print(f"[INFO] Collection '{collection_name}' 已删除")
         else:
             print(f"[WARNING] Collection '{collection_name}' 不存在，无法删除")
@@ -38,12 +38,12 @@ class VectorDBOperations:
                 "params": {"nlist": 128},
                 "metric_type": "L2"
             }
-        collection = Collection(name=collection_name, using="agent_vectorDB")
+        collection = self.milvus.Collection(name=collection_name, using="agent_vectorDB")
         collection.create_index(field_name="embedding", index_params=index_params)
         print(f"[INFO] Collection '{collection_name}' 向量字段 'embedding' 已创建索引：{index_params}")
 
     def insert_vector(self, collection_name: str, vectors: list, contents: list, labels: Optional[list] = None, partition_name: str = "_default"):
-        collection = Collection(name=collection_name, using="agent_vectorDB")
+        collection = self.milvus.Collection(name=collection_name, using="agent_vectorDB")
         if partition_name != "_default":
             if partition_name not in [p.name for p in collection.partitions]:
                 collection.create_partition(partition_name)
@@ -59,7 +59,7 @@ class VectorDBOperations:
         return list(ids)
 
     def search_vector(self, collection_name: str, query_vector: list, top_k: int = 3, partition_name: str = "_default", expr: Optional[str] = None):
-        collection = Collection(name=collection_name, using="agent_vectorDB")
+        collection = self.milvus.Collection(name=collection_name, using="agent_vectorDB")
         collection.load(partition_names=[partition_name])
         search_params = {"metric_type": "L2", "params": {"nprobe": 10}}
 
@@ -77,7 +77,7 @@ class VectorDBOperations:
 
 
     def delete_vector(self, collection_name: str, vector_id: int):
-        collection = Collection(name=collection_name, using="agent_vectorDB")
+        collection = self.milvus.Collection(name=collection_name, using="agent_vectorDB")
         collection.delete(f"id in [{vector_id}]")
         collection.flush()
         print(f"[INFO] 已请求删除 ID = {vector_id} 的向量记录")
@@ -88,7 +88,8 @@ class VectorDB(Computable):
 
     def __init__(self):
         super().__init__()
-        self.vector_db = VectorDBOperations()
+        # 提交方也会构造算子实例，连接推迟到第一次 compute
+        self.vector_db = None
 
     def compute(self, function_name: str, **kwargs) -> object:
         """Dispatch to the underlying vector database operations.
@@ -100,6 +101,8 @@ class VectorDB(Computable):
         Returns:
             The result returned by the operation.
         """
+        if self.vector_db is None:
+            self.vector_db = VectorDBOperations()
         # 操作路由字典
         operation_map = {
             "create_collection": self.vector_db.create_collection,
@@ -1,3 +1,6 @@
+import functools
+import operator
+
 from core.Computable import Computable
 from pydantic import BaseModel, Field
 
@@ -15,8 +18,14 @@ class BasicOutput(BaseModel):
     result: object = Field(..., description="operation result")
 
 
+class CpuOp(Computable):
+    """Base class of the basic_ops: cheap pure-Python computations routed to the ``cpu`` queue class."""
+
+    queue_class = "cpu"
+
+
 # Arithmetic operations
-class Add(Computable):
+class Add(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x + y"
@@ -25,7 +34,7 @@ class Add(Computable):
         return x + y
 
 
-class Subtract(Computable):
+class Subtract(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x - y"
@@ -34,7 +43,7 @@ class Subtract(Computable):
         return x - y
 
 
-class Multiply(Computable):
+class Multiply(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x * y"
@@ -47,7 +56,7 @@ class Mul(Multiply):
     pass
 
 
-class Divide(Computable):
+class Divide(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x / y"
@@ -56,7 +65,7 @@ class Divide(Computable):
         return x / y
 
 
-class FloorDivide(Computable):
+class FloorDivide(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x // y"
@@ -65,7 +74,7 @@ class FloorDivide(Computable):
         return x // y
 
 
-class Modulo(Computable):
+class Modulo(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x % y"
@@ -74,7 +83,7 @@ class Modulo(Computable):
         return x % y
 
 
-class Power(Computable):
+class Power(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x ** y"
@@ -84,7 +93,7 @@ class Power(Computable):
 
 
 # Bitwise operations
-class BitwiseAnd(Computable):
+class BitwiseAnd(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x & y"
@@ -93,7 +102,7 @@ class BitwiseAnd(Computable):
         return x & y
 
 
-class BitwiseOr(Computable):
+class BitwiseOr(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x | y"
@@ -102,7 +111,7 @@ class BitwiseOr(Computable):
         return x | y
 
 
-class BitwiseXor(Computable):
+class BitwiseXor(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x ^ y"
@@ -111,7 +120,7 @@ class BitwiseXor(Computable):
         return x ^ y
 
 
-class LeftShift(Computable):
+class LeftShift(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x << y"
@@ -120,7 +129,7 @@ class LeftShift(Computable):
         return x << y
 
 
-class RightShift(Computable):
+class RightShift(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x >> y"
@@ -130,7 +139,7 @@ class RightShift(Computable):
 
 
 # Comparison operations
-class Equal(Computable):
+class Equal(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x == y"
@@ -139,7 +148,7 @@ class Equal(Computable):
         return x == y
 
 
-class NotEqual(Computable):
+class NotEqual(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x != y"
@@ -148,7 +157,7 @@ class NotEqual(Computable):
         return x != y
 
 
-class Less(Computable):
+class Less(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x < y"
@@ -157,7 +166,7 @@ class Less(Computable):
         return x < y
 
 
-class LessEqual(Computable):
+class LessEqual(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x <= y"
@@ -166,7 +175,7 @@ class LessEqual(Computable):
         return x <= y
 
 
-class Greater(Computable):
+class Greater(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x > y"
@@ -175,7 +184,7 @@ class Greater(Computable):
         return x > y
 
 
-class GreaterEqual(Computable):
+class GreaterEqual(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x >= y"
@@ -185,7 +194,7 @@ class GreaterEqual(Computable):
 
 
 # Logical operations
-class LogicalAnd(Computable):
+class LogicalAnd(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x and y"
@@ -194,7 +203,7 @@ class LogicalAnd(Computable):
         return x and y
 
 
-class LogicalOr(Computable):
+class LogicalOr(CpuOp):
     input_schema = BinaryInput
     output_schema = BasicOutput
     description = "Return x or y"
@@ -203,7 +212,7 @@ class LogicalOr(Computable):
         return x or y
 
 
-class LogicalNot(Computable):
+class LogicalNot(CpuOp):
     input_schema = UnaryInput
     output_schema = BasicOutput
     description = "Return not x"
@@ -213,7 +222,7 @@ class LogicalNot(Computable):
 
 
 # Unary operations
-class Negate(Computable):
+class Negate(CpuOp):
     input_schema = UnaryInput
     output_schema = BasicOutput
     description = "Return -x"
@@ -222,10 +231,48 @@ class Negate(Computable):
         return -x
 
 
-class Invert(Computable):
+class Invert(CpuOp):
     input_schema = UnaryInput
     output_schema = BasicOutput
     description = "Return bitwise inversion of x"
 
     def compute(self, x):
         return ~x
+
+
+# Aggregation
+class Sum(CpuOp):
+    output_schema = BasicOutput
+    description = "Return the sum of any number of values (e.g. as core.reduce(Sum(), results, arity=k))"
+
+    def compute(self, *values):
+        return functools.reduce(operator.add, values)
+
+
+# 可由 ComputableResult 运算符重载在客户端融合的纯算子
+PURE_OPS = frozenset({
+    "Add", "Subtract", "Multiply", "Divide", "FloorDivide", "Modulo", "Power",
+    "BitwiseAnd", "BitwiseOr", "BitwiseXor", "LeftShift", "RightShift",
+    "Equal", "NotEqual", "Less", "LessEqual", "Greater", "GreaterEqual",
+    "LogicalAnd", "LogicalOr", "LogicalNot", "Negate", "Invert",
+})
+
+
+class Fused(CpuOp):
+    description = "Evaluate a fused expression of pure basic_ops in one job"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ops = {}
+
+    def compute(self, program, *inputs):
+        # program 由 core.ComputableResult.Expression._compile 生成，按顺序执行，最后一条为结果
+        values = []
+        for op, operands in program:
+            instance = self._ops.get(op)
+            if instance is None:
+                if op not in PURE_OPS:
+                    raise ValueError(f"{op} is not a pure basic_op")
+                instance = self._ops[op] = globals()[op]()
+            values.append(instance.compute(*[inputs[i] if kind == "i" else values[i] for kind, i in operands]))
+        return values[-1]
@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+from collections import OrderedDict
+
+import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
+
+from core.Errors import PublishError
+
+
+class AsyncPublisher:
+    """
+    基于 pika ``AsyncioConnection`` 的 RabbitMQ 发布器，供 ``async with Context()`` 与
+    :class:`core.PublisherPool.PublisherPool` 使用。
+
+    连接与 channel 的回调都跑在当前事件循环上，发布不会阻塞 uvicorn 等异步服务。
+
+    ``confirm`` 为 True 时 channel 开启 publisher confirms，``publish`` 在 broker 确认后才返回
+    （持久化消息已写盘），被拒绝时抛出 :class:`core.Errors.PublishError`。broker 的一次 ack
+    可以确认多条消息（``multiple``），同时在途的发布共用确认的往返。
+
+    连接意外断开后按指数退避（``reconnect_delay`` 起，最长 ``max_reconnect_delay`` 秒）重连，
+    未确认的消息与断线期间的发布在重连后按原顺序重新发布（至少一次：Runner 收到已完成的节点时直接 ack，complete_task.lua 也不会重复完成同一节点）。
+    """
+
+    def __init__(self, parameters: pika.ConnectionParameters, confirm=True, reconnect_delay=0.5,
+                 max_reconnect_delay=30.0):
+        self.parameters = parameters
+        self.confirm = confirm
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._connection = None
+        self._channel = None
+        self._closed = None
+        self._closing = False
+        self._reconnecting = None
+        # delivery tag -> ((routing_key, body, properties), future)，按发布顺序；tag 随 channel 从 1 开始
+        self._unconfirmed = OrderedDict()
+        self._delivery_tag = 0
+        # 重连期间的发布
+        self._backlog = []
+        self.published = 0
+        self.confirmed = 0
+        self.nacked = 0
+        self.reconnects = 0
+
+    async def connect(self):
+        self._closing = False
+        await self._open()
+        return self
+
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        opened = loop.create_future()
+        closed = self._closed = loop.create_future()
+
+        def ready(channel):
+            if not opened.done():
+                opened.set_result(channel)
+
+        def on_channel_open(channel):
+            channel.add_on_close_callback(on_channel_close)
+            if self.confirm:
+                channel.confirm_delivery(ack_nack_callback=self._on_confirm, callback=lambda _frame: ready(channel))
+            else:
+                ready(channel)
+
+        def on_channel_close(_channel, reason):
+            # channel 被 broker 关闭时连接一起关闭，由 on_close 统一重连
+            connection = self._connection
+            if connection is not None and not connection.is_closed and not connection.is_closing:
+                connection.close()
+
+        def on_open(connection):
+            connection.channel(on_open_callback=on_channel_open)
+
+        def on_open_error(_connection, err):
+            if not opened.done():
+                opened.set_exception(ConnectionError(f"RabbitMQ connection failed: {err}"))
+
+        def on_close(_connection, reason):
+            was_open = opened.done() and opened.exception() is None
+            self._channel = None
+            if not opened.done():
+                opened.set_exception(ConnectionError(f"RabbitMQ connection closed: {reason}"))
+            if not closed.done():
+                closed.set_result(reason)
+            if was_open and not self._closing:
+                self._schedule_reconnect()
+
+        self._connection = AsyncioConnection(
+            self.parameters,
+            on_open_callback=on_open,
+            on_open_error_callback=on_open_error,
+            on_close_callback=on_close,
+            custom_ioloop=loop,
+        )
+        self._channel = await opened
+        self._delivery_tag = 0
+
+    def _schedule_reconnect(self):
+        if self._reconnecting is None or self._reconnecting.done():
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        # 未确认的消息无法知道是否已到达 broker，排在断线期间的发布之前重新发布
+        self._backlog[:0] = self._unconfirmed.values()
+        self._unconfirmed.clear()
+        delay = self.reconnect_delay
+        while not self._closing:
+            await asyncio.sleep(delay)
+            try:
+                await self._open()
+            except ConnectionError as e:
+                delay = min(delay * 2, self.max_reconnect_delay)
+                print(f"RabbitMQ 重连失败，{delay:.1f}s 后重试: {e}")
+                continue
+            self.reconnects += 1
+            backlog, self._backlog = self._backlog, []
+            for message, future in backlog:
+                if not future.done():
+                    self._send(message, future)
+            return
+
+    def _send(self, message, future):
+        routing_key, body, properties = message
+        self.channel.basic_publish(exchange='', routing_key=routing_key, body=body, properties=properties)
+        self.published += 1
+        if not self.confirm:
+            future.set_result(None)
+            return
+        self._delivery_tag += 1
+        self._unconfirmed[self._delivery_tag] = (message, future)
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = list(itertools.takewhile(lambda tag: tag <= method.delivery_tag, self._unconfirmed))
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            entry = self._unconfirmed.pop(tag, None)
+            if entry is None:
+                continue
+            (routing_key, _, _), future = entry
+            if acked:
+                self.confirmed += 1
+            else:
+                self.nacked += 1
+            if future.done():
+                continue
+            if acked:
+                future.set_result(None)
+            else:
+                future.set_exception(PublishError(f"RabbitMQ rejected a message published to {routing_key}"))
+
+    async def queue_declare(self, queue: str, durable: bool = True):
+        declared = asyncio.get_running_loop().create_future()
+        self.channel.queue_declare(
+            queue=queue,
+            durable=durable,
+            callback=lambda frame: declared.done() or declared.set_result(frame),
+        )
+        return await declared
+
+    async def publish(self, routing_key: str, body: bytes, properties: pika.BasicProperties = None):
+        """Publish ``body`` and wait until the broker confirms it (only until it is buffered without ``confirm``)."""
+        future = asyncio.get_running_loop().create_future()
+        message = (routing_key, body, properties or pika.BasicProperties(delivery_mode=2))
+        if self._reconnecting is not None and not self._reconnecting.done():
+            self._backlog.append((message, future))
+        else:
+            # basic_publish 只写入连接缓冲区，由事件循环负责发送
+            self._send(message, future)
+        await future
+
+    def stats(self):
+        return {
+            "open": self._channel is not None and self._channel.is_open,
+            "published": self.published,
+            "confirmed": self.confirmed,
+            "nacked": self.nacked,
+            "unconfirmed": len(self._unconfirmed) + len(self._backlog),
+            "reconnects": self.reconnects,
+        }
+
+    async def close(self):
+        self._closing = True
+        if self._reconnecting is not None and not self._reconnecting.done():
+            self._reconnecting.cancel()
+        pending = [future for _, future in self._backlog] + [future for _, future in self._unconfirmed.values()]
+        self._backlog, self._unconfirmed = [], OrderedDict()
+        for future in pending:
+            if not future.done():
+                future.set_exception(PublishError("publisher closed before the message was confirmed"))
+        if self._connection is None:
+            return
+        if not self._connection.is_closed and not self._connection.is_closing:
+            self._connection.close()
+        if self._closed is not None:
+            await self._closed
+        self._connection = None
+
+    @property
+    def channel(self):
+        if self._channel is None or not self._channel.is_open:
+            raise RuntimeError("RabbitMQ channel is not open. Use within `async with Context(...)`.")
+        return self._channel
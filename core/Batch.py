@@ -0,0 +1,77 @@
+class Batch:
+    """
+    批量提交模式，通过 ``with ctx.batch():`` 使用。
+
+    块内的 ``Computable.__call__`` 不再逐个访问 Redis / RabbitMQ：
+    exec_id 按段预分配（一次 INCRBY），节点定义先缓存在本地，
+    退出时用一次 ``init_task.lua`` 调用注册整个子图，再集中发布所有无依赖的任务。
+    返回的 ComputableResult 与普通提交完全一致；对块内句柄调用 ``.result()``
+    会先自动 flush。
+    """
+
+    def __init__(self, ctx, block_size=64):
+        self.ctx = ctx
+        self.block_size = block_size
+        self._pending = []
+        self._block_task = None
+        self._next_id = 0
+        self._end_id = 0
+        self._outer = None
+        self._nested = False
+
+    def alloc_exec_id(self, task_id):
+        """Hand out the next exec_id from the pre-allocated block of ``task_id``."""
+        if self._block_task != task_id or self._next_id >= self._end_id:
+            end = self.ctx.redis.incrby(f"runner-node-counter:{task_id}", self.block_size)
+            self._block_task = task_id
+            self._next_id = end - self.block_size + 1
+            self._end_id = end + 1
+        exec_id = self._next_id
+        self._next_id += 1
+        return exec_id
+
+    def add(self, task_id, exec_id, ser_bin_job, ser_str_job, dep, queue):
+        self._pending.append((task_id, exec_id, ser_bin_job, ser_str_job, dep, queue))
+
+    def flush(self):
+        """Register every buffered node and publish the ready ones."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        # 按 task 分组，每个 task 一次脚本调用；组内保持提交顺序
+        groups = {}
+        for item in pending:
+            groups.setdefault(item[0], []).append(item)
+
+        for task_id, items in groups.items():
+            args = []
+            for _, exec_id, _, ser_str_job, dep, queue in items:
+                args.extend([exec_id, ser_str_job, dep, queue])
+            dep_cnts = self.ctx.init_task(
+                keys=[f"runner-node:{task_id}", f"runner-node-waiters:{task_id}", "runner-tasks"],
+                args=args,
+            )
+            # 依赖为 0 的任务集中发布到 RabbitMQ，一起等待确认
+            self.ctx.submit_many(
+                (ser_bin_job, queue)
+                for (_, _, ser_bin_job, _, _, queue), dep_cnt in zip(items, dep_cnts) if dep_cnt == 0
+            )
+
+    def __enter__(self):
+        # 嵌套的 batch 并入外层，由最外层统一 flush
+        if self.ctx.current_batch is not None:
+            self._nested = True
+            return self.ctx.current_batch
+        self._outer = self.ctx.current_batch
+        self.ctx.current_batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._nested:
+            return
+        try:
+            # 即使块内抛出异常，也提交已创建的节点，与非批量模式保持一致
+            self.flush()
+        finally:
+            self.ctx.current_batch = self._outer
@@ -0,0 +1,170 @@
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+from core.Utils import deserialize, serialize
+
+
+class BlobRef:
+    """
+    大参数 / 结果的引用。
+
+    job 与结果列表中只保存摘要，真实内容按内容哈希存放在
+    ``runner-blob:{task_id}:{digest}``（或 MinIO 的 ``runner-blobs/{task_id}/{digest}``）。
+    """
+
+    __slots__ = ("digest", "size", "store")
+
+    def __init__(self, digest: str, size: int, store: str = "redis"):
+        self.digest = digest
+        self.size = size
+        self.store = store
+
+    def __repr__(self):
+        return f"<BlobRef {self.store}:{self.digest[:12]} size={self.size}>"
+
+
+class BlobStore:
+    """
+    按内容寻址的大对象存储。
+
+    ``intern`` 把超过 ``threshold`` 字节的 str / bytes 替换为 :class:`BlobRef`，
+    同一任务中重复出现的题面、学生代码、图片只写入一次；超过 ``minio_threshold``
+    的对象写入 MinIO。``get`` / ``resolve`` 取回内容，并在进程内按字节数做 LRU 缓存。
+    """
+
+    bucket = "runner-blobs"
+
+    def __init__(self, ctx, threshold=8192, minio_threshold=4 * 1024 * 1024, cache_bytes=64 * 1024 * 1024):
+        self.ctx = ctx
+        self.threshold = threshold
+        self.minio_threshold = minio_threshold
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._stored = OrderedDict()
+        self._bucket_ready = False
+        self._lock = threading.Lock()
+
+    def intern(self, task_id, obj):
+        """Replace large leaves of ``obj`` with :class:`BlobRef` and store them."""
+        if self.threshold <= 0:
+            return obj
+        pending = {}
+        obj = self._replace_large(obj, pending)
+        if pending:
+            self._store(task_id, pending)
+        return obj
+
+    def _replace_large(self, obj, pending):
+        if isinstance(obj, (str, bytes)) and len(obj) >= self.threshold:
+            packed = serialize(obj)[0]
+            digest = hashlib.sha256(packed).hexdigest()
+            store = "minio" if len(packed) >= self.minio_threshold else "redis"
+            pending[digest] = (packed, store)
+            self._remember(digest, obj)
+            return BlobRef(digest, len(packed), store)
+        if isinstance(obj, list):
+            return [self._replace_large(item, pending) for item in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._replace_large(item, pending) for item in obj)
+        if isinstance(obj, dict):
+            return {k: self._replace_large(v, pending) for k, v in obj.items()}
+        return obj
+
+    def _store(self, task_id, pending):
+        with self._lock:
+            todo = {d: v for d, v in pending.items() if (task_id, d) not in self._stored}
+        if not todo:
+            return
+
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        pipe.pttl(f"runner-node:{task_id}")
+        for digest, (packed, store) in todo.items():
+            if store == "minio":
+                self._put_minio(task_id, digest, packed)
+            else:
+                pipe.set(f"runner-blob:{task_id}:{digest}", packed.decode('latin1'), nx=True)
+            # 记录任务用到的 blob，便于随任务一起过期
+            pipe.sadd(f"runner-blob-index:{task_id}", f"{store}:{digest}")
+        pttl = pipe.execute()[0]
+        if pttl > 0:
+            # 任务已 finish（节点哈希带有过期时间）后才写入的 blob 沿用相同的剩余时间
+            self._expire(task_id, todo, pttl)
+
+        with self._lock:
+            for digest in todo:
+                self._stored[(task_id, digest)] = True
+            while len(self._stored) > 65536:
+                self._stored.popitem(last=False)
+
+    def _expire(self, task_id, blobs, pttl):
+        pipe = self.ctx.redis.pipeline(transaction=False)
+        for digest, (_, store) in blobs.items():
+            if store == "minio":
+                # 交给 Retention.sweep 清理；gt 保留更晚的到期时间
+                pipe.zadd("runner-tasks-minio-gc", {task_id: time.time() + pttl / 1000}, gt=True)
+            else:
+                pipe.pexpire(f"runner-blob:{task_id}:{digest}", pttl)
+        pipe.pexpire(f"runner-blob-index:{task_id}", pttl)
+        pipe.execute()
+
+    def _put_minio(self, task_id, digest, packed):
+        minio = self.ctx.minio
+        if not self._bucket_ready:
+            if not minio.bucket_exists(self.bucket):
+                minio.make_bucket(self.bucket)
+            self._bucket_ready = True
+        minio.put_object(self.bucket, f"{task_id}/{digest}", io.BytesIO(packed), len(packed))
+
+    def get(self, task_id, ref: BlobRef):
+        """Return the value behind ``ref``."""
+        with self._lock:
+            if ref.digest in self._cache:
+                self._cache.move_to_end(ref.digest)
+                return self._cache[ref.digest]
+
+        if ref.store == "minio":
+            response = self.ctx.minio.get_object(self.bucket, f"{task_id}/{ref.digest}")
+            try:
+                packed = response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        else:
+            raw = self.ctx.redis.get(f"runner-blob:{task_id}:{ref.digest}")
+            if raw is None:
+                raise KeyError(f"Blob {ref.digest} of task {task_id} is missing")
+            packed = raw.encode('latin1')
+
+        value = deserialize(packed)
+        self._remember(ref.digest, value)
+        return value
+
+    def resolve(self, task_id, obj):
+        """Replace every :class:`BlobRef` inside ``obj`` with its value."""
+        if isinstance(obj, BlobRef):
+            return self.get(task_id, obj)
+        if isinstance(obj, list):
+            return [self.resolve(task_id, item) for item in obj]
+        if isinstance(obj, tuple):
+            return tuple(self.resolve(task_id, item) for item in obj)
+        if isinstance(obj, dict):
+            return {k: self.resolve(task_id, v) for k, v in obj.items()}
+        return obj
+
+    def _remember(self, digest, value):
+        size = len(value)
+        if size > self.cache_bytes:
+            return
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return
+            self._cache[digest] = value
+            self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes:
+                _, old = self._cache.popitem(last=False)
+                self._cached_bytes -= len(old)
@@ -1,6 +1,7 @@
-import pika
+import itertools
 
-from core.ComputableResult import ComputableResult
+from core.ComputableResult import ComputableResult, Expression, iter_results
+from core.Retry import NO_RETRY
 from core.Context import get_context
 from core.Utils import serialize
 
@@ -11,6 +12,10 @@ class Computable:
     Subclasses should implement :meth:`compute` and provide ``input_schema``,
     ``output_schema`` and ``description`` to describe the operator. These can be
     defined as class attributes.
+
+    ``compute`` may be a generator: every chunk it yields is readable right away
+    through ``handle.stream()``, and the generator's ``return`` value is the result
+    (the list of chunks if it returns nothing).
     """
 
     #: Pydantic model describing the expected inputs of this computable.
@@ -22,11 +27,30 @@ class Computable:
     #: Human readable description of the computable's capability.
     description = ""
 
+    #: Whether Runner may reuse one instance across jobs with the same init arguments.
+    #: Set to ``False`` for operators that keep per-job state on ``self``.
+    poolable = True
+
+    #: Queue class the operator's jobs are routed to (``default``, ``cpu``, ``llm``,
+    #: ``sandbox-client``, ...). Runner processes are started for a set of classes,
+    #: so slow operators do not hold up cheap ones.
+    queue_class = "default"
+
+    #: Opt in to the cross-task result cache (:class:`core.Memo.Memo`): only for
+    #: deterministic operators whose result depends on nothing but their arguments.
+    #: ``None`` results are not cached, so a failure reported as ``None`` is retried.
+    memoize = False
+
+    #: Seconds a cached result stays valid; ``None`` uses ``MEMO_TTL``.
+    memo_ttl = None
+
+    #: Retry policy applied by Runner when ``compute`` (or fetching its arguments)
+    #: raises. A retry runs ``compute`` again, so the default is not to retry;
+    #: idempotent operators opt in with a :class:`core.Retry.RetryPolicy`.
+    retry = NO_RETRY
+
     def __init__(self, *args, **kwargs):
         self.ctx = get_context()
-        self.redis = self.ctx.redis
-        self.ch = self.ctx.channel
-        self.minio = self.ctx.minio
         self.init_args = args
         self.init_kwargs = kwargs
         # Copy class level descriptions so each instance carries them
@@ -34,58 +58,125 @@ class Computable:
         self.input_schema = getattr(self.__class__, 'input_schema', None)
         self.output_schema = getattr(self.__class__, 'output_schema', None)
 
-    def __call__(self, *args, **kwargs):
-        task_id = self.ctx.task
-        task_key = f"runner-node:{task_id}"
-        task_waiter_key = f"runner-node-waiters:{task_id}"
+    # 连接按需从 Context 获取：``async with Context()`` 中没有阻塞的 RabbitMQ channel
+    @property
+    def redis(self):
+        return self.ctx.redis
 
-        # 原子自增 exec_id
-        exec_id = self.redis.incr(f"runner-node-counter:{task_id}")
+    @property
+    def ch(self):
+        return self.ctx.channel
 
-        dep_list = []
+    @property
+    def minio(self):
+        return self.ctx.minio
 
-        def find_dep(obj):
-            if isinstance(obj, ComputableResult):
-                dep_list.append(obj.exec_id)
-            elif isinstance(obj, list) or isinstance(obj, tuple):
-                for item in obj:
-                    find_dep(item)
-            elif isinstance(obj, dict):
-                for k, v in obj.items():
-                    find_dep(k)
-                    find_dep(v)
-            return None
-
-        find_dep(args)
-        find_dep(kwargs)
+    def _build_job(self, task_id, exec_id, args, kwargs):
+        """Serialize a job and collect the exec_ids it depends on."""
+        dep_list = [handle.exec_id for handle in iter_results((args, kwargs))]
 
         job = {
             "exec_id": exec_id,
             "task_id": task_id,
             "task": f"{self.__class__.__module__}.{self.__class__.__name__}",
-            "args": args,
-            "kwargs": kwargs,
+            # 大参数只保留 BlobRef，由 Runner 执行前取回
+            "args": self.ctx.blobs.intern(task_id, args),
+            "kwargs": self.ctx.blobs.intern(task_id, kwargs),
             "init_args": self.init_args,
             "init_kwargs": self.init_kwargs,
+            # 子任务沿用提交方的优先级与租户
+            "priority": self.ctx.priority,
+            "tenant": self.ctx.tenant,
         }
+        if self.ctx.memo_bypass:
+            job["memo_bypass"] = True
+        if self.ctx.deadline is not None:
+            job["deadline"] = self.ctx.deadline
 
         dep = ",".join(str(dep) for dep in dep_list)
         ser_bin_job, ser_str_job = serialize(job)
+        return ser_bin_job, ser_str_job, dep
+
+    def __call__(self, *args, **kwargs):
+        # 惰性表达式作为参数时先提交，依赖的 exec_id 小于本节点
+        for handle in iter_results((args, kwargs)):
+            if isinstance(handle, Expression):
+                handle.materialize()
+
+        if self.ctx.local is not None:
+            # 本地模式：在进程内注册并执行，不经过 Redis / RabbitMQ
+            return self.ctx.local.submit(self, args, kwargs)
+
+        task_id = self.ctx.task
+        task_key = f"runner-node:{task_id}"
+        task_waiter_key = f"runner-node-waiters:{task_id}"
+        batch = self.ctx.current_batch
+
+        # 原子自增 exec_id（批量模式下从预分配的 id 段中取）
+        if batch is not None:
+            exec_id = batch.alloc_exec_id(task_id)
+        else:
+            exec_id = self.redis.incr(f"runner-node-counter:{task_id}")
+
+        ser_bin_job, ser_str_job, dep = self._build_job(task_id, exec_id, args, kwargs)
+        queue = self.ctx.queue_name(self.queue_class)
+
+        if batch is not None:
+            # 批量模式：延迟到 batch flush 时统一注册、发布
+            batch.add(task_id, exec_id, ser_bin_job, ser_str_job, dep, queue)
+            return ComputableResult(exec_id)
 
         # 原子写入状态、依赖、job
-        dep_cnt = self.ctx.init_task(keys=[task_key, task_waiter_key], args=[exec_id, ser_str_job, dep])
+        dep_cnt = self.ctx.init_task(
+            keys=[task_key, task_waiter_key, "runner-tasks"], args=[exec_id, ser_str_job, dep, queue]
+        )[0]
+
+        # 依赖为 0 时，直接发布到算子所属的队列
+        if dep_cnt == 0:
+            self.ctx.submit(ser_bin_job, queue)
+
+        return ComputableResult(exec_id)
+
+    async def acall(self, *args, **kwargs):
+        """Asyncio counterpart of :meth:`__call__`, for use within ``async with Context()``."""
+        for handle in iter_results((args, kwargs)):
+            if isinstance(handle, Expression):
+                await handle.amaterialize()
+        if self.ctx.local is not None:
+            return self.ctx.local.submit(self, args, kwargs)
+        task_id = self.ctx.task
+        task_key = f"runner-node:{task_id}"
+        task_waiter_key = f"runner-node-waiters:{task_id}"
+
+        exec_id = await self.ctx.aredis.incr(f"runner-node-counter:{task_id}")
+        ser_bin_job, ser_str_job, dep = self._build_job(task_id, exec_id, args, kwargs)
+        queue = self.ctx.queue_name(self.queue_class)
 
-        # 依赖为 0 时，直接发布到 RabbitMQ
+        dep_cnt = (await self.ctx.ainit_task(
+            keys=[task_key, task_waiter_key, "runner-tasks"], args=[exec_id, ser_str_job, dep, queue]
+        ))[0]
         if dep_cnt == 0:
-            self.ch.basic_publish(
-                exchange='',
-                routing_key=self.ctx.queue,
-                body=ser_bin_job,
-                properties=pika.BasicProperties(delivery_mode=2)
-            )
+            await self.ctx.asubmit(ser_bin_job, queue)
 
         return ComputableResult(exec_id)
 
+    def map(self, *iterables, chunk_size=256):
+        """
+        ``[op(*args) for args in zip(*iterables)]`` as a batched fan-out: every ``chunk_size``
+        nodes take one exec_id block, one ``init_task`` call and one confirmed publish batch.
+        Returns the handles in input order; collect them with ``core.gather`` / ``core.reduce``.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        handles = []
+        args_iter = zip(*iterables)
+        while True:
+            chunk = list(itertools.islice(args_iter, chunk_size))
+            if not chunk:
+                return handles
+            # 位于外层 batch 中时并入外层，由外层统一提交
+            with self.ctx.batch(block_size=len(chunk)):
+                handles.extend(self(*args) for args in chunk)
 
     def compute(self, *args, **kwargs):
         raise NotImplementedError("compute must return a value or raise")
@@ -1,43 +1,202 @@
-import json
+import time
+
 from core.Context import get_context
+from core.Errors import TaskCancelled, UpstreamError
 from core.Utils import deserialize
 
+# 秒；节点结束但没有追加 end 条目时（不产出 chunk、被级联失败等），stream() 最多这么久后发现
+STREAM_POLL_INTERVAL = 1.0
+# 每次 XREAD 最多读取的条目数
+STREAM_READ_COUNT = 256
+
 
 # 逻辑非运算（不能重载 not，提供方法代替）
 def logical_not(self):
-    from coper.basic_ops import LogicalNot
-    return LogicalNot()(self)
+    return Expression("LogicalNot", (self,))
 
 # 显式逻辑与/或（不能重载 and/or）
 def logical_and(self, other):
-    from coper.basic_ops import LogicalAnd
-    return LogicalAnd()(self, other)
+    return Expression("LogicalAnd", (self, other))
 
 def logical_or(self, other):
-    from coper.basic_ops import LogicalOr
-    return LogicalOr()(self, other)
+    return Expression("LogicalOr", (self, other))
 
 
 class ComputableResult:
     """
     任务结果句柄，提供同步 .result() 方法阻塞获取或抛出异常。
+    在 ``async with Context()`` 中可直接 ``await handle`` 获取结果。
+    ``result(timeout=...)`` 超过 ``timeout`` 秒仍未完成时抛出 TimeoutError，任务本身不受影响。
+    依赖失败而被级联置为 ERROR 的节点抛出 UpstreamError，任务被取消的节点抛出 TaskCancelled。
+    ``stream()`` / ``astream()`` 逐个产出生成器算子 ``yield`` 的部分结果。
     """
 
     def __init__(self, exec_id: int):
         self.exec_id = exec_id
-        self.ctx = get_context()
-
-    def result(self):
+        self._ctx = None
+
+    @property
+    def ctx(self):
+        # 首次使用时才绑定 Context，解码 job 不需要处于 Context 中
+        if self._ctx is None:
+            self._ctx = get_context()
+        return self._ctx
+
+    def result(self, timeout=None):
+        if self.ctx.local is not None:
+            return self._unpack(self.ctx.task, *self.ctx.local.wait(self.ctx.task, self.exec_id, timeout))
+        # 句柄可能还在批量缓冲区中，先提交
+        if self.ctx.current_batch is not None:
+            self.ctx.current_batch.flush()
+        task_id = self.ctx.task
+        cached = self.ctx.cached_result(task_id, self.exec_id)
+        if cached is None:
+            r = self.ctx.redis
+            res_list_name = f"runner-node-result:{task_id}:{self.exec_id}"
+            # BLMOVE 到自身：阻塞直到结果写入且不会把它取走，与 HGET 合并为一次往返
+            pipe = r.pipeline(transaction=False)
+            pipe.blmove(res_list_name, res_list_name, timeout or 0, "LEFT", "LEFT")
+            pipe.hget(f"runner-node:{task_id}", f"state:{self.exec_id}")
+            res, state = pipe.execute()
+            if res is None:
+                raise TimeoutError(f"Result {self.exec_id} not ready after {timeout}s")
+            self.ctx.cache_result(task_id, self.exec_id, state, res)
+            cached = (state, res)
+        return self._unpack(task_id, *cached)
+
+    async def aresult(self, timeout=None):
+        """Asyncio counterpart of :meth:`result`; ``await handle`` is equivalent."""
         task_id = self.ctx.task
+        if self.ctx.local is not None:
+            import asyncio
+            state, res = await asyncio.to_thread(self.ctx.local.wait, task_id, self.exec_id, timeout)
+            return self._unpack(task_id, state, res)
+        cached = self.ctx.cached_result(task_id, self.exec_id)
+        if cached is None:
+            r = self.ctx.aredis
+            res_list_name = f"runner-node-result:{task_id}:{self.exec_id}"
+            async with r.pipeline(transaction=False) as pipe:
+                pipe.blmove(res_list_name, res_list_name, timeout or 0, "LEFT", "LEFT")
+                pipe.hget(f"runner-node:{task_id}", f"state:{self.exec_id}")
+                res, state = await pipe.execute()
+            if res is None:
+                raise TimeoutError(f"Result {self.exec_id} not ready after {timeout}s")
+            self.ctx.cache_result(task_id, self.exec_id, state, res)
+            cached = (state, res)
+        return self._unpack(task_id, *cached)
+
+    def __await__(self):
+        return self.aresult().__await__()
+
+    def stream(self, timeout=None):
+        """
+        逐个产出算子 ``yield`` 的 chunk，节点结束后停止；任意时刻开始读取都从第一个 chunk 开始。
+        返回了其他句柄（inner）的节点读完自身的 chunk 后接着产出 inner 的 chunk。
+        节点失败时读完已有的 chunk 后抛出与 ``result()`` 相同的异常；
+        不产出 chunk 的算子只等待结束。超过 ``timeout`` 秒仍未结束时抛出 TimeoutError。
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        task_id = self.ctx.task
+        exec_id = self.exec_id
+        if self.ctx.local is not None:
+            start = 0
+            while True:
+                chunks, done, inner = self.ctx.local.read_stream(task_id, exec_id, start, deadline)
+                start += len(chunks)
+                for raw in chunks:
+                    yield deserialize(raw)
+                if chunks or not done:
+                    continue
+                if inner is None:
+                    break
+                exec_id, start = inner, 0
+            self.result()
+            return
+        if self.ctx.current_batch is not None:
+            self.ctx.current_batch.flush()
         r = self.ctx.redis
-        res_list_name = f"runner-node-result:{task_id}:{self.exec_id}"
-        _, res = r.blpop([res_list_name])
-        r.rpush(res_list_name, res)
-
+        last = "0-0"
+        while True:
+            state, inner = r.hmget(f"runner-node:{task_id}", f"state:{exec_id}", f"inner:{exec_id}")
+            # chunk 都在 complete_task 之前写入：已结束（或已交给 inner）的节点读到空即读完
+            done = state in ("FINISHED", "ERROR") or inner is not None
+            entries = r.xread(
+                {f"runner-node-stream:{task_id}:{exec_id}": last},
+                count=STREAM_READ_COUNT,
+                block=None if done else self._stream_block(deadline, timeout),
+            )
+            for _, messages in entries or []:
+                for last, fields in messages:
+                    if "chunk" in fields:
+                        yield deserialize(fields["chunk"])
+            if entries or not done:
+                continue
+            if inner is None:
+                break
+            exec_id, last = int(inner), "0-0"
+        self.result()
+
+    async def astream(self, timeout=None):
+        """Asyncio counterpart of :meth:`stream`: ``async for chunk in handle.astream(): ...``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        task_id = self.ctx.task
+        exec_id = self.exec_id
+        if self.ctx.local is not None:
+            import asyncio
+            start = 0
+            while True:
+                chunks, done, inner = await asyncio.to_thread(
+                    self.ctx.local.read_stream, task_id, exec_id, start, deadline
+                )
+                start += len(chunks)
+                for raw in chunks:
+                    yield deserialize(raw)
+                if chunks or not done:
+                    continue
+                if inner is None:
+                    break
+                exec_id, start = inner, 0
+            await self.aresult()
+            return
+        r = self.ctx.aredis
+        last = "0-0"
+        while True:
+            state, inner = await r.hmget(f"runner-node:{task_id}", f"state:{exec_id}", f"inner:{exec_id}")
+            done = state in ("FINISHED", "ERROR") or inner is not None
+            entries = await r.xread(
+                {f"runner-node-stream:{task_id}:{exec_id}": last},
+                count=STREAM_READ_COUNT,
+                block=None if done else self._stream_block(deadline, timeout),
+            )
+            for _, messages in entries or []:
+                for last, fields in messages:
+                    if "chunk" in fields:
+                        yield deserialize(fields["chunk"])
+            if entries or not done:
+                continue
+            if inner is None:
+                break
+            exec_id, last = int(inner), "0-0"
+        await self.aresult()
+
+    def _stream_block(self, deadline, timeout):
+        # XREAD 的 BLOCK 毫秒数；0 表示永久阻塞，至少取 1
+        wait = STREAM_POLL_INTERVAL
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Result {self.exec_id} not finished after {timeout}s")
+            wait = min(wait, remaining)
+        return max(int(wait * 1000), 1)
+
+    def _unpack(self, task_id, state, res):
         res = deserialize(res)
-        state = r.hget(f"runner-node:{task_id}", f"state:{self.exec_id}")
         if state == "FINISHED":
-            return res
+            return self.ctx.blobs.resolve(task_id, res)
+        if isinstance(res, dict) and "upstream" in res:
+            raise UpstreamError(res)
+        if isinstance(res, dict) and "cancelled" in res:
+            raise TaskCancelled(res)
 
         raise Exception(res)
 
@@ -46,146 +205,329 @@ class ComputableResult:
 
     def __setstate__(self, state):
         self.exec_id = state["exec_id"]
-        self.ctx = get_context()
+        self._ctx = None
 
     def __repr__(self):
         return f"<Result id={self.exec_id}>"
 
     # 二元运算符
     def __add__(self, other):
-        from coper.basic_ops import Add
-        return Add()(self, other)
+        return Expression("Add", (self, other))
 
     def __radd__(self, other):
-        from coper.basic_ops import Add
-        return Add()(other, self)
+        return Expression("Add", (other, self))
 
     def __sub__(self, other):
-        from coper.basic_ops import Subtract
-        return Subtract()(self, other)
+        return Expression("Subtract", (self, other))
 
     def __rsub__(self, other):
-        from coper.basic_ops import Subtract
-        return Subtract()(other, self)
+        return Expression("Subtract", (other, self))
 
     def __mul__(self, other):
-        from coper.basic_ops import Multiply
-        return Multiply()(self, other)
+        return Expression("Multiply", (self, other))
 
     def __rmul__(self, other):
-        from coper.basic_ops import Multiply
-        return Multiply()(other, self)
+        return Expression("Multiply", (other, self))
 
     def __truediv__(self, other):
-        from coper.basic_ops import Divide
-        return Divide()(self, other)
+        return Expression("Divide", (self, other))
 
     def __rtruediv__(self, other):
-        from coper.basic_ops import Divide
-        return Divide()(other, self)
+        return Expression("Divide", (other, self))
 
     def __floordiv__(self, other):
-        from coper.basic_ops import FloorDivide
-        return FloorDivide()(self, other)
+        return Expression("FloorDivide", (self, other))
 
     def __rfloordiv__(self, other):
-        from coper.basic_ops import FloorDivide
-        return FloorDivide()(other, self)
+        return Expression("FloorDivide", (other, self))
 
     def __mod__(self, other):
-        from coper.basic_ops import Modulo
-        return Modulo()(self, other)
+        return Expression("Modulo", (self, other))
 
     def __rmod__(self, other):
-        from coper.basic_ops import Modulo
-        return Modulo()(other, self)
+        return Expression("Modulo", (other, self))
 
     def __pow__(self, other):
-        from coper.basic_ops import Power
-        return Power()(self, other)
+        return Expression("Power", (self, other))
 
     def __rpow__(self, other):
-        from coper.basic_ops import Power
-        return Power()(other, self)
+        return Expression("Power", (other, self))
 
     def __and__(self, other):
-        from coper.basic_ops import BitwiseAnd
-        return BitwiseAnd()(self, other)
+        return Expression("BitwiseAnd", (self, other))
 
     def __rand__(self, other):
-        from coper.basic_ops import BitwiseAnd
-        return BitwiseAnd()(other, self)
+        return Expression("BitwiseAnd", (other, self))
 
     def __or__(self, other):
-        from coper.basic_ops import BitwiseOr
-        return BitwiseOr()(self, other)
+        return Expression("BitwiseOr", (self, other))
 
     def __ror__(self, other):
-        from coper.basic_ops import BitwiseOr
-        return BitwiseOr()(other, self)
+        return Expression("BitwiseOr", (other, self))
 
     def __xor__(self, other):
-        from coper.basic_ops import BitwiseXor
-        return BitwiseXor()(self, other)
+        return Expression("BitwiseXor", (self, other))
 
     def __rxor__(self, other):
-        from coper.basic_ops import BitwiseXor
-        return BitwiseXor()(other, self)
+        return Expression("BitwiseXor", (other, self))
 
     def __lshift__(self, other):
-        from coper.basic_ops import LeftShift
-        return LeftShift()(self, other)
+        return Expression("LeftShift", (self, other))
 
     def __rlshift__(self, other):
-        from coper.basic_ops import LeftShift
-        return LeftShift()(other, self)
+        return Expression("LeftShift", (other, self))
 
     def __rshift__(self, other):
-        from coper.basic_ops import RightShift
-        return RightShift()(self, other)
+        return Expression("RightShift", (self, other))
 
     def __rrshift__(self, other):
-        from coper.basic_ops import RightShift
-        return RightShift()(other, self)
+        return Expression("RightShift", (other, self))
 
     def __eq__(self, other):
-        from coper.basic_ops import Equal
-        return Equal()(self, other)
+        return Expression("Equal", (self, other))
 
     def __ne__(self, other):
-        from coper.basic_ops import NotEqual
-        return NotEqual()(self, other)
+        return Expression("NotEqual", (self, other))
 
     def __lt__(self, other):
-        from coper.basic_ops import Less
-        return Less()(self, other)
+        return Expression("Less", (self, other))
 
     def __le__(self, other):
-        from coper.basic_ops import LessEqual
-        return LessEqual()(self, other)
+        return Expression("LessEqual", (self, other))
 
     def __gt__(self, other):
-        from coper.basic_ops import Greater
-        return Greater()(self, other)
+        return Expression("Greater", (self, other))
 
     def __ge__(self, other):
-        from coper.basic_ops import GreaterEqual
-        return GreaterEqual()(self, other)
+        return Expression("GreaterEqual", (self, other))
 
     # 一元运算符
     def __neg__(self):
-        from coper.basic_ops import Negate
-        return Negate()(self)
+        return Expression("Negate", (self,))
 
     def __invert__(self):
-        from coper.basic_ops import Invert
-        return Invert()(self)
+        return Expression("Invert", (self,))
 
     def __bool__(self):
         raise TypeError("Cannot use ComputableResult in boolean context")
 
 
+class Expression(ComputableResult):
+    """
+    运算符重载产生的惰性表达式，在客户端累积 ``coper.basic_ops`` 纯算子组成的表达式树。
+
+    首次需要 exec_id 时才提交：取结果（``.result()`` / ``await`` / ``as_completed`` / ``gather``）、
+    作为参数传给其他算子、或被序列化。只有一个算子的表达式按原算子提交，多个算子融合为
+    一个 ``basic_ops.Fused`` job，在同一个 Runner 中按相同顺序调用各算子的 ``compute``，
+    出错时的异常信息与逐个提交时失败节点的一致。同一子表达式在树中只计算一次，
+    已提交的表达式作为普通句柄参与后续运算。
+
+    ``async with Context()`` 中请 ``await`` 表达式或传给 ``acall``，不要在事件循环中同步提交。
+    """
+
+    def __init__(self, op, operands):
+        self.op = op
+        self.operands = operands
+        self._handle = None
+        self._ctx = None
+
+    @property
+    def exec_id(self):
+        return self.materialize().exec_id
+
+    def materialize(self):
+        """Submit the expression (once) and return the handle of its job."""
+        if self._handle is None:
+            op, args = self._job()
+            self._handle = op(*args)
+        return self._handle
+
+    async def amaterialize(self):
+        if self._handle is None:
+            op, args = self._job()
+            self._handle = await op.acall(*args)
+        return self._handle
+
+    async def aresult(self, timeout=None):
+        await self.amaterialize()
+        return await super().aresult(timeout)
+
+    def _job(self):
+        from coper import basic_ops
+
+        program, inputs = self._compile()
+        if len(program) == 1:
+            return getattr(basic_ops, self.op)(), self.operands
+        return basic_ops.Fused(), [program, *inputs]
+
+    def _compile(self):
+        """
+        Flatten the tree into ``(program, inputs)`` for ``Fused``: each instruction is
+        ``[op, operands]`` with operands ``["i", k]`` (``inputs[k]``) or ``["t", j]``
+        (result of instruction ``j``); the last instruction is the root.
+        """
+        program, inputs = [], []
+        temps, handles = {}, {}
+        # 后序遍历（非递归，长链不会超出递归深度）
+        stack = [(self, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in temps:
+                continue
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((o, False) for o in reversed(node.operands) if _is_lazy(o) and id(o) not in temps)
+                continue
+            refs = []
+            for operand in node.operands:
+                if _is_lazy(operand):
+                    refs.append(["t", temps[id(operand)]])
+                elif isinstance(operand, ComputableResult):
+                    # 同一个句柄只作为一个输入
+                    if id(operand) not in handles:
+                        handles[id(operand)] = len(inputs)
+                        inputs.append(operand)
+                    refs.append(["i", handles[id(operand)]])
+                else:
+                    refs.append(["i", len(inputs)])
+                    inputs.append(operand)
+            temps[id(node)] = len(program)
+            program.append([node.op, refs])
+        return program, inputs
+
+    def __reduce__(self):
+        # 序列化前先提交，反序列化后即为普通句柄
+        return ComputableResult, (self.exec_id,)
+
+    def __repr__(self):
+        if self._handle is None:
+            return f"<Expression {self.op} (pending)>"
+        return f"<Result id={self._handle.exec_id}>"
+
+
+def _is_lazy(obj):
+    return isinstance(obj, Expression) and obj._handle is None
+
+
+def iter_results(obj):
+    """Yield every ComputableResult nested in ``obj`` (lists, tuples, dict keys and values)."""
+    if isinstance(obj, ComputableResult):
+        yield obj
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            yield from iter_results(item)
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            yield from iter_results(k)
+            yield from iter_results(v)
+
+
 # 将逻辑方法绑定到 ComputableResult
 ComputableResult.logical_not = logical_not
 ComputableResult.logical_and = logical_and
 ComputableResult.logical_or = logical_or
+
+
+def _fetch_finished(ctx, task_id, exec_ids):
+    """Fetch whichever of ``exec_ids`` have finished in one pipelined round trip."""
+    pipe = ctx.redis.pipeline(transaction=False)
+    for exec_id in exec_ids:
+        pipe.lindex(f"runner-node-result:{task_id}:{exec_id}", 0)
+        pipe.hget(f"runner-node:{task_id}", f"state:{exec_id}")
+    values = pipe.execute()
+
+    finished = []
+    for i, exec_id in enumerate(exec_ids):
+        raw, state = values[2 * i], values[2 * i + 1]
+        if raw is not None and state in ("FINISHED", "ERROR"):
+            ctx.cache_result(task_id, exec_id, state, raw)
+            finished.append(exec_id)
+    return finished
+
+
+def as_completed(results, timeout=None):
+    """
+    按完成顺序逐个产出 ``results`` 中的句柄，之后对其调用 ``.result()`` 不再访问 Redis。
+
+    先订阅 ``runner-node-done:{task_id}`` 完成通知，再用一次流水线读取已完成的结果，
+    之后每收到一批通知只读取对应的节点。超过 ``timeout`` 秒仍有未完成的句柄时抛出 TimeoutError。
+    """
+    ctx = get_context()
+    if ctx.current_batch is not None:
+        ctx.current_batch.flush()
+    task_id = ctx.task
+
+    pending = {}
+    for handle in results:
+        if ctx.local is None and ctx.cached_result(task_id, handle.exec_id) is not None:
+            yield handle
+        else:
+            pending.setdefault(handle.exec_id, []).append(handle)
+    if not pending:
+        return
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if ctx.local is not None:
+        # 本地模式：直接等待内存中的节点状态
+        while pending:
+            done = ctx.local.wait_any(task_id, list(pending), deadline)
+            if not done:
+                raise TimeoutError(f"{len(pending)} results not ready after {timeout}s")
+            for exec_id in done:
+                for handle in pending.pop(exec_id):
+                    yield handle
+        return
+    with ctx.redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+        # 先订阅再读取，避免漏掉两者之间完成的节点
+        pubsub.subscribe(f"runner-node-done:{task_id}")
+        ready = list(pending)
+        while True:
+            for exec_id in _fetch_finished(ctx, task_id, ready):
+                for handle in pending.pop(exec_id):
+                    yield handle
+            if not pending:
+                return
+
+            ready = []
+            while not ready:
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        raise TimeoutError(f"{len(pending)} results not ready after {timeout}s")
+                message = pubsub.get_message(timeout=wait)
+                while message is not None:
+                    exec_id = int(message["data"])
+                    if exec_id in pending and exec_id not in ready:
+                        ready.append(exec_id)
+                    message = pubsub.get_message(timeout=0)
+
+
+def gather(*results, timeout=None):
+    """Wait for all ``results`` at once and return their values in order."""
+    for _ in as_completed(results, timeout=timeout):
+        pass
+    return [handle.result() for handle in results]
+
+
+def reduce(fn, results, arity=2):
+    """
+    在 Runner 上归约 ``results``（句柄或普通值）：相邻的 ``arity`` 个一组交给算子 ``fn``，
+    逐层构建平衡的归约树，返回根节点的句柄，调用方不取回中间结果。
+
+    树深为 ``ceil(log_arity(n))``，同一层的节点并行执行；整棵树在一个 batch 中提交。
+    ``fn`` 需满足结合律，组内保持输入顺序；每层最后一组不足 ``arity`` 个时以较少的参数调用，
+    只剩一个时直接进入下一层。只有一个元素时原样返回。
+    """
+    if arity < 2:
+        raise ValueError(f"arity must be at least 2, got {arity}")
+    level = list(results)
+    if not level:
+        raise TypeError("reduce() of empty sequence")
+    with get_context().batch():
+        while len(level) > 1:
+            level = [
+                fn(*group) if len(group) > 1 else group[0]
+                for group in (level[i:i + arity] for i in range(0, len(level), arity))
+            ]
+    return level[0]
@@ -0,0 +1,160 @@
+import functools
+import os
+import threading
+import time
+import urllib.parse
+
+from core.PublisherPool import PublisherPool
+
+# pika / redis / minio / pymilvus 在第一次建立连接时才导入，见 core.startup_bench
+
+
+# core 目录下的 Lua 脚本，连接 Redis 时注册为 Context 的同名属性（ctx.init_task(...) 等）
+LUA_SCRIPTS = ("init_task", "complete_task", "fail_task", "expire_task", "retry_due", "cancel_task")
+
+
+@functools.lru_cache(maxsize=None)
+def lua_source(name):
+    with open(os.path.join(os.path.dirname(__file__), f"{name}.lua"), 'r', encoding="utf8") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def remote_config():
+    """
+    读取 ``middleware/.env`` 并返回各中间件的连接参数（每个进程只读一次）::
+
+        {"redis_url", "amqp_para", "minio_endpoint", "minio_user", "minio_pass"}
+    """
+    import pika
+    from dotenv import load_dotenv
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    load_dotenv(dotenv_path=os.path.join(base_dir, 'middleware', '.env'))
+    header_address = os.getenv("HEADER_ADDRESS")
+    redis_pass = urllib.parse.quote(os.getenv("REDIS_PASSWORD"), safe='')
+    credentials = pika.PlainCredentials(
+        username=os.getenv("RABBITMQ_USER"),
+        password=os.getenv("RABBITMQ_PASSWORD"),
+    )
+    return {
+        "redis_url": f"redis://:{redis_pass}@{header_address}:{os.getenv('REDIS_PORT')}/1",
+        "amqp_para": pika.ConnectionParameters(
+            host=header_address,
+            port=int(os.getenv("RABBITMQ_PORT")),
+            virtual_host="/",
+            credentials=credentials,
+        ),
+        "minio_endpoint": f"{header_address}:{os.getenv('MINIO_API_PORT')}",
+        "minio_user": os.getenv("MINIO_ROOT_USER"),
+        "minio_pass": os.getenv("MINIO_ROOT_PASSWORD"),
+    }
+
+
+_milvus_lock = threading.Lock()
+_milvus_pid = None
+
+
+def connect_milvus():
+    """Connect the ``agent_vectorDB`` Milvus alias once per process (on first use by ``coper.VectorDB``)."""
+    global _milvus_pid
+    with _milvus_lock:
+        if _milvus_pid == os.getpid():
+            return
+        from pymilvus import connections
+
+        remote_config()
+        connections.connect(
+            alias="agent_vectorDB",
+            host=os.getenv("HEADER_ADDRESS"),
+            port=os.getenv("MILVUS_PORT")
+        )
+        _milvus_pid = os.getpid()
+
+
+class ConnectionManager:
+    """
+    进程级共享的中间件连接，只在第一次使用时建立：
+
+    - Redis：``BlockingConnectionPool``，最多 ``REDIS_POOL_SIZE`` 条连接，Lua 脚本只注册一次；
+    - RabbitMQ：:class:`core.PublisherPool.PublisherPool`，``RABBITMQ_POOL_SIZE`` 条带 publisher confirms 的连接；
+    - MinIO：客户端线程安全，底层 urllib3 连接池大小为 ``MINIO_POOL_SIZE``。
+
+    借不到 Redis 连接时等待 ``POOL_TIMEOUT`` 秒。``ConnectionManager.shared()`` 返回当前进程的实例
+    （fork 出的子进程会重新建立），``stats()`` 返回各连接池的使用情况。
+    每个请求通过 ``Context.pooled().scope(task_id=...)`` 只设置任务相关的 ContextVar。
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, redis_pool_size=None, rabbitmq_pool_size=None, minio_pool_size=None, timeout=None):
+        import certifi
+        import redis
+        import urllib3
+        from minio import Minio
+
+        config = remote_config()
+        self.pid = os.getpid()
+        self.timeout = float(os.getenv("POOL_TIMEOUT", "10")) if timeout is None else timeout
+        self.redis_pool_size = redis_pool_size or int(os.getenv("REDIS_POOL_SIZE", "64"))
+        self.rabbitmq_pool_size = rabbitmq_pool_size or int(os.getenv("RABBITMQ_POOL_SIZE", "4"))
+        self.minio_pool_size = minio_pool_size or int(os.getenv("MINIO_POOL_SIZE", "16"))
+
+        self.redis_pool = redis.BlockingConnectionPool.from_url(
+            config["redis_url"], max_connections=self.redis_pool_size, timeout=self.timeout, decode_responses=True
+        )
+        self.redis = redis.Redis(connection_pool=self.redis_pool)
+        self.scripts = {name: self.redis.register_script(lua_source(name)) for name in LUA_SCRIPTS}
+        self.publishers = PublisherPool(config["amqp_para"], self.rabbitmq_pool_size)
+        # 与 Minio 默认的 http_client 相同，只调整连接池大小
+        self._minio_http = urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=300, read=300),
+            maxsize=self.minio_pool_size,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+            retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+        )
+        self.minio = Minio(
+            config["minio_endpoint"],
+            access_key=config["minio_user"],
+            secret_key=config["minio_pass"],
+            secure=False,
+            http_client=self._minio_http,
+        )
+        self._context = None
+        self._context_lock = threading.Lock()
+        self.created_at = time.time()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None or cls._shared.pid != os.getpid():
+                cls._shared = cls()
+            return cls._shared
+
+    def context(self):
+        """The process-wide :class:`core.Context.Context` bound to these connections."""
+        with self._context_lock:
+            if self._context is None:
+                from core.Context import Context
+                self._context = Context(connections=self).bind()
+            return self._context
+
+    def stats(self):
+        pool = self.redis_pool
+        idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        created = len(pool._connections)
+        minio_open = sum(
+            p.num_connections for p in (self._minio_http.pools[key] for key in self._minio_http.pools.keys())
+        )
+        return {
+            "redis": {"size": self.redis_pool_size, "open": created, "in_use": created - idle, "idle": idle},
+            "rabbitmq": self.publishers.stats(),
+            "minio": {"size": self.minio_pool_size, "opened": minio_open},
+        }
+
+    def close(self):
+        self.publishers.close()
+        self.redis_pool.disconnect()
+        self._minio_http.clear()
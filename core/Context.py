@@ -1,79 +1,161 @@
 import os
-import urllib.parse
-from pymilvus import connections
-import redis
-import pika
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import contextvars
-from dotenv import load_dotenv
-from minio import Minio
+
+from core.Batch import Batch
+from core.BlobStore import BlobStore
+from core.Connections import LUA_SCRIPTS, ConnectionManager, lua_source, remote_config
+from core.Errors import TaskCancelled
+from core.FairScheduler import FairScheduler
+from core.LaneScheduler import LANES
+from core.PublisherPool import PublisherPool
+from core.Retention import Retention
+from core.Utils import deserialize, serialize
+
+# redis / pika / minio 在建立连接时才导入（见 core.startup_bench），本地模式与只做序列化的进程不需要它们
 
 # Global ContextVar for storing the current execution context
 _current_ctx = contextvars.ContextVar("current_execution_context")
 
+# 内置的队列类别，算子通过 ``queue_class`` 选择；队列在首次发布 / 消费时声明
+QUEUE_CLASSES = ("default", "cpu", "llm", "sandbox-client", "service-client")
+
 
 class Context:
     """
     Manages Redis and RabbitMQ connections.
     Establishes connections when entering the context and closes RabbitMQ connection on exit,
     resetting the global ContextVar.
+
+    ``async with Context(...)`` sets up asyncio clients (``redis.asyncio`` and
+    :class:`core.AsyncPublisher.AsyncPublisher`) instead of the blocking RabbitMQ
+    connection, for use with ``await op.acall(...)`` and ``await result``.
+
+    With ``finish_on_exit`` set, leaving the context calls :meth:`finish_task`, so the
+    task's Redis keys expire ``TASK_RETENTION`` seconds later.
+
+    ``priority`` (``interactive``, ``default`` or ``batch``) is carried by every job the
+    task creates, including jobs submitted from inside operators, and selects the
+    RabbitMQ lane the jobs are published to.
+
+    ``tenant`` groups tasks for fair-share scheduling (default: the task itself). With
+    ``FAIR_SCHEDULING=1`` ready jobs go through :class:`core.FairScheduler.FairScheduler`
+    instead of straight to RabbitMQ.
+
+    ``memo_bypass=True`` makes the task's operators skip cached results of
+    ``memoize`` operators (fresh results still refresh the cache).
+
+    ``deadline`` (seconds from now) is carried by every job of the task like
+    ``priority``. Runner fails jobs dequeued after the deadline without running them
+    and cancels the rest of the task; :meth:`cancel` does the same on demand.
+    Long-running operators call :meth:`check_cancelled` to stop early.
+
+    ``mode="local"`` connects to nothing: the graph runs on an in-process thread pool
+    (:class:`core.LocalExecutor.LocalExecutor`, ``LOCAL_THREADS`` workers) with the same
+    dependency and ``finish_pointer`` semantics as Runner. Operators that talk to Redis,
+    RabbitMQ or MinIO themselves (e.g. ``Service``) are not available in this mode.
+
+    ``Context.pooled()`` returns the process-wide context on the shared connection pools
+    of :class:`core.Connections.ConnectionManager`; servers enter
+    ``Context.pooled().scope(task_id=...)`` per request instead of building a Context,
+    which only sets the task's ContextVars.
+
+    Jobs are published through :class:`core.PublisherPool.PublisherPool` (``ctx.publishers``)
+    rather than the consuming channel, so any thread may submit; :meth:`submit` returns
+    once RabbitMQ has confirmed the job.
     """
 
-    def __init__(self, task_id=None):
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        env_path = os.path.join(base_dir, 'middleware', '.env')
-        load_dotenv(dotenv_path=env_path)
-        header_address = os.getenv("HEADER_ADDRESS")
-        redis_port = os.getenv("REDIS_PORT")
-        redis_pass = urllib.parse.quote(os.getenv("REDIS_PASSWORD"), safe='')
-        rabbitmq_port = os.getenv("RABBITMQ_PORT")
-        rabbitmq_user = os.getenv("RABBITMQ_USER")
-        rabbitmq_pass = os.getenv("RABBITMQ_PASSWORD")
-        minio_port = os.getenv("MINIO_API_PORT")
-        minio_user = os.getenv("MINIO_ROOT_USER")
-        minio_pass = os.getenv("MINIO_ROOT_PASSWORD")
-        # Connect to Milvus VectorDB
-        connections.connect(
-            alias="agent_vectorDB",
-            host=os.getenv("HEADER_ADDRESS"),
-            port=os.getenv("MILVUS_PORT")
-        )
-        self.redis_url = f"redis://:{redis_pass}@{header_address}:{redis_port}/1"
-        credentials = pika.PlainCredentials(
-            username=rabbitmq_user,
-            password=rabbitmq_pass,
-        )
-        self.amqp_para = pika.ConnectionParameters(
-            host=header_address,
-            port=int(rabbitmq_port),
-            virtual_host="/",
-            credentials=credentials,
-        )
+    def __init__(self, task_id=None, finish_on_exit=False, priority="default", tenant=None, memo_bypass=False,
+                 mode="distributed", deadline=None, connections=None):
+        if priority not in LANES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {LANES}")
+        if mode not in ("distributed", "local"):
+            raise ValueError(f"Unknown mode {mode!r}, expected 'distributed' or 'local'")
+        self.mode = mode
+        self.connections = connections
+        self.redis_url = None
+        self.amqp_para = None
+        self.minio_endpoint = None
+        self.minio_user = None
+        self.minio_pass = None
+        if mode == "distributed":
+            self._load_remote_config()
         self.queue = "runner_task_queue"
+        self._declared_queues = set()
         self._redis = None
         self._connection = None
         self._channel = None
         self._minio = None
+        # 进入 Context 后 MinIO 客户端在第一次使用时创建
+        self._minio_enabled = False
+        self._aredis = None
+        self._publisher = None
+        # 同步发布（线程安全，带 publisher confirms），连接在第一次发布时建立
+        self._publishers = PublisherPool(self.amqp_para) if mode == "distributed" and connections is None else None
         self._token = None
-        self.task_id = task_id
+        # task_id 存在 ContextVar 中：Runner 的工作线程、asyncio 任务各自独立设置，互不覆盖
+        self._task_var = contextvars.ContextVar(f"task_id:{id(self)}", default=task_id)
+        self._priority_var = contextvars.ContextVar(f"priority:{id(self)}", default=priority)
+        self._tenant_var = contextvars.ContextVar(f"tenant:{id(self)}", default=tenant)
+        self._memo_bypass_var = contextvars.ContextVar(f"memo_bypass:{id(self)}", default=memo_bypass)
+        # 绝对时间（epoch 秒）
+        self._deadline_var = contextvars.ContextVar(
+            f"deadline:{id(self)}", default=None if deadline is None else time.time() + deadline
+        )
+        self.fair_scheduling = os.getenv("FAIR_SCHEDULING", "0") == "1"
         self.init_task = None
+        self.ainit_task = None
+        self.complete_task = None
+        self.expire_task = None
+        self.cancel_task = None
+        self._batch_var = contextvars.ContextVar(f"batch:{id(self)}", default=None)
+        self.local = None
+        self.finish_on_exit = finish_on_exit
+        # 任务结束后其 Redis key 的保留时间、未结束任务被回收前的最长存活时间
+        self.retention = Retention(self)
+        # 本地结果缓存：(task_id, exec_id) -> (state, 序列化结果)，已完成的结果只从 Redis 取一次
+        self.result_cache_size = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+        # 超过阈值的参数 / 结果按内容哈希存放，job 中只保留引用（本地模式不需要）
+        self.blobs = BlobStore(
+            self,
+            threshold=int(os.getenv("BLOB_THRESHOLD", "8192")) if mode == "distributed" else 0,
+            minio_threshold=int(os.getenv("BLOB_MINIO_THRESHOLD", str(4 * 1024 * 1024))),
+        )
 
-        self.minio_endpoint = f"{header_address}:{minio_port}"
-        self.minio_user = minio_user
-        self.minio_pass = minio_pass
+    def _load_remote_config(self):
+        # .env 每个进程只读取一次；Milvus 由 coper.VectorDB 在第一次使用时连接
+        config = remote_config()
+        self.redis_url = config["redis_url"]
+        self.amqp_para = config["amqp_para"]
+        self.minio_endpoint = config["minio_endpoint"]
+        self.minio_user = config["minio_user"]
+        self.minio_pass = config["minio_pass"]
 
-        init_task_lua_path = os.path.join(os.path.dirname(__file__), "init_task.lua")
-        with open(init_task_lua_path, 'r', encoding="utf8") as _f:
-            self._init_task_lua = _f.read()
+    def _connect_redis(self):
+        if self.connections is not None:
+            # 共享连接池与已注册的脚本
+            self._redis = self.connections.redis
+            for name in LUA_SCRIPTS:
+                setattr(self, name, self.connections.scripts[name])
+            return
+        import redis
 
-    def __enter__(self):
         # Establish Redis connection
         self._redis = redis.Redis.from_url(self.redis_url, decode_responses=True)
-        self.init_task = self.redis.register_script(self._init_task_lua)
-        # Establish RabbitMQ connection and channel
-        self._connection = pika.BlockingConnection(self.amqp_para)
-        self._channel = self._connection.channel()
-        # Ensure the queue exists and is durable
-        self._channel.queue_declare(queue=self.queue, durable=True)
+        for name in LUA_SCRIPTS:
+            setattr(self, name, self.redis.register_script(lua_source(name)))
+
+    def _connect_minio(self):
+        if self.connections is not None:
+            self._minio = self.connections.minio
+            return
+        from minio import Minio
+
         # Establish Minio client
         self._minio = Minio(
             self.minio_endpoint,
@@ -82,43 +164,194 @@ class Context:
             secure=False,
         )
 
+    @classmethod
+    def pooled(cls):
+        """The process-wide Context on :meth:`ConnectionManager.shared` connections."""
+        return ConnectionManager.shared().context()
+
+    def bind(self):
+        """Attach the shared connections without entering the context (``connections`` must be set)."""
+        self._connect_redis()
+        self._minio_enabled = True
+        return self
+
+    def __enter__(self):
+        if self.mode == "local":
+            return self._enter_local()
+        if self.connections is not None:
+            # 连接与发布器由 ConnectionManager 持有
+            self.bind()
+            self._token = _current_ctx.set(self)
+            return self
+        self._connect_redis()
+        # Establish RabbitMQ connection and channel
+        import pika
+
+        self._connection = pika.BlockingConnection(self.amqp_para)
+        self._channel = self._connection.channel()
+        # Ensure the default queue exists and is durable
+        self.declare_queue(self.queue)
+        self._minio_enabled = True
+
         # Set this context as the current one
         self._token = _current_ctx.set(self)
         return self
 
+    def _enter_local(self):
+        from core.LocalExecutor import LocalExecutor
+        self._token = _current_ctx.set(self)
+        self.local = LocalExecutor(self, threads=int(os.getenv("LOCAL_THREADS", "8")))
+        self.local.start()
+        return self
+
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.local is not None:
+            self.local.shutdown()
+            self.local = None
+            _current_ctx.reset(self._token)
+            return
+        if self.finish_on_exit and self.task_id is not None:
+            self.finish_task()
         # Reset ContextVar
         _current_ctx.reset(self._token)
-        # Close RabbitMQ connection
+        if self.connections is not None:
+            return
+        # Close RabbitMQ connections
+        self._publishers.close()
         if self._connection and not self._connection.is_closed:
             self._connection.close()
         # Redis client manages connection pool automatically
         self._minio = None
+        self._minio_enabled = False
+
+    async def __aenter__(self):
+        if self.mode == "local":
+            return self._enter_local()
+        # 同步 Redis 客户端按需建连，保留给同步 .result() 等调用
+        self._connect_redis()
+        import redis.asyncio as aioredis
+        from core.AsyncPublisher import AsyncPublisher
+
+        self._aredis = aioredis.Redis.from_url(self.redis_url, decode_responses=True)
+        self.ainit_task = self._aredis.register_script(lua_source("init_task"))
+        self._publisher = await AsyncPublisher(self.amqp_para).connect()
+        await self.adeclare_queue(self.queue)
+        self._minio_enabled = True
+
+        self._token = _current_ctx.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.local is not None:
+            self.__exit__(exc_type, exc_val, exc_tb)
+            return
+        if self.finish_on_exit and self.task_id is not None:
+            self.finish_task()
+        _current_ctx.reset(self._token)
+        await self._publisher.close()
+        await self._aredis.aclose()
+        # 异步上下文中也可能有同步提交（如 run_in_executor 中的 op()）
+        self._publishers.close()
+        self._publisher = None
+        self._aredis = None
+        self._minio = None
+        self._minio_enabled = False
 
     @property
-    def redis(self) -> redis.Redis:
+    def redis(self) -> "redis.Redis":
         if not self._redis:
             raise RuntimeError("Redis is not initialized. Use within an ExecutionContext.")
         return self._redis
 
     @property
-    def channel(self) -> pika.adapters.blocking_connection.BlockingChannel:
+    def channel(self) -> "pika.adapters.blocking_connection.BlockingChannel":
         if not self._channel:
             raise RuntimeError("RabbitMQ channel is not initialized. Use within an ExecutionContext.")
         return self._channel
 
     @property
-    def connection(self) -> pika.BlockingConnection:
+    def connection(self) -> "pika.BlockingConnection":
         if not self._connection:
             raise RuntimeError("RabbitMQ connection is not initialized. Use within an ExecutionContext.")
         return self._connection
 
     @property
-    def minio(self) -> Minio:
+    def aredis(self) -> "redis.asyncio.Redis":
+        if not self._aredis:
+            raise RuntimeError("Async Redis is not initialized. Use within `async with Context(...)`.")
+        return self._aredis
+
+    @property
+    def publisher(self) -> "AsyncPublisher":
+        if not self._publisher:
+            raise RuntimeError("Async publisher is not initialized. Use within `async with Context(...)`.")
+        return self._publisher
+
+    @property
+    def publishers(self) -> PublisherPool:
+        """Thread-safe publisher used by :meth:`publish` and :meth:`submit`."""
+        if self.connections is not None:
+            return self.connections.publishers
+        if self._publishers is None:
+            raise RuntimeError("RabbitMQ is not available in local mode.")
+        return self._publishers
+
+    @property
+    def minio(self) -> "Minio":
+        if not self._minio and self._minio_enabled:
+            self._connect_minio()
         if not self._minio:
             raise RuntimeError("Minio client is not initialized. Use within an ExecutionContext.")
         return self._minio
 
+    @property
+    def task_id(self):
+        return self._task_var.get()
+
+    @task_id.setter
+    def task_id(self, task_id):
+        self._task_var.set(task_id)
+
+    @property
+    def priority(self):
+        return self._priority_var.get()
+
+    @priority.setter
+    def priority(self, priority):
+        self._priority_var.set(priority)
+
+    @property
+    def tenant(self):
+        return self._tenant_var.get() or self.task_id
+
+    @tenant.setter
+    def tenant(self, tenant):
+        self._tenant_var.set(tenant)
+
+    @property
+    def memo_bypass(self):
+        return self._memo_bypass_var.get()
+
+    @memo_bypass.setter
+    def memo_bypass(self, memo_bypass):
+        self._memo_bypass_var.set(memo_bypass)
+
+    @property
+    def deadline(self):
+        return self._deadline_var.get()
+
+    @deadline.setter
+    def deadline(self, deadline):
+        self._deadline_var.set(deadline)
+
+    @property
+    def current_batch(self):
+        return self._batch_var.get()
+
+    @current_batch.setter
+    def current_batch(self, batch):
+        self._batch_var.set(batch)
+
     @property
     def task(self):
         if self.task_id is None:
@@ -128,6 +361,163 @@ class Context:
     def set_task(self, task_id):
         self.task_id = task_id
 
+    @contextmanager
+    def scope(self, task_id, priority="default", tenant=None, memo_bypass=False, deadline=None,
+              finish_on_exit=False):
+        """
+        Run a request as ``task_id`` on this (already connected) context: sets the task's
+        ContextVars and makes this the current context, without opening connections.
+        ``deadline`` is in seconds from now, as in the constructor.
+        """
+        if priority not in LANES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {LANES}")
+        tokens = [
+            (self._task_var, self._task_var.set(task_id)),
+            (self._priority_var, self._priority_var.set(priority)),
+            (self._tenant_var, self._tenant_var.set(tenant)),
+            (self._memo_bypass_var, self._memo_bypass_var.set(memo_bypass)),
+            (self._deadline_var, self._deadline_var.set(None if deadline is None else time.time() + deadline)),
+            (self._batch_var, self._batch_var.set(None)),
+        ]
+        ctx_token = _current_ctx.set(self)
+        try:
+            yield self
+        finally:
+            try:
+                # 与 __exit__ 一致：请求抛出异常时任务同样结束，key 随 retention 过期
+                if finish_on_exit:
+                    self.finish_task()
+            finally:
+                _current_ctx.reset(ctx_token)
+                for var, token in reversed(tokens):
+                    var.reset(token)
+
+    def finish_task(self, task_id=None, retention=None):
+        """
+        Mark ``task_id`` (default: the current task) complete: all of its Redis keys
+        expire after ``retention`` seconds (default ``TASK_RETENTION``, 3600).
+        """
+        return self.retention.finish(task_id or self.task, retention)
+
+    def cancel(self, task_id=None, reason="cancelled"):
+        """
+        Cancel ``task_id`` (default: the current task): nodes that have not started fail
+        with :class:`core.Errors.TaskCancelled`, queued jobs are dropped by Runner when
+        dequeued. Returns the number of nodes cancelled (0 if already cancelled).
+        """
+        task_id = task_id or self.task
+        error = TaskCancelled.of(task_id, reason).error
+        if self.local is not None:
+            return self.local.cancel(task_id, reason, error)
+        return self.cancel_task(
+            keys=[f"runner-node:{task_id}", f"runner-node-counter:{task_id}", f"runner-node-result:{task_id}"],
+            args=[reason, serialize(error)[1], f"runner-node-done:{task_id}"],
+        )
+
+    def cancelled(self, task_id=None):
+        """Cancellation reason of the task (``"deadline"`` once the deadline has passed), or ``None``."""
+        task_id = task_id or self.task
+        if self.local is not None:
+            reason = self.local.cancelled(task_id)
+        else:
+            reason = self.redis.hget(f"runner-node:{task_id}", "cancelled")
+        if reason is None and self.deadline is not None and time.time() >= self.deadline:
+            reason = "deadline"
+        return reason
+
+    def check_cancelled(self):
+        """Raise :class:`core.Errors.TaskCancelled` if the current task was cancelled or is past its deadline."""
+        reason = self.cancelled()
+        if reason is not None:
+            raise TaskCancelled.of(self.task, reason)
+
+    def queue_name(self, queue_class="default", priority=None):
+        """
+        RabbitMQ queue of an operator queue class in a priority lane (default: the
+        current priority). The default class and lane keep the original queue name.
+        """
+        queue = self.queue
+        if queue_class and queue_class != "default":
+            queue = f"{queue}.{queue_class}"
+        priority = priority or self.priority
+        if priority != "default":
+            queue = f"{queue}@{priority}"
+        return queue
+
+    def declare_queue(self, queue):
+        if queue not in self._declared_queues:
+            self.channel.queue_declare(queue=queue, durable=True)
+            self._declared_queues.add(queue)
+
+    async def adeclare_queue(self, queue):
+        if queue not in self._declared_queues:
+            await self.publisher.queue_declare(queue, durable=True)
+            self._declared_queues.add(queue)
+
+    def publish(self, body, routing_key=None, properties=None):
+        """
+        Publish a message and wait until RabbitMQ confirms it; safe to call from any thread.
+
+        ``routing_key`` defaults to the runner task queue; runner queues of custom
+        queue classes are declared on first use.
+        """
+        routing_key = routing_key or self.queue
+        self.publishers.publish(routing_key, body, properties, declare=routing_key.startswith(self.queue))
+
+    def submit(self, body, queue):
+        """Hand a ready job to its runner queue, through the fair-share scheduler if enabled."""
+        self.submit_many([(body, queue)])
+
+    def submit_many(self, jobs):
+        """
+        Hand ready jobs ``[(body, queue)]`` to their runner queues: one batch of publishes
+        confirmed together, or one Redis round trip with fair scheduling, where each job
+        goes to the ready queue of the tenant recorded in the job itself.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return
+        if not self.fair_scheduling:
+            self.publishers.publish_many([(queue, body, None) for body, queue in jobs], declare=True)
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for body, queue in jobs:
+            # 重试轮询、死信重放与子任务发布时，当前 ContextVar 中的租户不一定是 job 所属的租户
+            job = deserialize(body)
+            FairScheduler.enqueue(pipe, queue, job.get("tenant") or job["task_id"], body)
+        pipe.execute()
+
+    async def asubmit(self, body, queue):
+        if not self.fair_scheduling:
+            await self.adeclare_queue(queue)
+            await self.publisher.publish(queue, body)
+            return
+        pipe = self.aredis.pipeline(transaction=False)
+        FairScheduler.enqueue(pipe, queue, self.tenant, body)
+        await pipe.execute()
+
+    def cached_result(self, task_id, exec_id):
+        """Return the locally cached ``(state, raw)`` of a finished node, or ``None``."""
+        with self._results_lock:
+            entry = self._results.get((task_id, exec_id))
+            if entry is not None:
+                self._results.move_to_end((task_id, exec_id))
+            return entry
+
+    def cache_result(self, task_id, exec_id, state, raw):
+        with self._results_lock:
+            self._results[(task_id, exec_id)] = (state, raw)
+            self._results.move_to_end((task_id, exec_id))
+            while len(self._results) > self.result_cache_size:
+                self._results.popitem(last=False)
+
+    def batch(self, block_size=64):
+        """
+        批量提交：``with ctx.batch(): ...`` 块内创建的节点在退出时一次性注册并发布。
+        block_size 为每次向 Redis 预分配的 exec_id 数量。
+        """
+        return Batch(self, block_size)
+
 
 def get_context() -> Context:
     """
@@ -0,0 +1,176 @@
+import argparse
+import os
+import time
+
+
+class DeadLetter:
+    """
+    最终失败（不可重试或重试次数用尽）的 job 记录在 Redis Stream ``runner-dead-letter`` 中，
+    保存 job 本身、所属队列、执行次数与错误信息，可按条目查看并重放。
+
+    重放把节点恢复为 PENDING、清除错误结果与执行次数后重新入队，因它失败而被级联置为 ERROR 的
+    下游节点（``cascaded:{exec_id}``）一并恢复，依赖完成后照常执行；任务的 key 已过期时不能重放。
+    Stream 长度约保持在 ``DEAD_LETTER_MAXLEN`` 条以内。
+    """
+
+    key = "runner-dead-letter"
+
+    def __init__(self, ctx, maxlen=None):
+        self.ctx = ctx
+        self.maxlen = int(os.getenv("DEAD_LETTER_MAXLEN", "10000")) if maxlen is None else maxlen
+
+    def add(self, pipe, job, body, queue, attempts, error, stack):
+        """Record a failed job on ``pipe`` (the pipeline that marks the node ERROR)."""
+        pipe.xadd(self.key, {
+            "task_id": job["task_id"],
+            "exec_id": job["exec_id"],
+            "task": job["task"],
+            "queue": queue,
+            "attempts": attempts,
+            "error": error,
+            "stack": stack,
+            "job": body.decode('latin1') if isinstance(body, bytes) else body,
+            "failed_at": f"{time.time():.3f}",
+        }, maxlen=self.maxlen, approximate=True)
+
+    def entries(self, count=20, task_id=None):
+        """Newest first: ``[(entry_id, fields)]``, optionally only those of ``task_id``."""
+        redis = self.ctx.redis
+        if task_id is None:
+            return redis.xrevrange(self.key, count=count)
+        found = []
+        for entry_id, fields in redis.xrevrange(self.key):
+            if fields["task_id"] == task_id:
+                found.append((entry_id, fields))
+                if len(found) >= count:
+                    break
+        return found
+
+    def get(self, entry_id):
+        entries = self.ctx.redis.xrange(self.key, entry_id, entry_id)
+        if not entries:
+            raise KeyError(f"dead-letter entry {entry_id} not found")
+        return entries[0][1]
+
+    def replay(self, entry_id):
+        """Reset the node and its cascaded downstream nodes, then publish the node again; the entry is removed."""
+        entry = self.get(entry_id)
+        redis = self.ctx.redis
+        task_id, exec_id = entry["task_id"], entry["exec_id"]
+        task_key = f"runner-node:{task_id}"
+        state = redis.hget(task_key, f"state:{exec_id}")
+        if state is None:
+            raise ValueError(f"task {task_id} has expired, exec_id {exec_id} cannot be replayed")
+        if state != "ERROR":
+            raise ValueError(f"exec_id {exec_id} of task {task_id} is {state}, not ERROR")
+
+        cascaded = [d for d in (redis.hget(task_key, f"cascaded:{exec_id}") or "").split(",") if d]
+        pipe = redis.pipeline(transaction=False)
+        for cid in cascaded:
+            pipe.hmget(task_key, f"state:{cid}", f"dep:{cid}", f"inner:{cid}")
+        nodes = {cid: values for cid, values in zip(cascaded, pipe.execute()) if values[0] == "ERROR"}
+        # 恢复后的状态：root 重新执行；等待失败 inner 的 outer 继续等待（RUNNING）；其余子任务 PENDING
+        reset = {exec_id: "PENDING"}
+        for cid, (_, _, inner) in nodes.items():
+            if inner is None:
+                reset[cid] = "PENDING"
+            elif inner in reset or inner in nodes:
+                reset[cid] = "RUNNING"
+
+        # 依赖计数：恢复集合内的依赖，以及仍未结束的外部依赖
+        external = {d for cid in reset if cid in nodes for d in (nodes[cid][1] or "").split(",") if d and d not in reset}
+        external = sorted(external)
+        external_states = dict(zip(external, redis.hmget(task_key, [f"state:{d}" for d in external]))) if external else {}
+        dep_cnts = {exec_id: 0}
+        pipe = redis.pipeline()
+        for cid, new_state in reset.items():
+            if cid == exec_id or new_state != "PENDING":
+                continue
+            pending = [
+                d for d in dict.fromkeys((nodes[cid][1] or "").split(","))
+                if d and (d in reset or external_states.get(d) in ("PENDING", "RUNNING"))
+            ]
+            for d in pending:
+                # 依赖失败后才提交的子任务不在 waiters 中，补上
+                pipe.sadd(f"runner-node-waiters:{task_id}:{d}", cid)
+            dep_cnts[cid] = len(pending)
+            pipe.hset(task_key, f"dep_cnt:{cid}", len(pending))
+
+        now = f"{time.time():.6f}"
+        for cid, new_state in reset.items():
+            pipe.hset(task_key, f"state:{cid}", new_state)
+            # 删除错误结果，等待中的 result() 会阻塞到重放完成
+            pipe.delete(f"runner-node-result:{task_id}:{cid}")
+            pipe.delete(f"runner-node-stream:{task_id}:{cid}")
+            if dep_cnts.get(cid) == 0:
+                pipe.hset(task_key, f"t_ready:{cid}", now)
+        pipe.hdel(task_key, f"attempt:{exec_id}", f"cascaded:{exec_id}")
+        pipe.xdel(self.key, entry_id)
+        pipe.execute()
+
+        jobs = [(entry["job"].encode('latin1'), entry["queue"] or self.ctx.queue)]
+        for cid, cnt in dep_cnts.items():
+            if cid != exec_id and cnt == 0:
+                job, queue = redis.hmget(task_key, f"job:{cid}", f"queue:{cid}")
+                jobs.append((job.encode('latin1'), queue or self.ctx.queue))
+        self.ctx.submit_many(jobs)
+        return len(reset)
+
+    def drop(self, entry_ids):
+        return self.ctx.redis.xdel(self.key, *entry_ids) if entry_ids else 0
+
+
+def print_entries(entries):
+    print(f"{'entry':<18} {'task_id':<34} {'exec_id':>7} {'attempts':>8}  {'operator':<32} error")
+    for entry_id, fields in entries:
+        error = fields["error"].replace("\n", " ")
+        print(f"{entry_id:<18} {fields['task_id']:<34} {fields['exec_id']:>7} {fields['attempts']:>8}  "
+              f"{fields['task'][-32:]:<32} {error[:80]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and replay jobs that failed permanently.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = sub.add_parser("list", help="newest entries first")
+    list_parser.add_argument("--task", default=None, help="only entries of this task_id")
+    list_parser.add_argument("--limit", type=int, default=20)
+
+    show_parser = sub.add_parser("show", help="full error, stack and job of an entry")
+    show_parser.add_argument("entry_id")
+
+    for name, help_ in (("replay", "requeue entries and remove them"), ("drop", "remove entries")):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("entry_ids", nargs="*")
+        p.add_argument("--task", default=None, help="all entries of this task_id")
+
+    cli_args = parser.parse_args()
+
+    from core.Context import Context
+    from core.Utils import deserialize
+
+    with Context() as ctx:
+        dead_letter = DeadLetter(ctx)
+        if cli_args.command == "list":
+            print_entries(dead_letter.entries(cli_args.limit, cli_args.task))
+        elif cli_args.command == "show":
+            fields = dead_letter.get(cli_args.entry_id)
+            job = deserialize(fields["job"])
+            for name in ("task_id", "exec_id", "task", "queue", "attempts", "failed_at", "error"):
+                print(f"{name}: {fields[name]}")
+            print(f"args: {job.get('args')!r:.2000}")
+            print(f"kwargs: {job.get('kwargs')!r:.2000}")
+            print(fields["stack"])
+        else:
+            entry_ids = list(cli_args.entry_ids)
+            if cli_args.task is not None:
+                entry_ids += [entry_id for entry_id, _ in dead_letter.entries(dead_letter.maxlen, cli_args.task)]
+            if cli_args.command == "drop":
+                print(f"dropped {dead_letter.drop(entry_ids)} entries")
+            else:
+                for entry_id in entry_ids:
+                    try:
+                        dead_letter.replay(entry_id)
+                        print(f"{entry_id}: replayed")
+                    except (KeyError, ValueError) as e:
+                        print(f"{entry_id}: {e}")
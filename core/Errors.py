@@ -0,0 +1,43 @@
+class UpstreamError(RuntimeError):
+    """
+    依赖的任务失败。``error`` 为写给下游节点的错误信息（``{"error", "stack", "upstream"}``），
+    所有下游节点收到同一份，``upstream`` 为最初失败的 exec_id。
+    """
+
+    def __init__(self, error):
+        super().__init__(error["error"])
+        self.error = error
+
+    @staticmethod
+    def downstream(exec_id, error):
+        """Error dict written to the nodes downstream of ``exec_id``, given the node's own error dict."""
+        if "upstream" in error or "cancelled" in error:
+            # 已是级联的错误（或任务已取消），保持原样
+            return error
+        return {"error": f"Previous task {exec_id} failed: {error['error']}", "stack": error.get("stack", ""),
+                "upstream": exec_id}
+
+
+class TaskCancelled(RuntimeError):
+    """
+    任务被 ``ctx.cancel()`` 取消或超过了 ``Context(deadline=...)``。``error`` 为写入节点的错误信息
+    （``{"error", "stack", "cancelled"}``），``cancelled`` 为取消原因（超时为 ``"deadline"``）。
+    """
+
+    def __init__(self, error):
+        super().__init__(error["error"])
+        self.error = error
+
+    @classmethod
+    def of(cls, task_id, reason="cancelled"):
+        if reason == "deadline":
+            message = f"Task {task_id} exceeded its deadline"
+        elif reason == "cancelled":
+            message = f"Task {task_id} cancelled"
+        else:
+            message = f"Task {task_id} cancelled: {reason}"
+        return cls({"error": message, "stack": "", "cancelled": reason})
+
+
+class PublishError(RuntimeError):
+    """broker 拒绝（nack）了发布的消息，或发布器已关闭、消息未能送达。"""
@@ -0,0 +1,219 @@
+import argparse
+import time
+
+
+class FairScheduler:
+    """
+    任务（租户）间的加权公平调度，位于提交方 / Runner 与 RabbitMQ 之间。
+
+    开启 ``FAIR_SCHEDULING`` 后，就绪的 job 不再直接发布，而是由 :meth:`enqueue` 放入
+    按租户划分的就绪队列；调度进程按加权 deficit round robin 依次放行，并限制：
+
+    - 每个租户在每个 RabbitMQ 队列上的在途任务数（``cap``，可按租户覆盖）；
+    - 每个 RabbitMQ 队列的在途任务总数（``window``，通常取消费该队列的 Runner 线程总数），
+      积压留在 Redis 中，才能按公平顺序放行。
+
+    租户默认为 task_id，也可通过 ``Context(tenant=...)`` 按用户划分。Runner 执行完带
+    ``fair-tenant`` 头的消息后减少在途计数并唤醒调度进程。
+
+    Redis 结构：
+        1. list: runner-fair-ready:{queue}:{tenant} (租户的就绪 job)
+        2. set: runner-fair-active:{queue} (有积压的租户)
+        3. set: runner-fair-queues (出现过的 RabbitMQ 队列)
+        4. hash: runner-fair-inflight:{queue} (租户 -> 在途任务数)
+        5. hash: runner-fair-released:{queue} (租户 -> 累计放行数，租户空闲后清除)
+        6. hash: runner-fair-weight / runner-fair-cap (租户 -> 权重 / 在途上限)
+        7. list: runner-fair-wakeup (唤醒调度进程)
+
+    同一时间只应运行一个调度进程。
+    """
+
+    def __init__(self, ctx, window=64, cap=16, quantum=1.0):
+        self.ctx = ctx
+        self.redis = ctx.redis
+        self.window = window
+        self.cap = cap
+        self.quantum = quantum
+        self._deficit = {}
+        self._order = {}
+
+    @staticmethod
+    def enqueue(pipe, queue, tenant, body):
+        """Queue a ready job for ``tenant`` on ``pipe`` (a sync or asyncio Redis pipeline)."""
+        pipe.rpush(f"runner-fair-ready:{queue}:{tenant}", body.decode('latin1'))
+        pipe.sadd(f"runner-fair-active:{queue}", tenant)
+        pipe.sadd("runner-fair-queues", queue)
+        FairScheduler.wakeup(pipe)
+
+    @staticmethod
+    def wakeup(pipe):
+        # 唤醒列表最多保留一个元素
+        pipe.lpush("runner-fair-wakeup", 1)
+        pipe.ltrim("runner-fair-wakeup", 0, 0)
+
+    @staticmethod
+    def release_slot(redis, queue, tenant):
+        """Called by Runner once a job released by the scheduler has been acked."""
+        pipe = redis.pipeline(transaction=False)
+        pipe.hincrby(f"runner-fair-inflight:{queue}", tenant, -1)
+        FairScheduler.wakeup(pipe)
+        pipe.execute()
+
+    def run(self, idle_timeout=1):
+        while True:
+            if not self.schedule_once():
+                self.redis.blpop(["runner-fair-wakeup"], timeout=idle_timeout)
+
+    def schedule_once(self):
+        """Release as many jobs as the caps allow. Returns the number released."""
+        released = 0
+        for queue in self.redis.smembers("runner-fair-queues"):
+            released += self._schedule_queue(queue)
+        return released
+
+    def _schedule_queue(self, queue):
+        active = self.redis.smembers(f"runner-fair-active:{queue}")
+        inflight = {t: int(n) for t, n in self.redis.hgetall(f"runner-fair-inflight:{queue}").items()}
+        idle = [t for t, n in inflight.items() if n <= 0 and t not in active]
+        if idle:
+            # 没有积压也没有在途任务的租户：清理统计字段，避免随 task_id 无限增长
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hdel(f"runner-fair-inflight:{queue}", *idle)
+            pipe.hdel(f"runner-fair-released:{queue}", *idle)
+            pipe.execute()
+        if not active:
+            return 0
+        budget = self.window - sum(max(n, 0) for n in inflight.values())
+        if budget <= 0:
+            return 0
+
+        tenants = sorted(active)
+        weights = dict(zip(tenants, self.redis.hmget("runner-fair-weight", tenants)))
+        caps = dict(zip(tenants, self.redis.hmget("runner-fair-cap", tenants)))
+
+        # 轮转顺序跨调用保留，新租户排到末尾
+        order = self._order.setdefault(queue, [])
+        order[:] = [t for t in order if t in active] + [t for t in tenants if t not in order]
+
+        released = 0
+        progress = True
+        while budget > 0 and order and progress:
+            progress = False
+            for tenant in list(order):
+                if budget <= 0:
+                    break
+                weight = float(weights[tenant] or 1)
+                if weight <= 0:
+                    # 权重为 0 的租户暂停放行
+                    continue
+                key = (queue, tenant)
+                deficit = self._deficit.get(key, 0.0) + self.quantum * weight
+                cap = int(caps[tenant]) if caps[tenant] is not None else self.cap
+                room = cap - inflight.get(tenant, 0)
+                n = min(int(deficit), room, budget)
+                if room > 0:
+                    # 只要还有租户未达上限就继续轮转，权重小于 1 的租户下一轮攒够 deficit
+                    progress = True
+                if n <= 0:
+                    # 在途已满的租户不积累 deficit，避免解除限制后突发
+                    self._deficit[key] = deficit if room > 0 else min(deficit, 1.0)
+                    continue
+
+                jobs = self.redis.lpop(f"runner-fair-ready:{queue}:{tenant}", n) or []
+                self._publish(queue, tenant, jobs)
+                inflight[tenant] = inflight.get(tenant, 0) + len(jobs)
+                budget -= len(jobs)
+                released += len(jobs)
+                self._deficit[key] = deficit - len(jobs)
+
+                if len(jobs) < n:
+                    # 积压已清空：移出活跃集合（期间又有提交则加回），deficit 清零
+                    order.remove(tenant)
+                    self._deficit.pop(key, None)
+                    self._deactivate(queue, tenant)
+        return released
+
+    def _publish(self, queue, tenant, jobs):
+        if not jobs:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hincrby(f"runner-fair-inflight:{queue}", tenant, len(jobs))
+        pipe.hincrby(f"runner-fair-released:{queue}", tenant, len(jobs))
+        pipe.execute()
+        import pika
+
+        properties = pika.BasicProperties(delivery_mode=2, headers={"fair-tenant": tenant, "fair-queue": queue})
+        self.ctx.publishers.publish_many([(queue, job.encode('latin1'), properties) for job in jobs], declare=True)
+
+    def _deactivate(self, queue, tenant):
+        self.redis.srem(f"runner-fair-active:{queue}", tenant)
+        if self.redis.llen(f"runner-fair-ready:{queue}:{tenant}"):
+            self.redis.sadd(f"runner-fair-active:{queue}", tenant)
+
+    def metrics(self):
+        """Per queue and tenant: ``(queue, tenant, weight, ready, inflight, released, share)``."""
+        rows = []
+        for queue in sorted(self.redis.smembers("runner-fair-queues")):
+            inflight = {t: max(int(n), 0) for t, n in self.redis.hgetall(f"runner-fair-inflight:{queue}").items()}
+            released = {t: int(n) for t, n in self.redis.hgetall(f"runner-fair-released:{queue}").items()}
+            tenants = sorted(set(inflight) | set(released) | self.redis.smembers(f"runner-fair-active:{queue}"))
+            if not tenants:
+                continue
+            pipe = self.redis.pipeline(transaction=False)
+            for tenant in tenants:
+                pipe.llen(f"runner-fair-ready:{queue}:{tenant}")
+            ready = dict(zip(tenants, pipe.execute()))
+            weights = dict(zip(tenants, self.redis.hmget("runner-fair-weight", tenants)))
+            total = sum(inflight.values())
+            for tenant in tenants:
+                share = inflight.get(tenant, 0) / total if total else 0.0
+                rows.append((
+                    queue, tenant, float(weights[tenant] or 1), ready[tenant],
+                    inflight.get(tenant, 0), released.get(tenant, 0), share,
+                ))
+        return rows
+
+
+def print_metrics(rows):
+    print(f"{'queue':<36} {'tenant':<34} {'weight':>6} {'ready':>7} {'inflight':>8} {'released':>9} {'share':>6}")
+    for queue, tenant, weight, ready, inflight, released, share in rows:
+        print(f"{queue:<36} {tenant:<34} {weight:>6g} {ready:>7} {inflight:>8} {released:>9} {share:>6.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weighted fair-share scheduler between tasks and RabbitMQ.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the scheduler loop (one instance per deployment)")
+    run_parser.add_argument("--window", type=int, default=64, help="max in-flight jobs per RabbitMQ queue")
+    run_parser.add_argument("--cap", type=int, default=16, help="default max in-flight jobs per tenant and queue")
+
+    metrics_parser = sub.add_parser("metrics", help="per-tenant backlog, in-flight jobs and share")
+    metrics_parser.add_argument("--watch", type=int, default=0, help="refresh every N seconds")
+
+    weight_parser = sub.add_parser("weight", help="set a tenant's weight (0 pauses the tenant)")
+    weight_parser.add_argument("tenant")
+    weight_parser.add_argument("weight", type=float)
+
+    cap_parser = sub.add_parser("cap", help="set a tenant's in-flight cap")
+    cap_parser.add_argument("tenant")
+    cap_parser.add_argument("cap", type=int)
+
+    cli_args = parser.parse_args()
+
+    from core.Context import Context
+
+    with Context() as ctx:
+        if cli_args.command == "run":
+            FairScheduler(ctx, window=cli_args.window, cap=cli_args.cap).run()
+        elif cli_args.command == "metrics":
+            while True:
+                print_metrics(FairScheduler(ctx).metrics())
+                if cli_args.watch <= 0:
+                    break
+                time.sleep(cli_args.watch)
+                print()
+        elif cli_args.command == "weight":
+            ctx.redis.hset("runner-fair-weight", cli_args.tenant, cli_args.weight)
+        else:
+            ctx.redis.hset("runner-fair-cap", cli_args.tenant, cli_args.cap)
@@ -0,0 +1,46 @@
+import threading
+from collections import deque
+
+
+# 优先级通道，从高到低
+LANES = ("interactive", "default", "batch")
+
+
+class LaneScheduler:
+    """
+    Runner 进程内按优先级通道取任务的本地缓冲。
+
+    连接线程收到消息后 ``put`` 到所属通道，工作线程 ``get`` 时优先取更高的通道；
+    某个非空通道连续被跳过 ``starvation_limit`` 次后，下一次必定轮到它，
+    批量任务在交互流量持续不断时也能继续推进。
+    """
+
+    def __init__(self, lanes=LANES, starvation_limit=8):
+        self.lanes = list(lanes)
+        self.starvation_limit = starvation_limit
+        self._queues = {lane: deque() for lane in self.lanes}
+        self._skipped = {lane: 0 for lane in self.lanes}
+        self._lock = threading.Lock()
+
+    def put(self, lane, item):
+        with self._lock:
+            self._queues[lane].append(item)
+
+    def get(self):
+        """Pop the next item by lane priority, or ``None`` when every lane is empty."""
+        with self._lock:
+            waiting = [lane for lane in self.lanes if self._queues[lane]]
+            if not waiting:
+                return None
+            # 饿死保护：被跳过最多次且达到上限的低优先级通道先出队
+            starved = max(waiting, key=lambda lane: self._skipped[lane])
+            lane = starved if self._skipped[starved] >= self.starvation_limit else waiting[0]
+            for other in waiting:
+                if other != lane:
+                    self._skipped[other] += 1
+            self._skipped[lane] = 0
+            return self._queues[lane].popleft()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
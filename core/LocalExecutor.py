@@ -0,0 +1,278 @@
+import contextvars
+import inspect
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from core.ComputableResult import ComputableResult
+from core.Errors import TaskCancelled, UpstreamError
+from core.OperatorPool import OperatorPool
+from core.Utils import deserialize, serialize
+
+
+class _Node:
+    __slots__ = ("job", "state", "dep_cnt", "waiters", "result", "finish_pointer", "inner", "chunks")
+
+    def __init__(self, job):
+        self.job = job
+        self.state = "PENDING"
+        self.dep_cnt = 0
+        self.waiters = set()
+        self.result = None
+        self.finish_pointer = None
+        self.inner = None
+        # 生成器算子产出的 chunk（序列化后）
+        self.chunks = []
+
+
+class LocalExecutor:
+    """
+    ``Context(mode="local")`` 的进程内执行器。
+
+    节点状态保存在内存中，语义与 ``init_task.lua`` / ``complete_task.lua`` / Runner 一一对应：
+    job 与结果同样经过序列化，依赖计数只统计 PENDING / RUNNING 的依赖，返回 ComputableResult
+    的任务通过 finish_pointer 等待 inner 完成，失败的任务写入 ERROR 与错误信息并级联到所有下游节点，
+    生成器算子产出的 chunk 保存在节点上供 ``ComputableResult.stream()`` 读取。
+    就绪的任务交给线程池执行，不需要 Redis、RabbitMQ、MinIO 或 Milvus。
+    """
+
+    def __init__(self, ctx, threads=8, pool_size=64):
+        self.ctx = ctx
+        self.threads = threads
+        self.operators = OperatorPool(max_size=pool_size)
+        self._nodes = {}
+        self._counters = {}
+        self._cancelled = {}
+        self._cond = threading.Condition()
+        self._pool = None
+        self._base_context = None
+
+    def start(self):
+        # 在进入 Context 的线程上记录上下文，工作线程中 get_context() 可见
+        self._base_context = contextvars.copy_context()
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="local-runner")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def submit(self, op, args, kwargs):
+        """Register a call of ``op`` (``Computable.__call__`` in local mode) and run it when ready."""
+        task_id = self.ctx.task
+        with self._cond:
+            exec_id = self._counters.get(task_id, 0) + 1
+            self._counters[task_id] = exec_id
+        ser_bin_job, _, dep = op._build_job(task_id, exec_id, args, kwargs)
+
+        with self._cond:
+            node = self._nodes[(task_id, exec_id)] = _Node(ser_bin_job)
+            # 与 init_task.lua 相同：重复的依赖只计一次，已结束的依赖不计
+            for dep_id in {int(d) for d in dep.split(",") if d}:
+                dep_node = self._nodes[(task_id, dep_id)]
+                if dep_node.state in ("PENDING", "RUNNING") and exec_id not in dep_node.waiters:
+                    dep_node.waiters.add(exec_id)
+                    node.dep_cnt += 1
+            ready = node.dep_cnt == 0
+        if ready:
+            self._schedule(task_id, exec_id)
+        return ComputableResult(exec_id)
+
+    def _schedule(self, task_id, exec_id):
+        self._pool.submit(self._base_context.copy().run, self._run, task_id, exec_id)
+
+    def _run(self, task_id, exec_id):
+        with self._cond:
+            node = self._nodes[(task_id, exec_id)]
+        job = deserialize(node.job)
+        self.ctx.set_task(task_id)
+        self.ctx.priority = job.get("priority", "default")
+        self.ctx.deadline = job.get("deadline")
+
+        try:
+            # 与 Runner 一致：先检查取消，已被 cancel 置为 ERROR 的节点不再改为 RUNNING
+            reason = self.ctx.cancelled(task_id)
+            if reason is not None:
+                if reason == "deadline":
+                    self.cancel(task_id, reason, TaskCancelled.of(task_id, reason).error)
+                raise TaskCancelled.of(task_id, reason)
+            with self._cond:
+                node.state = "RUNNING"
+
+            def get_value_obj(obj):
+                if isinstance(obj, ComputableResult):
+                    dep_node = self._nodes[(task_id, obj.exec_id)]
+                    if dep_node.state == "ERROR":
+                        raise UpstreamError(UpstreamError.downstream(obj.exec_id, deserialize(dep_node.result)))
+                    # 与 Runner 一致：结果中的句柄原样交给算子
+                    return deserialize(dep_node.result)
+                elif isinstance(obj, dict):
+                    return {get_value_obj(k): get_value_obj(v) for k, v in obj.items()}
+                elif isinstance(obj, list):
+                    return [get_value_obj(item) for item in obj]
+                elif isinstance(obj, tuple):
+                    return tuple(get_value_obj(item) for item in obj)
+                return obj
+
+            args = [get_value_obj(arg) for arg in job["args"]]
+            kwargs = {k: get_value_obj(v) for k, v in job.get("kwargs", {}).items()}
+            instance, pool_key = self.operators.acquire(job["task"], job.get("init_args", []), job.get("init_kwargs", {}))
+            try:
+                res = instance.compute(*args, **kwargs)
+                if inspect.isgenerator(res):
+                    res = self._stream(node, res)
+            finally:
+                self.operators.release(instance, pool_key)
+        except Exception as e:
+            stack = traceback.format_exc()
+            if isinstance(e, (UpstreamError, TaskCancelled)):
+                error = downstream = e.error
+            else:
+                error = {"error": str(e), "stack": stack}
+                downstream = UpstreamError.downstream(exec_id, error)
+            with self._cond:
+                if node.state != "ERROR":
+                    node.state = "ERROR"
+                    node.result = serialize(error)[1]
+                self._fail_downstream(task_id, exec_id, serialize(downstream)[1])
+                self._cond.notify_all()
+            if isinstance(e, TaskCancelled):
+                print(f"任务 {exec_id} 已跳过: {e}")
+                return
+            print(f"任务 {exec_id} 执行失败: {e}")
+            print(stack)
+            return
+
+        if isinstance(res, ComputableResult):
+            ready = self._complete(task_id, exec_id, None, res.exec_id)
+        else:
+            ready = self._complete(task_id, exec_id, serialize(res)[1], None)
+        for ready_id in ready:
+            self._schedule(task_id, ready_id)
+
+    def _stream(self, node, gen):
+        """In-memory counterpart of ``Runner._stream``."""
+        chunks = []
+        while True:
+            try:
+                chunk = next(gen)
+            except StopIteration as stop:
+                return chunks if stop.value is None else stop.value
+            chunks.append(chunk)
+            with self._cond:
+                node.chunks.append(serialize(chunk)[1])
+                self._cond.notify_all()
+
+    def _complete(self, task_id, exec_id, result, inner_id):
+        """In-memory ``complete_task.lua``: returns the exec_ids whose dependencies are now met."""
+        with self._cond:
+            if inner_id is not None:
+                self._nodes[(task_id, exec_id)].inner = inner_id
+                inner = self._nodes[(task_id, inner_id)]
+                if inner.state != "FINISHED":
+                    inner.finish_pointer = exec_id
+                    if inner.state == "ERROR":
+                        error = UpstreamError.downstream(inner_id, deserialize(inner.result))
+                        self._fail_downstream(task_id, inner_id, serialize(error)[1])
+                    # 唤醒等待本节点 chunk 的 read_stream，转而读取 inner
+                    self._cond.notify_all()
+                    return []
+                result = inner.result
+
+            finish_ids = [exec_id]
+            while self._nodes[(task_id, finish_ids[-1])].finish_pointer is not None:
+                finish_ids.append(self._nodes[(task_id, finish_ids[-1])].finish_pointer)
+
+            ready = []
+            for feid in finish_ids:
+                node = self._nodes[(task_id, feid)]
+                node.state = "FINISHED"
+                node.result = result
+                for cid in node.waiters:
+                    child = self._nodes[(task_id, cid)]
+                    child.dep_cnt -= 1
+                    if child.dep_cnt == 0 and child.state == "PENDING":
+                        ready.append(cid)
+            self._cond.notify_all()
+        return ready
+
+    def _fail_downstream(self, task_id, exec_id, error):
+        """In-memory ``fail_task.lua`` (caller holds the lock): fail every unfinished node downstream of ``exec_id``."""
+        frontier = [exec_id]
+        while frontier:
+            node = self._nodes[(task_id, frontier.pop())]
+            next_ids = list(node.waiters)
+            if node.finish_pointer is not None:
+                next_ids.append(node.finish_pointer)
+            for cid in next_ids:
+                child = self._nodes[(task_id, cid)]
+                if child.state in ("PENDING", "RUNNING"):
+                    child.state = "ERROR"
+                    child.result = error
+                    frontier.append(cid)
+
+    def cancel(self, task_id, reason, error):
+        """In-memory ``cancel_task.lua``: fail the task's nodes that have not started."""
+        error = serialize(error)[1]
+        with self._cond:
+            if task_id in self._cancelled:
+                return 0
+            self._cancelled[task_id] = reason
+            pending = [
+                exec_id for (tid, exec_id), node in self._nodes.items()
+                if tid == task_id and node.state == "PENDING"
+            ]
+            for exec_id in pending:
+                node = self._nodes[(task_id, exec_id)]
+                node.state = "ERROR"
+                node.result = error
+            # 等待这些节点作为 inner 的 outer 一并失败
+            for exec_id in pending:
+                self._fail_downstream(task_id, exec_id, error)
+            self._cond.notify_all()
+        return len(pending)
+
+    def cancelled(self, task_id):
+        return self._cancelled.get(task_id)
+
+    def wait(self, task_id, exec_id, timeout=None):
+        """Block until the node is FINISHED or ERROR; returns ``(state, raw result)``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            node = self._nodes[(task_id, exec_id)]
+            while node.state not in ("FINISHED", "ERROR"):
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    raise TimeoutError(f"Result {exec_id} not ready after {timeout}s")
+                self._cond.wait(wait)
+            return node.state, node.result
+
+    def read_stream(self, task_id, exec_id, start, deadline=None):
+        """
+        Block until the node has chunks after index ``start`` or is done (finished, failed or
+        waiting on an inner); returns ``(new serialized chunks, done, inner exec_id)``.
+        """
+        with self._cond:
+            node = self._nodes[(task_id, exec_id)]
+            while True:
+                done = node.state in ("FINISHED", "ERROR") or node.inner is not None
+                if len(node.chunks) > start or done:
+                    return node.chunks[start:], done, node.inner
+                wait = None if deadline is None else deadline - time.monotonic()
+                if wait is not None and wait <= 0:
+                    raise TimeoutError(f"Result {exec_id} not finished before the deadline")
+                self._cond.wait(wait)
+
+    def wait_any(self, task_id, exec_ids, deadline=None):
+        """Block until at least one of ``exec_ids`` is done; returns the done ones (may be empty at ``deadline``)."""
+        with self._cond:
+            while True:
+                done = [
+                    exec_id for exec_id in exec_ids
+                    if self._nodes[(task_id, exec_id)].state in ("FINISHED", "ERROR")
+                ]
+                wait = None if deadline is None else deadline - time.monotonic()
+                if done or (wait is not None and wait <= 0):
+                    return done
+                self._cond.wait(wait)
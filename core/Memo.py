@@ -0,0 +1,115 @@
+import argparse
+import hashlib
+import os
+
+from core.Utils import deserialize, serialize
+
+
+class Memo:
+    """
+    跨任务的算子结果缓存。
+
+    类属性 ``memoize = True`` 的算子，Runner 以 ``(类路径, init_args, init_kwargs, 解析后的参数)``
+    的内容哈希为键，在调用 ``compute`` 前查缓存、执行后回填。条目带 TTL（算子的 ``memo_ttl``，
+    默认 ``MEMO_TTL`` 秒），总数超过 ``MEMO_MAX_ENTRIES`` 时按最近使用时间淘汰。
+    ``Context(memo_bypass=True)`` 提交的任务跳过查找但仍会回填（用于强制刷新）。
+
+    Redis 结构：
+        1. string: runner-memo:{digest} (序列化的 [结果, 原始耗时 ms])
+        2. zset: runner-memo-lru (digest -> 最近使用时间)
+        3. hash: runner-memo-stats ({task}:hits / {task}:misses / {task}:saved_ms)
+    """
+
+    def __init__(self, ctx, max_entries=None, default_ttl=None):
+        self.ctx = ctx
+        self.max_entries = int(os.getenv("MEMO_MAX_ENTRIES", "10000")) if max_entries is None else max_entries
+        self.default_ttl = int(os.getenv("MEMO_TTL", str(24 * 60 * 60))) if default_ttl is None else default_ttl
+
+    @staticmethod
+    def key(task, init_args, init_kwargs, args, kwargs):
+        """Content hash of an operator call, or ``None`` when the arguments cannot be serialized."""
+        try:
+            packed = serialize([task, init_args, init_kwargs, args, kwargs], compress=False)[0]
+        except ValueError:
+            return None
+        return hashlib.sha256(packed).hexdigest()
+
+    def get(self, task, digest):
+        """Return ``(True, result)`` on a hit, ``(False, None)`` otherwise; updates the stats."""
+        redis = self.ctx.redis
+        raw = redis.get(f"runner-memo:{digest}")
+        pipe = redis.pipeline(transaction=False)
+        if raw is None:
+            pipe.hincrby("runner-memo-stats", f"{task}:misses", 1)
+            pipe.execute()
+            return False, None
+        result, elapsed_ms = deserialize(raw)
+        pipe.zadd("runner-memo-lru", {digest: redis.time()[0]})
+        pipe.hincrby("runner-memo-stats", f"{task}:hits", 1)
+        pipe.hincrby("runner-memo-stats", f"{task}:saved_ms", int(elapsed_ms))
+        pipe.execute()
+        return True, result
+
+    def put(self, digest, result, elapsed_ms, ttl=None):
+        redis = self.ctx.redis
+        ttl = ttl or self.default_ttl
+        now = redis.time()[0]
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(f"runner-memo:{digest}", serialize([result, elapsed_ms])[1], ex=ttl)
+        pipe.zadd("runner-memo-lru", {digest: now})
+        pipe.zcard("runner-memo-lru")
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def _evict(self, count):
+        redis = self.ctx.redis
+        evicted = [digest for digest, _ in redis.zpopmin("runner-memo-lru", count)]
+        if evicted:
+            redis.delete(*[f"runner-memo:{digest}" for digest in evicted])
+
+    def stats(self):
+        """Per operator: ``(task, hits, misses, hit rate, saved seconds)``, plus the entry count."""
+        redis = self.ctx.redis
+        per_task = {}
+        for field, value in redis.hgetall("runner-memo-stats").items():
+            task, name = field.rsplit(":", 1)
+            per_task.setdefault(task, {})[name] = int(value)
+        rows = []
+        for task, values in sorted(per_task.items()):
+            hits, misses = values.get("hits", 0), values.get("misses", 0)
+            total = hits + misses
+            rows.append((task, hits, misses, hits / total if total else 0.0, values.get("saved_ms", 0) / 1000))
+        return rows, redis.zcard("runner-memo-lru")
+
+    def clear(self, stats=False):
+        redis = self.ctx.redis
+        digests = redis.zrange("runner-memo-lru", 0, -1)
+        for i in range(0, len(digests), 1000):
+            redis.delete(*[f"runner-memo:{digest}" for digest in digests[i:i + 1000]])
+        redis.delete("runner-memo-lru")
+        if stats:
+            redis.delete("runner-memo-stats")
+        return len(digests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Operator result cache: hit rates and maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="hit rate and time saved per operator")
+    clear_parser = sub.add_parser("clear", help="drop every cached result")
+    clear_parser.add_argument("--stats", action="store_true", help="also reset the hit / miss counters")
+    cli_args = parser.parse_args()
+
+    from core.Context import Context
+
+    with Context() as ctx:
+        memo = Memo(ctx)
+        if cli_args.command == "stats":
+            rows, entries = memo.stats()
+            print(f"{'operator':<40} {'hits':>8} {'misses':>8} {'hit rate':>9} {'saved':>10}")
+            for task, hits, misses, rate, saved in rows:
+                print(f"{task:<40} {hits:>8} {misses:>8} {rate:>9.1%} {saved:>9.1f}s")
+            print(f"\n{entries} cached results (max {memo.max_entries})")
+        else:
+            print(f"removed {memo.clear(stats=cli_args.stats)} cached results")
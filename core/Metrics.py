@@ -0,0 +1,147 @@
+import argparse
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+
+# 秒；LLM 调用可能持续数十秒
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# 序列化 / 反序列化等亚毫秒级操作
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+
+def serve(registry, port, addr="0.0.0.0"):
+    """Serve ``registry`` on ``http://addr:port/metrics`` from a daemon thread; returns the server."""
+    server, _ = start_http_server(port, addr, registry=registry)
+    return server
+
+
+class RunnerMetrics:
+    """
+    Runner 进程的指标。``python -m core.Runner --metrics-port 9100`` 时第 i 个进程在
+    ``9100 + i`` 端口导出，失败的任务计入 ``runner_jobs_total{status="error"}``，
+    等待重试的计入 ``status="retry"``，因任务取消而跳过的计入 ``status="cancelled"``。
+    """
+
+    def __init__(self, buffered=None):
+        # 每个 Runner 一个 registry，同一进程中可以创建多个 Runner（测试）
+        self.registry = CollectorRegistry()
+        self.jobs = Counter(
+            "runner_jobs", "Jobs executed by operator and status (finished / retry / error / cancelled).",
+            ("operator", "status"), registry=self.registry)
+        self.compute_seconds = Histogram(
+            "runner_compute_seconds", "Time spent in Computable.compute.", ("operator",),
+            buckets=DEFAULT_BUCKETS, registry=self.registry)
+        self.queue_wait_seconds = Histogram(
+            "runner_queue_wait_seconds", "Time from a job becoming ready to its dequeue by a Runner.", ("queue",),
+            buckets=DEFAULT_BUCKETS, registry=self.registry)
+        self.inflight = Gauge("runner_inflight_jobs", "Jobs currently being executed.", registry=self.registry)
+        self.buffered = Gauge(
+            "runner_buffered_jobs", "Jobs received and waiting in the local lane buffer.", registry=self.registry)
+        if buffered is not None:
+            self.buffered.set_function(buffered)
+        self.deserialize_seconds = Histogram(
+            "runner_deserialize_seconds", "Time to deserialize a job.", buckets=FAST_BUCKETS, registry=self.registry)
+        self.serialize_seconds = Histogram(
+            "runner_serialize_seconds", "Time to serialize a result.", buckets=FAST_BUCKETS, registry=self.registry)
+
+
+class _Snapshot:
+    """Custom collector exposing the gauge families of the last :meth:`ClusterCollector.collect`."""
+
+    def __init__(self):
+        self.families = []
+
+    def collect(self):
+        return list(self.families)
+
+
+class ClusterCollector:
+    """
+    部署级指标（单独运行一个实例）：各 runner 队列在 RabbitMQ 中的积压与消费者数，
+    Redis 中 ``runner-*`` key 按类别的数量、登记的任务数与内存占用。每 ``interval`` 秒刷新一次。
+
+    队列以 passive 方式查询，不会创建尚未使用的队列；不存在的队列不导出。查询使用单独的 channel，
+    队列不存在时 broker 关闭该 channel，下一次查询重新打开。
+    """
+
+    def __init__(self, ctx, queue_classes=None, lanes=None):
+        from core.Context import QUEUE_CLASSES
+        from core.LaneScheduler import LANES
+
+        self.ctx = ctx
+        self.queues = [
+            ctx.queue_name(queue_class, lane)
+            for queue_class in (queue_classes or QUEUE_CLASSES) for lane in (lanes or LANES)
+        ]
+        self._channel = None
+        # 抓取在 HTTP 线程上进行，每次 collect 整体替换快照，已消失的序列随之移除
+        self._snapshot = _Snapshot()
+        self.registry = CollectorRegistry()
+        self.registry.register(self._snapshot)
+
+    def _queue_stats(self, queue):
+        import pika
+
+        if self._channel is None or not self._channel.is_open:
+            self._channel = self.ctx.connection.channel()
+        try:
+            frame = self._channel.queue_declare(queue=queue, passive=True)
+        except pika.exceptions.ChannelClosedByBroker as e:
+            # 404：队列还没有被 Runner / 发布方声明
+            if e.reply_code != 404:
+                raise
+            self._channel = None
+            return None
+        return frame.method.message_count, frame.method.consumer_count
+
+    def collect(self):
+        start = time.monotonic()
+        messages = GaugeMetricFamily("rabbitmq_queue_messages", "Messages ready in a runner queue.",
+                                     labels=("queue",))
+        consumers = GaugeMetricFamily("rabbitmq_queue_consumers", "Consumers of a runner queue.", labels=("queue",))
+        for queue in self.queues:
+            stats = self._queue_stats(queue)
+            if stats is not None:
+                messages.add_metric((queue,), stats[0])
+                consumers.add_metric((queue,), stats[1])
+
+        redis = self.ctx.redis
+        families = {}
+        for key in redis.scan_iter(match="runner-*", count=1000):
+            family = key.split(":", 1)[0]
+            families[family] = families.get(family, 0) + 1
+        keys = GaugeMetricFamily("redis_runner_keys",
+                                 "runner-* keys in Redis by family (key name up to the first colon).",
+                                 labels=("family",))
+        for family, count in sorted(families.items()):
+            keys.add_metric((family,), count)
+        tasks = GaugeMetricFamily("redis_runner_tasks", "Tasks in the runner-tasks registry.",
+                                  value=redis.zcard("runner-tasks"))
+        memory = GaugeMetricFamily("redis_used_memory_bytes", "Redis used_memory.",
+                                   value=redis.info("memory").get("used_memory", 0))
+        duration = GaugeMetricFamily("collector_last_run_seconds", "Duration of the last collection.",
+                                     value=time.monotonic() - start)
+        self._snapshot.families = [messages, consumers, keys, tasks, memory, duration]
+
+    def run(self, interval=30):
+        while True:
+            self.collect()
+            # 等待期间处理 RabbitMQ 心跳
+            self.ctx.connection.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export RabbitMQ queue depth and Redis key counts for Prometheus.")
+    parser.add_argument("--port", type=int, default=9200, help="HTTP port of the /metrics endpoint")
+    parser.add_argument("--interval", type=int, default=30, help="seconds between collections")
+    cli_args = parser.parse_args()
+
+    from core.Context import Context
+
+    with Context() as ctx:
+        collector = ClusterCollector(ctx)
+        serve(collector.registry, cli_args.port)
+        print(f"serving metrics on :{cli_args.port}/metrics")
+        collector.run(cli_args.interval)
@@ -0,0 +1,62 @@
+import importlib
+import threading
+from collections import OrderedDict
+
+from core.Utils import serialize
+
+
+class OperatorPool:
+    """
+    Runner 进程内的算子实例池。
+
+    按 ``(task 类路径, init_args, init_kwargs)`` 缓存已构造好的空闲实例，避免每个任务
+    都重新 import、读取 .env、建立客户端。实例在使用期间从池中取出，线程化 Runner
+    中不会被两个任务同时使用。空闲实例总数超过 ``max_size`` 时按 LRU 淘汰。
+    类属性 ``poolable = False`` 的算子每次都会新建实例。
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._classes = {}
+        self._idle = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+
+    def load_class(self, task):
+        cls = self._classes.get(task)
+        if cls is None:
+            module_path, cls_name = task.rsplit(".", 1)
+            module = importlib.import_module(module_path)
+            cls = getattr(module, cls_name)
+            self._classes[task] = cls
+        return cls
+
+    def acquire(self, task, init_args, init_kwargs):
+        """Return ``(instance, key)``; hand both back to :meth:`release` when done."""
+        cls = self.load_class(task)
+        if self.max_size <= 0 or not getattr(cls, "poolable", True):
+            return cls(*init_args, **init_kwargs), None
+
+        key = (task, serialize([init_args, init_kwargs])[0])
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._idle.move_to_end(key)
+                self._idle_count -= 1
+                return idle.pop(), key
+        return cls(*init_args, **init_kwargs), key
+
+    def release(self, instance, key):
+        if key is None:
+            return
+        with self._lock:
+            self._idle.setdefault(key, []).append(instance)
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+            # 淘汰最久未使用的实例
+            while self._idle_count > self.max_size:
+                old_key, instances = next(iter(self._idle.items()))
+                instances.pop(0)
+                self._idle_count -= 1
+                if not instances:
+                    del self._idle[old_key]
@@ -0,0 +1,120 @@
+import asyncio
+import concurrent.futures
+import itertools
+import os
+import threading
+
+
+class PublisherPool:
+    """
+    线程安全的 RabbitMQ 发布器。pika 的连接不能跨线程使用：这里由一个后台线程运行事件循环，
+    持有 ``size`` 条开启 publisher confirms 的 :class:`core.AsyncPublisher.AsyncPublisher` 连接，
+    任意线程的发布经 ``run_coroutine_threadsafe`` 交给该线程，按轮转分配到各连接。
+
+    :meth:`publish` 在 broker 确认后返回；:meth:`publish_many` 把一批消息发到同一条连接后统一等待，
+    broker 合并确认，一批只需约一次往返。连接断开时 AsyncPublisher 自动重连并重新发布未确认的消息，
+    等待确认超过 ``timeout`` 秒抛出 ``TimeoutError``。连接在第一次发布时建立，fork 出的子进程重新建立。
+    """
+
+    def __init__(self, parameters, size=None, timeout=None, confirm=None):
+        self.parameters = parameters
+        self.size = size or int(os.getenv("PUBLISHER_POOL_SIZE", "2"))
+        self.timeout = float(os.getenv("PUBLISH_TIMEOUT", "30")) if timeout is None else timeout
+        self.confirm = os.getenv("PUBLISHER_CONFIRMS", "1") == "1" if confirm is None else confirm
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._publishers = []
+        self._next = itertools.count()
+        # 已声明的队列，只在发布线程上读写
+        self._declared = set()
+        self.pid = None
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None and self.pid == os.getpid():
+                return
+            from core.AsyncPublisher import AsyncPublisher
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="rabbitmq-publisher", daemon=True)
+            thread.start()
+
+            async def connect():
+                return await asyncio.gather(*(
+                    AsyncPublisher(self.parameters, confirm=self.confirm).connect() for _ in range(self.size)
+                ))
+
+            try:
+                publishers = asyncio.run_coroutine_threadsafe(connect(), loop).result(self.timeout)
+            except BaseException:
+                loop.call_soon_threadsafe(loop.stop)
+                raise
+            self._publishers = list(publishers)
+            self._declared = set()
+            self._loop, self._thread, self.pid = loop, thread, os.getpid()
+
+    async def _publish(self, publisher, messages, declare):
+        if declare:
+            for routing_key in dict.fromkeys(routing_key for routing_key, _, _ in messages):
+                if routing_key not in self._declared:
+                    await publisher.queue_declare(routing_key, durable=True)
+                    self._declared.add(routing_key)
+        # 各条 publish 按顺序写入同一 channel，再一起等待确认
+        await asyncio.gather(*(publisher.publish(routing_key, body, properties)
+                               for routing_key, body, properties in messages))
+
+    def submit(self, messages, declare=False):
+        """
+        Hand ``[(routing_key, body, properties)]`` to the publisher thread without waiting;
+        the returned ``concurrent.futures.Future`` resolves once the broker has confirmed all of them.
+        ``declare`` declares each routing key as a durable queue on first use.
+        """
+        if self._loop is None or self.pid != os.getpid():
+            self._start()
+        publisher = self._publishers[next(self._next) % len(self._publishers)]
+        return asyncio.run_coroutine_threadsafe(self._publish(publisher, list(messages), declare), self._loop)
+
+    def wait(self, future):
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"RabbitMQ did not confirm the publish within {self.timeout}s") from None
+
+    def publish(self, routing_key, body, properties=None, declare=False):
+        self.wait(self.submit([(routing_key, body, properties)], declare))
+
+    def publish_many(self, messages, declare=False):
+        """Publish ``[(routing_key, body, properties)]`` and wait for the broker to confirm all of them."""
+        messages = list(messages)
+        if messages:
+            self.wait(self.submit(messages, declare))
+
+    def stats(self):
+        totals = {"size": self.size, "open": 0, "published": 0, "confirmed": 0, "nacked": 0, "unconfirmed": 0,
+                  "reconnects": 0}
+        for publisher in list(self._publishers):
+            for name, value in publisher.stats().items():
+                totals[name] += int(value)
+        return totals
+
+    def close(self):
+        with self._lock:
+            loop, thread, publishers = self._loop, self._thread, self._publishers
+            self._loop, self._thread, self._publishers = None, None, []
+            if loop is None or self.pid != os.getpid():
+                return
+
+            async def close_all():
+                await asyncio.gather(*(publisher.close() for publisher in publishers), return_exceptions=True)
+
+            try:
+                asyncio.run_coroutine_threadsafe(close_all(), loop).result(self.timeout)
+            except concurrent.futures.TimeoutError:
+                print(f"关闭 RabbitMQ 发布连接超时（{self.timeout}s）")
+            finally:
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join(self.timeout)
+                if not thread.is_alive():
+                    loop.close()
@@ -0,0 +1,228 @@
+import argparse
+import os
+import time
+
+
+# 内存报告中的任务年龄分段（秒）
+AGE_BUCKETS = [
+    ("< 5m", 5 * 60),
+    ("5m - 1h", 60 * 60),
+    ("1h - 24h", 24 * 60 * 60),
+    (">= 24h", float("inf")),
+]
+
+# 不属于某个具体任务的全局 key
+GLOBAL_KEYS = {"runner-tasks", "runner-tasks-minio-gc"}
+# 按任务划分的 key 前缀（runner-fair-* 等按队列 / 租户划分的 key 不计入）
+TASK_KEY_PREFIXES = ("runner-node", "runner-blob")
+
+
+class Retention:
+    """
+    任务图在 Redis 中的生命周期管理。
+
+    - ``finish(task_id)``：任务结束后为其所有 key（节点哈希、计数器、waiters、结果列表、blob）
+      设置 ``retention`` 秒的过期时间；
+    - ``sweep()``：把创建超过 ``abandon_after`` 秒仍未结束的任务按同样方式过期，
+      删除已到期任务在 MinIO 中的 blob，并把 key 已全部过期的任务移出注册表；
+    - ``report()``：按任务年龄统计 key 数与内存占用。
+
+    ``init_task.lua`` 在任务首次提交节点时把它登记到 ``runner-tasks``（score 为创建时间）。
+    节点哈希 ``runner-node:{task_id}`` 带有过期时间即表示任务已结束。
+    """
+
+    def __init__(self, ctx, retention=None, abandon_after=None):
+        self.ctx = ctx
+        self.retention = int(os.getenv("TASK_RETENTION", "3600")) if retention is None else retention
+        self.abandon_after = (
+            int(os.getenv("TASK_ABANDON_AFTER", str(24 * 60 * 60))) if abandon_after is None else abandon_after
+        )
+
+    def finish(self, task_id, retention=None):
+        """Expire every key of ``task_id`` after ``retention`` seconds. Returns the number of allocated exec_ids."""
+        retention = self.retention if retention is None else retention
+        node_cnt, _ = self.ctx.expire_task(
+            keys=[
+                f"runner-node:{task_id}",
+                f"runner-node-counter:{task_id}",
+                f"runner-node-waiters:{task_id}",
+                f"runner-node-result:{task_id}",
+                f"runner-blob-index:{task_id}",
+                f"runner-blob:{task_id}",
+                "runner-tasks-minio-gc",
+                f"runner-node-stream:{task_id}",
+            ],
+            args=[task_id, retention],
+        )
+        return node_cnt
+
+    def sweep(self, adopt=False):
+        """
+        Reclaim abandoned tasks and delete expired MinIO blobs.
+
+        With ``adopt`` set, tasks found in Redis but missing from the registry (created before
+        it existed) are registered now, so they are reclaimed after ``abandon_after``.
+        Returns ``(expired task count, MinIO object count)``.
+        """
+        redis = self.ctx.redis
+        now = redis.time()[0]
+
+        if adopt:
+            for task_id in self._scan_tasks():
+                redis.zadd("runner-tasks", {task_id: now}, nx=True)
+
+        stale = redis.zrangebyscore("runner-tasks", "-inf", now - self.abandon_after)
+        pipe = redis.pipeline(transaction=False)
+        for task_id in stale:
+            pipe.ttl(f"runner-node:{task_id}")
+        abandoned = 0
+        for task_id, ttl in zip(stale, pipe.execute()):
+            if ttl == -1:
+                # 没有过期时间：从未 finish 的任务
+                self.finish(task_id)
+                abandoned += 1
+            elif ttl == -2:
+                # key 已全部过期
+                redis.zrem("runner-tasks", task_id)
+
+        removed = 0
+        for task_id in redis.zrangebyscore("runner-tasks-minio-gc", "-inf", now):
+            removed += self._delete_minio_blobs(task_id)
+            redis.zrem("runner-tasks-minio-gc", task_id)
+        return abandoned, removed
+
+    def _delete_minio_blobs(self, task_id):
+        minio, bucket = self.ctx.minio, self.ctx.blobs.bucket
+        if not minio.bucket_exists(bucket):
+            return 0
+        removed = 0
+        for obj in minio.list_objects(bucket, prefix=f"{task_id}/"):
+            minio.remove_object(bucket, obj.object_name)
+            removed += 1
+        return removed
+
+    def _scan_tasks(self):
+        tasks = set()
+        for key in self.ctx.redis.scan_iter(match="runner-*", count=1000):
+            task_id = self._task_of(key)
+            if task_id is not None:
+                tasks.add(task_id)
+        return tasks
+
+    @staticmethod
+    def _task_of(key):
+        # runner-node*:{task_id}[:exec_id] / runner-blob*:{task_id}[:digest]
+        if key in GLOBAL_KEYS or not key.startswith(TASK_KEY_PREFIXES):
+            return None
+        parts = key.split(":")
+        return parts[1] if len(parts) > 1 else None
+
+    def report(self, top=10):
+        """
+        Collect key counts and bytes (``MEMORY USAGE``) per task.
+
+        Returns ``(rows, tasks)``: ``rows`` aggregates tasks by age bucket, ``tasks`` lists
+        the ``top`` largest tasks as ``(task_id, age, finished, keys, bytes)``.
+        """
+        redis = self.ctx.redis
+        now = redis.time()[0]
+        created = {task_id: score for task_id, score in redis.zrange("runner-tasks", 0, -1, withscores=True)}
+
+        stats = {}
+        keys = [key for key in redis.scan_iter(match="runner-*", count=1000) if self._task_of(key) is not None]
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            pipe = redis.pipeline(transaction=False)
+            for key in chunk:
+                pipe.memory_usage(key)
+            for key, size in zip(chunk, pipe.execute()):
+                entry = stats.setdefault(self._task_of(key), [0, 0])
+                entry[0] += 1
+                entry[1] += size or 0
+
+        # 已结束的任务：节点哈希带有过期时间
+        task_ids = list(stats)
+        pipe = redis.pipeline(transaction=False)
+        for task_id in task_ids:
+            pipe.ttl(f"runner-node:{task_id}")
+        ttls = dict(zip(task_ids, pipe.execute()))
+
+        rows = {label: [0, 0, 0, 0] for label, _ in AGE_BUCKETS}
+        rows["unregistered"] = [0, 0, 0, 0]
+        tasks = []
+        for task_id, (key_cnt, size) in stats.items():
+            finished = ttls[task_id] >= 0
+            if task_id in created:
+                age = now - created[task_id]
+                label = next(label for label, limit in AGE_BUCKETS if age < limit)
+            else:
+                # 注册表出现前创建的任务
+                age = None
+                label = "unregistered"
+            row = rows[label]
+            row[0] += 1
+            row[1] += finished
+            row[2] += key_cnt
+            row[3] += size
+            tasks.append((task_id, age, finished, key_cnt, size))
+
+        tasks.sort(key=lambda t: t[4], reverse=True)
+        return rows, tasks[:top]
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def print_report(rows, tasks):
+    print(f"{'age':<14} {'tasks':>8} {'finished':>9} {'keys':>10} {'bytes':>12}")
+    for label, (task_cnt, finished, key_cnt, size) in rows.items():
+        print(f"{label:<14} {task_cnt:>8} {finished:>9} {key_cnt:>10} {_format_bytes(size):>12}")
+    if tasks:
+        print()
+        print(f"{'largest tasks':<34} {'age':>8} {'finished':>9} {'keys':>10} {'bytes':>12}")
+        for task_id, age, finished, key_cnt, size in tasks:
+            age = "-" if age is None else f"{age / 60:.0f}m"
+            print(f"{task_id:<34} {age:>8} {str(finished):>9} {key_cnt:>10} {_format_bytes(size):>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Task retention: memory report, sweeper and manual expiry.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = sub.add_parser("report", help="key counts and bytes per task age")
+    report_parser.add_argument("--top", type=int, default=10, help="number of largest tasks to list")
+
+    sweep_parser = sub.add_parser("sweep", help="expire abandoned tasks and delete expired MinIO blobs")
+    sweep_parser.add_argument("--interval", type=int, default=0, help="repeat every N seconds, 0 to run once")
+    sweep_parser.add_argument("--abandon-after", type=int, default=None, help="seconds before an unfinished task is reclaimed")
+    sweep_parser.add_argument("--retention", type=int, default=None, help="seconds to keep keys after expiry is set")
+    sweep_parser.add_argument("--adopt", action="store_true", help="register tasks missing from the registry")
+
+    finish_parser = sub.add_parser("finish", help="mark tasks complete and expire their keys")
+    finish_parser.add_argument("task_ids", nargs="+")
+    finish_parser.add_argument("--retention", type=int, default=None)
+
+    cli_args = parser.parse_args()
+
+    from core.Context import Context
+
+    with Context() as ctx:
+        if cli_args.command == "report":
+            print_report(*Retention(ctx).report(top=cli_args.top))
+        elif cli_args.command == "finish":
+            retention = Retention(ctx, retention=cli_args.retention)
+            for tid in cli_args.task_ids:
+                print(f"{tid}: keys of {retention.finish(tid)} exec_ids expire in {retention.retention}s")
+        else:
+            retention = Retention(ctx, retention=cli_args.retention, abandon_after=cli_args.abandon_after)
+            while True:
+                expired, removed = retention.sweep(adopt=cli_args.adopt)
+                print(f"expired {expired} abandoned tasks, removed {removed} MinIO blobs")
+                if cli_args.interval <= 0:
+                    break
+                time.sleep(cli_args.interval)
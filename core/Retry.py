@@ -0,0 +1,65 @@
+import functools
+import random
+
+
+@functools.lru_cache(maxsize=None)
+def transient_errors():
+    """与算子无关的基础设施瞬时错误：连接中断、超时、MinIO（urllib3）请求失败。"""
+    # 首次判断是否重试时才导入 redis / urllib3
+    import redis
+    import urllib3
+    return (
+        ConnectionError,
+        TimeoutError,
+        redis.exceptions.ConnectionError,
+        redis.exceptions.TimeoutError,
+        urllib3.exceptions.HTTPError,
+    )
+
+
+def __getattr__(name):
+    if name == "TRANSIENT_ERRORS":
+        return transient_errors()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class RetryPolicy:
+    """
+    算子失败后的重试策略，由 ``Computable.retry`` 类属性声明（默认 :data:`NO_RETRY`，幂等的算子显式开启）。
+
+    只有 ``retry_on`` 中的异常会重试，最多执行 ``max_attempts`` 次（含第一次）。
+    第 n 次失败后等待 ``[0, min(max_delay, base_delay * multiplier ** (n - 1))]`` 内的
+    随机时间（full jitter）再重新入队；等待期间 job 保存在 Redis 中，不占用 Runner 线程。
+
+    ``retry_on`` 也可以是返回异常元组的函数，第一次用到时才调用，
+    算子可以据此引用延迟导入的库（如 litellm）中的异常类型。
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=60.0, multiplier=2.0, retry_on=transient_errors):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self._retry_on = retry_on if callable(retry_on) and not isinstance(retry_on, type) else tuple(retry_on)
+
+    @property
+    def retry_on(self):
+        if not isinstance(self._retry_on, tuple):
+            self._retry_on = tuple(self._retry_on())
+        return self._retry_on
+
+    def should_retry(self, exc, attempt):
+        """``attempt`` is the number of executions so far, including the one that raised ``exc``."""
+        return attempt < self.max_attempts and isinstance(exc, self.retry_on)
+
+    def delay(self, attempt):
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return random.uniform(0, cap)
+
+    def __repr__(self):
+        return (f"RetryPolicy(max_attempts={self.max_attempts}, base_delay={self.base_delay}, "
+                f"max_delay={self.max_delay}, retry_on={[e.__name__ for e in self.retry_on]})")
+
+
+# 不重试
+NO_RETRY = RetryPolicy(max_attempts=1)
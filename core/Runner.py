@@ -1,25 +1,214 @@
-import json
-import importlib
+import argparse
+import contextvars
+import functools
+import inspect
 import multiprocessing
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
-import pika
-
+from core.BlobStore import BlobRef
 from core.ComputableResult import ComputableResult
-from core.Context import get_context, Context
+from core.Context import get_context, Context, QUEUE_CLASSES
+from core.DeadLetter import DeadLetter
+from core.Errors import TaskCancelled, UpstreamError
+from core.FairScheduler import FairScheduler
+from core.LaneScheduler import LANES, LaneScheduler
+from core.Memo import Memo
+from core.Metrics import RunnerMetrics, serve
+from core.OperatorPool import OperatorPool
+from core.Retry import NO_RETRY
 from core.Utils import deserialize, serialize
 
 
 class Runner:
-    def __init__(self):
+    """
+    任务执行进程。
+
+    ``threads`` 为 1 时在连接线程上直接执行 compute；大于 1 时使用线程池执行，
+    prefetch 与线程数一致，连接线程只负责收消息和心跳，ack 通过 ``add_callback_threadsafe``
+    交回连接线程，长时间的 LLM 调用不会阻塞心跳。就绪的子任务经 ``ctx.submit_many`` 由
+    :class:`core.PublisherPool.PublisherPool` 批量发布，各工作线程直接发布并等待 broker 确认后才 ack。
+    算子实例由 :class:`core.OperatorPool.OperatorPool` 复用，``pool_size`` 为 0 时每个任务都新建实例。
+    ``queues`` 为要消费的队列类别（见 ``Computable.queue_class``），可为不同类别分别启动
+    进程数、线程数不同的 Runner，例如 ``--queues llm --threads 32`` 与 ``--queues cpu``。
+    每个类别按 ``lanes``（interactive / default / batch）各有一个队列；消费多个通道时，
+    收到的消息先进入 :class:`core.LaneScheduler.LaneScheduler`，工作线程优先执行高优先级通道，
+    低优先级通道连续被跳过 ``starvation_limit`` 次后必定执行一次。
+    ``metrics_port`` 非 0 时在该端口导出 Prometheus 指标（见 :class:`core.Metrics.RunnerMetrics`）。
+    compute 失败时按算子的 ``retry`` 策略（:class:`core.Retry.RetryPolicy`）延迟重试：job 放入
+    ``runner-retry`` 后立即 ack，各 Runner 每 ``retry_interval`` 秒取出到期的 job 重新入队；
+    最终失败的 job 写入 :class:`core.DeadLetter.DeadLetter`。
+    ``compute`` 是生成器时，每个 ``yield`` 的 chunk 追加到该节点的 Redis Stream
+    （``ComputableResult.stream()`` 读取），生成器的返回值作为结果。
+    """
+
+    def __init__(self, threads=1, pool_size=64, queues=QUEUE_CLASSES, lanes=LANES, starvation_limit=8,
+                 metrics_port=0, retry_interval=1.0):
         self.ctx = get_context()
         self.redis = self.ctx.redis
         self.ch = self.ctx.channel
+        self.threads = threads
+        unknown = set(lanes) - set(LANES)
+        if unknown:
+            raise ValueError(f"Unknown lanes {sorted(unknown)}, expected a subset of {LANES}")
+        self.lanes = [lane for lane in LANES if lane in lanes]
+        self.queues = [
+            (self.ctx.queue_name(queue_class, lane), lane) for queue_class in queues for lane in self.lanes
+        ]
+        self.scheduler = LaneScheduler(self.lanes, starvation_limit)
+        self.operators = OperatorPool(max_size=pool_size)
+        self.memo = Memo(self.ctx)
+        self.metrics = RunnerMetrics(buffered=lambda: len(self.scheduler))
+        self.metrics_port = metrics_port
+        self.dead_letter = DeadLetter(self.ctx)
+        self.retry_interval = retry_interval
+        self._pool = None
+        # 为 True 时 ack 交给连接线程执行
+        self._marshal_acks = False
 
     def start(self):
-        self.ch.basic_consume(queue=self.ctx.queue, on_message_callback=self._on_message)
-        self.ch.start_consuming()
+        if self.metrics_port:
+            serve(self.metrics.registry, self.metrics_port)
+        self.ctx.connection.call_later(self.retry_interval, self._poll_retries)
+        scheduled = self.threads > 1 or len(self.lanes) > 1
+        if scheduled:
+            # prefetch 按消费者计算：低优先级消息占满窗口时，高优先级消息仍能送达本地缓冲
+            self.ch.basic_qos(prefetch_count=self.threads)
+            self._marshal_acks = True
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="runner")
+        for queue, lane in self.queues:
+            self.ctx.declare_queue(queue)
+            callback = functools.partial(self._dispatch, lane) if scheduled else self._on_message
+            self.ch.basic_consume(queue=queue, on_message_callback=callback)
+        try:
+            self.ch.start_consuming()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+
+    def _dispatch(self, lane, ch, method, props, body):
+        """在连接线程上收到消息后放入通道缓冲，交给线程池执行。"""
+        self.scheduler.put(lane, (ch, method, props, body, time.time()))
+        # 每个任务运行在连接线程上下文的副本中：当前 Context 可见，set_task 互不影响
+        run = contextvars.copy_context().run
+        future = self._pool.submit(run, self._run_next)
+        future.add_done_callback(self._report_crash)
+
+    def _run_next(self):
+        # 每条消息对应一次提交，取出的是当前优先级最高的消息，不一定是刚收到的那条
+        item = self.scheduler.get()
+        if item is not None:
+            self._on_message(*item)
+
+    @staticmethod
+    def _report_crash(future):
+        exc = future.exception()
+        if exc is not None:
+            print(f"Runner 线程异常退出: {exc}")
+            traceback.print_exception(exc)
+
+    def _ack(self, ch, method):
+        if self._marshal_acks:
+            self.ctx.connection.add_callback_threadsafe(
+                functools.partial(ch.basic_ack, delivery_tag=method.delivery_tag)
+            )
+        else:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+    def _poll_retries(self):
+        # 在连接线程上运行：取出到期的重试重新入队，再安排下一次轮询
+        try:
+            ready_jobs = self.ctx.retry_due(keys=["runner-retry"], args=[f"{time.time():.6f}", 100])
+            self._submit_ready(ready_jobs)
+        except Exception as e:
+            print(f"重试轮询失败: {e}")
+        finally:
+            self.ctx.connection.call_later(self.retry_interval, self._poll_retries)
+
+    def _submit_ready(self, ready_jobs):
+        # 脚本返回 [queue, job, queue, job, ...]
+        self.ctx.submit_many(
+            (ready_job.encode('latin1'), queue or self.ctx.queue)
+            for queue, ready_job in zip(ready_jobs[::2], ready_jobs[1::2])
+        )
+
+    def _schedule_retry(self, job, instance, exc):
+        """Put the failed job in ``runner-retry`` if its policy allows; returns the attempt count and delay."""
+        if instance is None:
+            # 读取参数或构造实例时失败，使用算子类上的策略
+            try:
+                instance = self.operators.load_class(job["task"])
+            except Exception:
+                instance = None
+        policy = getattr(instance, "retry", None) or NO_RETRY
+        task_id, exec_id = job["task_id"], job["exec_id"]
+        task_key = f"runner-node:{task_id}"
+        attempt = self.redis.hincrby(task_key, f"attempt:{exec_id}", 1)
+        if not policy.should_retry(exc, attempt):
+            return attempt, None
+        delay = policy.delay(attempt)
+        pipe = self.redis.pipeline()
+        # 等待重试期间保持 PENDING，新提交的子任务照常计入依赖
+        pipe.hset(task_key, f"state:{exec_id}", "PENDING")
+        # 重试从头重新产出 chunk
+        pipe.delete(f"runner-node-stream:{task_id}:{exec_id}")
+        pipe.zadd("runner-retry", {f"{task_id}:{exec_id}": time.time() + delay})
+        pipe.execute()
+        return attempt, delay
 
-    def _on_message(self, ch, method, props, body):
+    def _cascade(self, task_id, failed_id):
+        """Fail every unfinished node downstream of ``failed_id`` (already ERROR) with its error."""
+        raw = self.redis.lindex(f"runner-node-result:{task_id}:{failed_id}", 0)
+        downstream = UpstreamError.downstream(failed_id, deserialize(raw))
+        return self.ctx.fail_task(
+            keys=[f"runner-node:{task_id}", f"runner-node-waiters:{task_id}", f"runner-node-result:{task_id}",
+                  f"runner-node-stream:{task_id}"],
+            args=[failed_id, "", serialize(downstream)[1], f"runner-node-done:{task_id}"],
+        )
+
+    def _release_fair_slot(self, props):
+        # 由公平调度器放行的消息带有租户头，执行完后归还在途名额
+        headers = getattr(props, "headers", None) or {}
+        if "fair-tenant" in headers:
+            FairScheduler.release_slot(self.redis, headers["fair-queue"], headers["fair-tenant"])
+
+    def _compute(self, job, instance, args, kwargs):
+        """
+        调用 ``compute``，返回 ``(结果, 是否产出了 stream)``；
+        ``memoize`` 的算子先查跨任务结果缓存，执行后回填。
+        """
+        digest = None
+        if instance.memoize:
+            digest = self.memo.key(job["task"], job.get("init_args", []), job.get("init_kwargs", {}), args, kwargs)
+        if digest is not None and not job.get("memo_bypass"):
+            hit, res = self.memo.get(job["task"], digest)
+            if hit:
+                return res, False
+
+        start = time.perf_counter()
+        res = instance.compute(*args, **kwargs)
+        streamed = inspect.isgenerator(res)
+        if streamed:
+            res = self._stream(job, res)
+        # 返回子图的任务与本任务绑定，不能跨任务复用；None 多为算子吞掉错误后的返回（如 Embedding），不缓存
+        if digest is not None and res is not None and not isinstance(res, ComputableResult):
+            self.memo.put(digest, res, (time.perf_counter() - start) * 1000, instance.memo_ttl)
+        return res, streamed
+
+    def _stream(self, job, gen):
+        """Append each chunk ``gen`` yields to the node's stream; returns its return value (the chunks if ``None``)."""
+        key = f"runner-node-stream:{job['task_id']}:{job['exec_id']}"
+        chunks = []
+        while True:
+            try:
+                chunk = next(gen)
+            except StopIteration as stop:
+                return chunks if stop.value is None else stop.value
+            chunks.append(chunk)
+            self.redis.xadd(key, {"chunk": serialize(chunk)[1]})
+
+    def _on_message(self, ch, method, props, body, dequeued_at=None):
         """
         job = {
             "exec_id": "12345",
@@ -40,33 +229,88 @@ class Runner:
         2. set: runner-node-waiters:{task_id}:{exec_id} (子任务等待队列)
         3. int: runner-node-counter:{task_id} (任务计数，用于分配 exec_id)
         4. list: runner-node-result:{task_id}:{exec_id} string (结果 / 错误信息)
+        4.1 string: runner-blob:{task_id}:{digest} (超过阈值的参数 / 结果，job 与结果中只保存 BlobRef)
+        4.2 set: runner-blob-index:{task_id} (任务用到的 blob 摘要)
+        (hash 中另有 queue:{exec_id}：任务所属的 RabbitMQ 队列，依赖完成后发布到该队列)
+        (以及 t_submit / t_ready / t_dequeue / t_start / t_finish:{exec_id} 时间戳与 inner:{exec_id}，
+         由 core.profile 重建任务图的关键路径)
+        (attempt:{exec_id}：失败次数，见 core.Retry)
+        5. channel: runner-node-done:{task_id} (任务完成时发布 exec_id，供 gather / as_completed 等待)
+        6. zset: runner-retry ({task_id}:{exec_id} -> 重试到期时间)
+        7. stream: runner-node-stream:{task_id}:{exec_id} (生成器算子产出的 chunk，结束时追加 end 条目)
+        (hash 中的 cancelled 字段：任务已取消，出队的 job 不再执行，见 cancel_task.lua)
+
+        任务最终失败时由 fail_task.lua 沿 waiters / finish_pointer 把所有下游节点同时置为 ERROR。
 
         """
+        self.metrics.inflight.inc()
+        try:
+            self._execute(ch, method, props, body, dequeued_at)
+        finally:
+            self.metrics.inflight.dec()
+
+    def _execute(self, ch, method, props, body, dequeued_at):
+        # 线程池模式下消息在通道缓冲中等待的时间也计入排队
+        t_dequeue = dequeued_at or time.time()
+        t_start = None
+        instance = None
+        start = time.perf_counter()
         job = deserialize(body)
+        self.metrics.deserialize_seconds.observe(time.perf_counter() - start)
         exec_id = job["exec_id"]
         task_id = job["task_id"]
 
-        # 设置当前上下文的任务 ID
+        # 设置当前上下文的任务 ID 与优先级（任务中提交的子任务沿用）
         self.ctx.set_task(task_id)
+        self.ctx.priority = job.get("priority", "default")
+        self.ctx.tenant = job.get("tenant")
+        self.ctx.memo_bypass = job.get("memo_bypass", False)
+        self.ctx.deadline = job.get("deadline")
 
         task_key = f"runner-node:{task_id}"
-        result_key = f"runner-node-result:{task_id}:{exec_id}"
 
         try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hget(task_key, f"state:{exec_id}")
+            pipe.hget(task_key, f"t_ready:{exec_id}")
+            pipe.hget(task_key, "cancelled")
+            state, t_ready, cancelled = pipe.execute()
+            if state == "FINISHED":
+                # 发布是至少一次的（重连后重发未确认的消息）：节点已完成时直接 ack，不再执行。
+                # 公平调度的名额已由第一次投递归还，这里不再归还；
+                # 已被取消（ERROR）的节点仍走下面的取消流程，第一次出队时要归还名额
+                self._ack(ch, method)
+                print(f"任务 {exec_id} 已完成，跳过重复投递")
+                return
+            if t_ready is not None:
+                wait = max(t_dequeue - float(t_ready), 0.0)
+                self.metrics.queue_wait_seconds.labels(queue=method.routing_key).observe(wait)
+            if cancelled is None and self.ctx.deadline is not None and t_dequeue >= self.ctx.deadline:
+                # 第一个发现超时的 Runner 取消整个任务，其余节点不再入队
+                cancelled = "deadline"
+                self.ctx.cancel(task_id, cancelled)
+            if cancelled is not None:
+                # 先于 RUNNING 检查：cancel_task.lua 已把节点置为 ERROR，不能覆盖
+                raise TaskCancelled.of(task_id, cancelled)
             self.redis.hset(task_key, f"state:{exec_id}", "RUNNING")
             args = []
 
             def get_value(exec_id_):
                 key = f"runner-node-result:{task_id}:{exec_id_}"
                 state = self.redis.hget(task_key, f"state:{exec_id_}")
+                raw = self.redis.lindex(key, 0)
                 if state == "ERROR":
-                    raise RuntimeError(f"Previous task {arg['exec_id']} failed")
-                raw = self.redis.lrange(key, 0, -1)[0]
-                return deserialize(raw)
+                    # 依赖在本任务入队后才失败（通常已由 fail_task 级联，不会执行到这里）
+                    raise UpstreamError(UpstreamError.downstream(exec_id_, deserialize(raw)))
+                # 只取回结果中的 blob：结果里的句柄原样交给算子，不等待对应节点
+                return self.ctx.blobs.resolve(task_id, deserialize(raw))
 
             def get_value_obj(obj):
                 if isinstance(obj, ComputableResult):
                     return get_value(obj.exec_id)
+                elif isinstance(obj, BlobRef):
+                    # 大参数按需取回（进程内有 LRU 缓存）
+                    return self.ctx.blobs.get(task_id, obj)
                 elif isinstance(obj, dict):
                     return {get_value_obj(k): get_value_obj(v) for k, v in obj.items()}
                 elif isinstance(obj, list):
@@ -82,70 +326,127 @@ class Runner:
             for k, v in job.get("kwargs", {}).items():
                 kwargs[k] = get_value_obj(v)
 
-            # 动态加载 operator 并执行
-            module_path, cls_name = job["task"].rsplit(".", 1)
-            module = importlib.import_module(module_path)
-            cls = getattr(module, cls_name)
+            # 从实例池取出（或动态加载并构造）operator 并执行
             init_args = job.get("init_args", [])
             init_kwargs = job.get("init_kwargs", {})
-            instance = cls(*init_args, **init_kwargs)
-            compute = instance.compute
-
-            res = compute(*args, **kwargs)
+            instance, pool_key = self.operators.acquire(job["task"], init_args, init_kwargs)
+            try:
+                t_start = time.time()
+                res, streamed = self._compute(job, instance, args, kwargs)
+            finally:
+                self.operators.release(instance, pool_key)
         except Exception as e:
             # 获取递归栈
-            import traceback
             stack = traceback.format_exc()
-            self.redis.hset(task_key, f"state:{exec_id}", "ERROR")
-            self.redis.lpush(result_key, serialize({"error": str(e), "stack": stack})[1])
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            t_finish = time.time()
+            if t_start is not None:
+                self.metrics.compute_seconds.labels(operator=job["task"]).observe(t_finish - t_start)
+            if isinstance(e, (UpstreamError, TaskCancelled)):
+                # 依赖失败或任务已取消：沿用同一份错误信息，不重试，也不进入死信
+                error = downstream = e.error
+            else:
+                attempt, delay = self._schedule_retry(job, instance, e)
+                if delay is not None:
+                    self.metrics.jobs.labels(operator=job["task"], status="retry").inc()
+                    self._release_fair_slot(props)
+                    self._ack(ch, method)
+                    print(f"任务 {exec_id} 第 {attempt} 次执行失败，{delay:.1f}s 后重试: {e}")
+                    return
+                error = {"error": str(e), "stack": stack}
+                downstream = UpstreamError.downstream(exec_id, error)
+            status = "cancelled" if isinstance(e, TaskCancelled) else "error"
+            self.metrics.jobs.labels(operator=job["task"], status=status).inc()
+            pipe = self.redis.pipeline()
+            pipe.hset(task_key, mapping={
+                f"t_dequeue:{exec_id}": f"{t_dequeue:.6f}",
+                f"t_start:{exec_id}": f"{t_start or t_finish:.6f}",
+                f"t_finish:{exec_id}": f"{t_finish:.6f}",
+            })
+            # 写入错误并一次性级联到所有下游节点
+            self.ctx.fail_task(
+                keys=[task_key, f"runner-node-waiters:{task_id}", f"runner-node-result:{task_id}",
+                      f"runner-node-stream:{task_id}"],
+                args=[exec_id, serialize(error)[1], serialize(downstream)[1], f"runner-node-done:{task_id}"],
+                client=pipe,
+            )
+            if not isinstance(e, (UpstreamError, TaskCancelled)):
+                self.dead_letter.add(pipe, job, body, method.routing_key, attempt, str(e), stack)
+            pipe.execute()
+            self._release_fair_slot(props)
+            self._ack(ch, method)
+            if isinstance(e, TaskCancelled):
+                print(f"任务 {exec_id} 已跳过: {e}")
+                return
             print(f"任务 {exec_id} 执行失败: {e}")
             print(stack)
             # raise RuntimeError(f"任务 {exec_id} 执行失败: {e}")
         else:
-            # 成功
+            # 成功：一次原子脚本完成 结果写入 + finish_pointer 链 + 子任务 dep_cnt 递减
+            keys = [task_key, f"runner-node-waiters:{task_id}", f"runner-node-result:{task_id}",
+                    f"runner-node-stream:{task_id}"]
+            done_channel = f"runner-node-done:{task_id}"
+            t_finish = time.time()
+            timestamps = [f"{t_dequeue:.6f}", f"{t_start:.6f}", f"{t_finish:.6f}"]
+            # 生成器算子的 stream end 条目由脚本在写入结果后追加
+            end_stream = "1" if streamed else ""
+            self.metrics.compute_seconds.labels(operator=job["task"]).observe(t_finish - t_start)
+            self.metrics.jobs.labels(operator=job["task"], status="finished").inc()
             if isinstance(res, ComputableResult):
-                # 如果是 ComputableResult 类型，说明当前的任务还没有完成
-                last_exec_id = res.exec_id
-                # 更新 finish_pointer
-                self.redis.hset(task_key, f"finish_pointer:{last_exec_id}", str(exec_id))
+                # 如果是 ComputableResult 类型，说明当前的任务要等 inner 完成才算完成
+                ready_jobs = self.ctx.complete_task(
+                    keys=keys, args=[exec_id, "", res.exec_id, done_channel, *timestamps, end_stream]
+                )
+                if ready_jobs is None:
+                    # inner 已失败：把它的错误级联到当前任务及下游
+                    self._cascade(task_id, res.exec_id)
+                    ready_jobs = []
             else:
-                finish_exec_id_list = [exec_id]
-                while True:
-                    now_exec_id = finish_exec_id_list[-1]
-                    last_exec_id = self.redis.hget(task_key, f"finish_pointer:{now_exec_id}")
-                    if last_exec_id is None:
-                        break
-                    finish_exec_id_list.append(int(last_exec_id))
-
-                for feid in finish_exec_id_list:
-                    self.redis.hset(task_key, f"state:{feid}", "FINISHED")
-                    self.redis.lpush(f"runner-node-result:{task_id}:{feid}", serialize(res)[1])
-                    # 调度子任务
-                    children = self.redis.smembers(f"runner-node-waiters:{task_id}:{feid}") or []
-                    for cid in children:
-                        cnt = self.redis.hincrby(task_key, f"dep_cnt:{cid}", -1)
-                        if cnt == 0:
-                            # 发布到同一个队列
-                            self.ch.basic_publish(
-                                exchange='',
-                                routing_key=self.ctx.queue,
-                                body=self.redis.hget(task_key, f"job:{cid}").encode('latin1'),
-                                properties=pika.BasicProperties(delivery_mode=2)
-                            )
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+                res = self.ctx.blobs.intern(task_id, res)
+                start = time.perf_counter()
+                ser_res = serialize(res)[1]
+                self.metrics.serialize_seconds.observe(time.perf_counter() - start)
+                ready_jobs = self.ctx.complete_task(
+                    keys=keys, args=[exec_id, ser_res, "", done_channel, *timestamps, end_stream]
+                )
+
+            # 发布到子任务算子所属的队列（开启公平调度时进入租户就绪队列），确认后才 ack
+            self._submit_ready(ready_jobs)
+            self._release_fair_slot(props)
+            self._ack(ch, method)
 
 
 if __name__ == "__main__":
-    def run():
+    parser = argparse.ArgumentParser(description="Start runner worker processes.")
+    parser.add_argument("--processes", type=int, default=16, help="number of worker processes")
+    parser.add_argument("--threads", type=int, default=1, help="compute threads (and prefetch) per process")
+    parser.add_argument("--pool-size", type=int, default=64, help="idle operator instances kept per process, 0 to disable")
+    parser.add_argument(
+        "--queues", default=",".join(QUEUE_CLASSES),
+        help=f"comma-separated queue classes to consume (default: {','.join(QUEUE_CLASSES)})",
+    )
+    parser.add_argument(
+        "--lanes", default=",".join(LANES),
+        help=f"comma-separated priority lanes to consume (default: {','.join(LANES)})",
+    )
+    parser.add_argument("--starvation-limit", type=int, default=8,
+                        help="times a waiting lower lane may be passed over before it runs")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="export Prometheus metrics, process i on port N + i (0 to disable)")
+    cli_args = parser.parse_args()
+    queue_classes = [q.strip() for q in cli_args.queues.split(",") if q.strip()]
+    lanes = [lane.strip() for lane in cli_args.lanes.split(",") if lane.strip()]
+
+    def run(threads, pool_size, queues, metrics_port):
         with Context():
-            runner = Runner()
+            runner = Runner(threads=threads, pool_size=pool_size, queues=queues, lanes=lanes,
+                            starvation_limit=cli_args.starvation_limit, metrics_port=metrics_port)
             runner.start()
 
 
     mpl = []
-    for _ in range(16):
-        p = multiprocessing.Process(target=run)
+    for i in range(cli_args.processes):
+        metrics_port = cli_args.metrics_port + i if cli_args.metrics_port else 0
+        p = multiprocessing.Process(target=run, args=(cli_args.threads, cli_args.pool_size, queue_classes, metrics_port))
         p.start()
         mpl.append(p)
 
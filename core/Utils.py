@@ -1,43 +1,161 @@
 import io
 import os
 import shutil
+import threading
 import zipfile
+import zlib
 from pathlib import Path
 from typing import List
 
 import msgpack
-import zlib
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，缺失时退回 lz4 / zlib
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+# 线格式 v1：MAGIC(0xc1，msgpack 规范中永不出现的字节) + 版本 + 压缩算法 + msgpack 负载。
+# 不以 MAGIC 开头的数据按旧格式（纯 msgpack + __type__ 字典）解析。
+WIRE_MAGIC = 0xc1
+WIRE_VERSION = 1
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_LZ4 = 3
+
+# msgpack ExtType 编号
+EXT_COMPUTABLE_RESULT = 1
+EXT_BLOB_REF = 2
+
+# 超过该字节数的负载尝试压缩；压缩后没有变小则保留原文
+COMPRESS_THRESHOLD = int(os.getenv("SERIALIZE_COMPRESS_THRESHOLD", "1024"))
+
+
+def _default_codec():
+    forced = os.getenv("SERIALIZE_CODEC")
+    if forced:
+        return {"zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD, "lz4": CODEC_LZ4, "none": CODEC_NONE}[forced]
+    if zstandard is not None:
+        return CODEC_ZSTD
+    if lz4 is not None:
+        return CODEC_LZ4
+    return CODEC_ZLIB
+
+
+COMPRESS_CODEC = _default_codec()
+
+# zstd 的压缩 / 解压对象不能被多个线程同时使用
+_zstd_local = threading.local()
+
+
+def _compress(codec, data):
+    if codec == CODEC_ZSTD:
+        if not hasattr(_zstd_local, "compressor"):
+            _zstd_local.compressor = zstandard.ZstdCompressor(level=3)
+        return _zstd_local.compressor.compress(data)
+    if codec == CODEC_LZ4:
+        return lz4.frame.compress(data)
+    return zlib.compress(data, 1)
+
+
+def _decompress(codec, data):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("payload is zstd-compressed but the zstandard package is not installed")
+        if not hasattr(_zstd_local, "decompressor"):
+            _zstd_local.decompressor = zstandard.ZstdDecompressor()
+        return _zstd_local.decompressor.decompress(data)
+    if codec == CODEC_LZ4:
+        if lz4 is None:
+            raise ValueError("payload is lz4-compressed but the lz4 package is not installed")
+        return lz4.frame.decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"unknown codec {codec}")
+
+
+_ext_classes = None
+
+
+def _load_ext_classes():
+    # 延迟导入，避免与 ComputableResult / BlobStore 循环引用
+    global _ext_classes
+    if _ext_classes is None:
+        from core.ComputableResult import ComputableResult
+        from core.BlobStore import BlobRef
+        _ext_classes = ComputableResult, BlobRef
+    return _ext_classes
 
 # pack 时的钩子
 def cr_default(obj):
-    from core.ComputableResult import ComputableResult
+    ComputableResult, BlobRef = _ext_classes or _load_ext_classes()
     if isinstance(obj, ComputableResult):
-        return {
-            "__type__": "ComputableResult",
-            "exec_id": obj.exec_id
-        }
-    # 其他类型交给 msgpack 处理
-    return obj
+        return msgpack.ExtType(EXT_COMPUTABLE_RESULT, msgpack.packb(obj.exec_id))
+    if isinstance(obj, BlobRef):
+        return msgpack.ExtType(EXT_BLOB_REF, msgpack.packb([obj.digest, obj.size, obj.store]))
+    raise TypeError(f"Cannot serialize object of type {type(obj).__name__}")
 
 # unpack 时的钩子
+def cr_ext_hook(code, data):
+    if code == EXT_COMPUTABLE_RESULT:
+        ComputableResult, _ = _ext_classes or _load_ext_classes()
+        return ComputableResult(msgpack.unpackb(data))
+    if code == EXT_BLOB_REF:
+        _, BlobRef = _ext_classes or _load_ext_classes()
+        return BlobRef(*msgpack.unpackb(data, raw=False))
+    return msgpack.ExtType(code, data)
+
+# 旧格式 unpack 时的钩子（ComputableResult / BlobRef 编码为带 __type__ 的字典）
 def cr_object_hook(obj):
-    from core.ComputableResult import ComputableResult
-    if obj.get("__type__") == "ComputableResult":
+    type_ = obj.get("__type__")
+    if type_ == "ComputableResult":
+        from core.ComputableResult import ComputableResult
         exec_id = obj["exec_id"]
         return ComputableResult(exec_id)
+    if type_ == "BlobRef":
+        from core.BlobStore import BlobRef
+        return BlobRef(obj["digest"], obj["size"], obj["store"])
     return obj
 
-def serialize(obj, compress=False) -> tuple[bytes, str]:
+def serialize(obj, compress=None) -> tuple[bytes, str]:
+    """
+    Serialize ``obj`` to the v1 wire format.
+
+    ``compress=None`` compresses payloads larger than ``COMPRESS_THRESHOLD`` when that
+    actually saves space; ``True`` always compresses and ``False`` never does.
+    """
     try:
         packed = msgpack.packb(obj, use_bin_type=True, default=cr_default)
-        data   = zlib.compress(packed) if compress else packed
+        codec = CODEC_NONE
+        if compress or (compress is None and len(packed) > COMPRESS_THRESHOLD):
+            compressed = _compress(COMPRESS_CODEC, packed)
+            if compress or len(compressed) < len(packed):
+                codec, packed = COMPRESS_CODEC, compressed
+        data = bytes((WIRE_MAGIC, WIRE_VERSION, codec)) + packed
         return data, data.decode('latin1')
     except Exception as e:
         raise ValueError(f"Serialization failed: {e}")
 
 def deserialize(s: bytes | str, compressed=False):
+    """
+    Inverse of :func:`serialize`. ``compressed`` only applies to legacy (pre-v1)
+    payloads written with ``serialize(obj, compress=True)``.
+    """
     try:
         data = s if isinstance(s, bytes) else s.encode('latin1')
+        if data[:1] == bytes((WIRE_MAGIC,)):
+            version, codec = data[1], data[2]
+            if version != WIRE_VERSION:
+                raise ValueError(f"unsupported wire version {version}")
+            raw = data[3:] if codec == CODEC_NONE else _decompress(codec, data[3:])
+            return msgpack.unpackb(raw, raw=False, ext_hook=cr_ext_hook)
         raw  = zlib.decompress(data) if compressed else data
         return msgpack.unpackb(raw, raw=False, object_hook=cr_object_hook)
     except Exception as e:
@@ -0,0 +1 @@
+from core.ComputableResult import ComputableResult, as_completed, gather, reduce
@@ -0,0 +1,38 @@
+-- KEYS[1]  => runner-node:{task_id}
+-- KEYS[2]  => runner-node-counter:{task_id}
+-- KEYS[3]  => runner-node-result:{task_id}
+-- ARGV[1]  => 取消原因 ("cancelled" / "deadline" / 调用方给出的说明)
+-- ARGV[2]  => 写入节点的错误信息 (序列化后的字符串)
+-- ARGV[3]  => runner-node-done:{task_id} (完成通知频道)
+-- 记录 cancelled 字段，把未执行的节点（PENDING）与等待 inner 的节点置为 ERROR；
+-- 已在队列中的 job 由 Runner 出队时跳过，正在执行的节点可通过 ctx.check_cancelled() 主动退出。
+-- 任务已 finish 后才取消时，新建的结果 key 沿用节点哈希的剩余过期时间
+-- 返回被取消的节点数
+
+local task_key = KEYS[1]
+local result_key = KEYS[3]
+local error = ARGV[2]
+local done_channel = ARGV[3]
+
+if redis.call('HSETNX', task_key, 'cancelled', ARGV[1]) == 0 then
+  return 0
+end
+
+local pttl = redis.call('PTTL', task_key)
+local cancelled = 0
+local node_cnt = tonumber(redis.call('GET', KEYS[2]) or '0')
+for exec_id = 1, node_cnt do
+  local state = redis.call('HGET', task_key, 'state:' .. exec_id)
+  -- RUNNING 且已有 inner：compute 已返回，只是在等待子图
+  if state == 'PENDING' or (state == 'RUNNING' and redis.call('HEXISTS', task_key, 'inner:' .. exec_id) == 1) then
+    redis.call('HSET', task_key, 'state:' .. exec_id, 'ERROR')
+    redis.call('LPUSH', result_key .. ':' .. exec_id, error)
+    if pttl > 0 then
+      redis.call('PEXPIRE', result_key .. ':' .. exec_id, pttl)
+    end
+    redis.call('PUBLISH', done_channel, exec_id)
+    cancelled = cancelled + 1
+  end
+end
+
+return cancelled
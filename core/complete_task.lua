@@ -0,0 +1,101 @@
+-- KEYS[1]  => runner-node:{task_id}
+-- KEYS[2]  => runner-node-waiters:{task_id}
+-- KEYS[3]  => runner-node-result:{task_id}
+-- KEYS[4]  => runner-node-stream:{task_id}
+-- ARGV[1]  => exec_id
+-- ARGV[2]  => result (序列化后的结果，字符串)
+-- ARGV[3]  => inner exec_id (可选；任务返回了另一个 ComputableResult 时传入)
+-- ARGV[4]  => runner-node-done:{task_id} (完成通知频道，gather / as_completed 订阅)
+-- ARGV[5..7] => t_dequeue / t_start / t_finish (可选；Runner 记录的时间戳，供 core.profile 使用)
+-- ARGV[8]  => "1" 表示生成器算子：写入结果后向 stream 追加 end 条目 (可选)
+-- 返回就绪（dep_cnt 归零）的子任务，按 {queue, job, queue, job, ...} 排列
+-- inner 已失败时返回 nil，由 Runner 调用 fail_task.lua 把失败级联到当前任务及其下游
+-- 节点已是 FINISHED（重复投递）时什么也不做，返回空表
+-- 任务已 finish（节点哈希带有过期时间）后才完成的节点，新建的结果 / stream key 沿用相同的剩余时间
+
+local task_key = KEYS[1]
+local task_waiter_key = KEYS[2]
+local result_key = KEYS[3]
+local stream_key = KEYS[4]
+local exec_id = ARGV[1]
+local result = ARGV[2]
+local inner_id = ARGV[3]
+local done_channel = ARGV[4]
+local streamed = ARGV[8] == '1'
+local now = redis.call('TIME')
+local now_str = now[1] .. '.' .. string.format('%06d', now[2])
+
+-- 重复投递的消息可能在节点完成后再次执行：已完成时不再写结果、不再递减子任务的 dep_cnt
+if redis.call('HGET', task_key, 'state:' .. exec_id) == 'FINISHED' then
+  return {}
+end
+
+local pttl = redis.call('PTTL', task_key)
+local function inherit_ttl(key)
+  if pttl > 0 then
+    redis.call('PEXPIRE', key, pttl)
+  end
+end
+
+-- 结果写入后再追加 end，唤醒阻塞在 XREAD 上的读取方
+local function end_stream()
+  if streamed then
+    redis.call('XADD', stream_key .. ':' .. exec_id, '*', 'end', '1')
+    inherit_ttl(stream_key .. ':' .. exec_id)
+  end
+end
+
+-- 0. 记录本次执行的时间戳
+if ARGV[5] then
+  redis.call('HSET', task_key, 't_dequeue:' .. exec_id, ARGV[5], 't_start:' .. exec_id, ARGV[6],
+             't_finish:' .. exec_id, ARGV[7])
+end
+
+-- 1. 返回 ComputableResult：当前任务要等 inner 完成才算完成
+if inner_id and inner_id ~= '' then
+  redis.call('HSET', task_key, 'inner:' .. exec_id, inner_id)
+  local inner_state = redis.call('HGET', task_key, 'state:' .. inner_id)
+  if inner_state ~= 'FINISHED' then
+    redis.call('HSET', task_key, 'finish_pointer:' .. inner_id, exec_id)
+    end_stream()
+    if inner_state == 'ERROR' then
+      return false
+    end
+    return {}
+  end
+  -- inner 已经完成（设置指针前就结束了），直接沿用它的结果
+  result = redis.call('LINDEX', result_key .. ':' .. inner_id, 0)
+end
+
+-- 2. 沿 finish_pointer 链收集所有随之完成的任务
+local finish_ids = {exec_id}
+while true do
+  local outer = redis.call('HGET', task_key, 'finish_pointer:' .. finish_ids[#finish_ids])
+  if not outer then
+    break
+  end
+  finish_ids[#finish_ids + 1] = outer
+end
+
+-- 3. 写入状态与结果，并调度子任务
+local ready = {}
+for _, feid in ipairs(finish_ids) do
+  redis.call('HSET', task_key, 'state:' .. feid, 'FINISHED')
+  redis.call('LPUSH', result_key .. ':' .. feid, result)
+  inherit_ttl(result_key .. ':' .. feid)
+  redis.call('PUBLISH', done_channel, feid)
+  local children = redis.call('SMEMBERS', task_waiter_key .. ':' .. feid)
+  for _, cid in ipairs(children) do
+    local cnt = redis.call('HINCRBY', task_key, 'dep_cnt:' .. cid, -1)
+    -- 已被取消的子任务不再发布
+    if cnt == 0 and redis.call('HGET', task_key, 'state:' .. cid) == 'PENDING' then
+      redis.call('HSET', task_key, 't_ready:' .. cid, now_str)
+      -- 旧版本注册的节点没有 queue 字段，发布到默认队列
+      ready[#ready + 1] = redis.call('HGET', task_key, 'queue:' .. cid) or ''
+      ready[#ready + 1] = redis.call('HGET', task_key, 'job:' .. cid)
+    end
+  end
+end
+end_stream()
+
+return ready
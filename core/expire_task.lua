@@ -0,0 +1,51 @@
+-- KEYS[1]  => runner-node:{task_id}
+-- KEYS[2]  => runner-node-counter:{task_id}
+-- KEYS[3]  => runner-node-waiters:{task_id}
+-- KEYS[4]  => runner-node-result:{task_id}
+-- KEYS[5]  => runner-blob-index:{task_id}
+-- KEYS[6]  => runner-blob:{task_id}
+-- KEYS[7]  => runner-tasks-minio-gc (待清理 MinIO blob 的任务，score 为到期时间)
+-- KEYS[8]  => runner-node-stream:{task_id}
+-- ARGV[1]  => task_id
+-- ARGV[2]  => retention (秒，到期后 Redis 自动删除该任务的所有 key)
+-- 返回 {节点数, MinIO blob 数}
+
+local task_key = KEYS[1]
+local counter_key = KEYS[2]
+local task_waiter_key = KEYS[3]
+local result_key = KEYS[4]
+local blob_index_key = KEYS[5]
+local blob_key = KEYS[6]
+local stream_key = KEYS[8]
+local task_id = ARGV[1]
+local retention = tonumber(ARGV[2])
+
+-- 1. exec_id 从 1 连续分配（批量模式预分配的空号上 EXPIRE 是空操作）
+local node_cnt = tonumber(redis.call('GET', counter_key) or '0')
+for exec_id = 1, node_cnt do
+  redis.call('EXPIRE', task_waiter_key .. ':' .. exec_id, retention)
+  redis.call('EXPIRE', result_key .. ':' .. exec_id, retention)
+  redis.call('EXPIRE', stream_key .. ':' .. exec_id, retention)
+end
+redis.call('EXPIRE', task_key, retention)
+redis.call('EXPIRE', counter_key, retention)
+
+-- 2. Redis 中的 blob 一起过期；MinIO 中的交给清理进程
+local minio_cnt = 0
+for _, member in ipairs(redis.call('SMEMBERS', blob_index_key)) do
+  local store, digest = string.match(member, '^([^:]+):(.+)$')
+  if store == 'minio' then
+    minio_cnt = minio_cnt + 1
+  else
+    redis.call('EXPIRE', blob_key .. ':' .. digest, retention)
+  end
+end
+redis.call('EXPIRE', blob_index_key, retention)
+
+-- 3. 记录 MinIO 中的 blob 何时可以删除
+if minio_cnt > 0 then
+  local now = redis.call('TIME')
+  redis.call('ZADD', KEYS[7], tonumber(now[1]) + retention, task_id)
+end
+
+return {node_cnt, minio_cnt}
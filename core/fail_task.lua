@@ -0,0 +1,66 @@
+-- KEYS[1]  => runner-node:{task_id}
+-- KEYS[2]  => runner-node-waiters:{task_id}
+-- KEYS[3]  => runner-node-result:{task_id}
+-- KEYS[4]  => runner-node-stream:{task_id} (可选；生成器算子失败前已写入的 chunk)
+-- ARGV[1]  => exec_id (失败的节点)
+-- ARGV[2]  => 该节点的错误信息 (序列化后的字符串；为空或节点已是 ERROR 时只做级联)
+-- ARGV[3]  => 下游节点的错误信息 (序列化后的字符串)
+-- ARGV[4]  => runner-node-done:{task_id} (完成通知频道)
+-- 沿 waiters 与 finish_pointer 把所有未结束的下游节点一次性置为 ERROR，返回被级联的 exec_id 列表
+-- 被级联的节点记录在 cascaded:{exec_id}（逗号分隔），重放死信时据此恢复
+-- 任务已 finish 后才失败的节点，新建的结果 / stream key 沿用节点哈希的剩余过期时间
+
+local task_key = KEYS[1]
+local task_waiter_key = KEYS[2]
+local result_key = KEYS[3]
+local stream_key = KEYS[4]
+local exec_id = ARGV[1]
+local downstream_error = ARGV[3]
+local done_channel = ARGV[4]
+
+local pttl = redis.call('PTTL', task_key)
+
+local function fail(id, err)
+  redis.call('HSET', task_key, 'state:' .. id, 'ERROR')
+  redis.call('LPUSH', result_key .. ':' .. id, err)
+  if pttl > 0 then
+    redis.call('PEXPIRE', result_key .. ':' .. id, pttl)
+    if stream_key then
+      redis.call('PEXPIRE', stream_key .. ':' .. id, pttl)
+    end
+  end
+  redis.call('PUBLISH', done_channel, id)
+end
+
+-- 节点已是 ERROR（如出队前已被 cancel_task.lua 取消）时不再写入第二份错误，只做级联
+if ARGV[2] ~= '' and redis.call('HGET', task_key, 'state:' .. exec_id) ~= 'ERROR' then
+  fail(exec_id, ARGV[2])
+end
+
+local failed = {}
+local frontier = {exec_id}
+while #frontier > 0 do
+  local id = table.remove(frontier)
+  -- 依赖该节点的子任务，以及等待它作为 inner 结果的 outer 任务
+  local next_ids = redis.call('SMEMBERS', task_waiter_key .. ':' .. id)
+  local outer = redis.call('HGET', task_key, 'finish_pointer:' .. id)
+  if outer then
+    next_ids[#next_ids + 1] = outer
+  end
+  for _, cid in ipairs(next_ids) do
+    local state = redis.call('HGET', task_key, 'state:' .. cid)
+    if state == 'PENDING' or state == 'RUNNING' then
+      fail(cid, downstream_error)
+      failed[#failed + 1] = cid
+      frontier[#frontier + 1] = cid
+    end
+  end
+end
+
+if #failed > 0 then
+  local prev = redis.call('HGET', task_key, 'cascaded:' .. exec_id)
+  local ids = table.concat(failed, ',')
+  redis.call('HSET', task_key, 'cascaded:' .. exec_id, prev and (prev .. ',' .. ids) or ids)
+end
+
+return failed
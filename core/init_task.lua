@@ -1,32 +1,56 @@
--- KEYS[1]  => task_id
--- ARGV[1]  => exec_id
--- ARGV[2]  => job (任务定义，字符串)
--- ARGV[3]  => dep (逗号分隔的依赖 exec_id 列表，字符串)
+-- KEYS[1]  => runner-node:{task_id}
+-- KEYS[2]  => runner-node-waiters:{task_id}
+-- KEYS[3]  => runner-tasks (任务注册表，首次注册时记录创建时间，供过期清理使用)
+-- ARGV 按 4 个一组，可一次注册多个节点（批量提交时按提交顺序排列）：
+--   ARGV[4k+1]  => exec_id
+--   ARGV[4k+2]  => job (任务定义，字符串)
+--   ARGV[4k+3]  => dep (逗号分隔的依赖 exec_id 列表，字符串)
+--   ARGV[4k+4]  => queue (任务所属的 RabbitMQ 队列，依赖完成后由 Runner 发布到该队列)
+-- 返回每个节点的 dep_cnt 列表
+-- 同时记录 t_submit（注册时间）与 t_ready（依赖已满足、进入队列的时间），供 core.profile 使用
 
 local task_key = KEYS[1]
 local task_waiter_key = KEYS[2]
-local exec_id  = ARGV[1]
-local job_def  = ARGV[2]
-local dep_str  = ARGV[3]
+local dep_cnts = {}
 
--- 1. 更新 job 和 dep 列表
-redis.call('HSET', task_key, 'job:' .. exec_id, job_def)
-redis.call('HSET', task_key, 'dep:' .. exec_id, dep_str)
---    初始化状态为 PENDING
-redis.call('HSET', task_key, 'state:' .. exec_id, 'PENDING')
+-- 0. 登记任务创建时间（已存在则不更新）
+local now = redis.call('TIME')
+redis.call('ZADD', KEYS[3], 'NX', now[1], string.sub(task_key, #'runner-node:' + 1))
+local now_str = now[1] .. '.' .. string.format('%06d', now[2])
 
--- 2. 统计处于 PENDING 或 RUNNING 的依赖
-local dep_cnt = 0
-if dep_str ~= '' then
-  for dep_id in string.gmatch(dep_str, '([^,]+)') do
-    local state = redis.call('HGET', task_key, 'state:' .. dep_id)
-    if state == 'PENDING' or state == 'RUNNING' then
-      redis.call('SADD', task_waiter_key .. ':' .. dep_id, exec_id)
-      dep_cnt = dep_cnt + 1
+for i = 1, #ARGV, 4 do
+  local exec_id  = ARGV[i]
+  local job_def  = ARGV[i + 1]
+  local dep_str  = ARGV[i + 2]
+  local queue    = ARGV[i + 3]
+
+  -- 1. 更新 job、dep 列表和队列
+  redis.call('HSET', task_key, 'job:' .. exec_id, job_def)
+  redis.call('HSET', task_key, 'dep:' .. exec_id, dep_str)
+  redis.call('HSET', task_key, 'queue:' .. exec_id, queue)
+  --    初始化状态为 PENDING
+  redis.call('HSET', task_key, 'state:' .. exec_id, 'PENDING')
+  redis.call('HSET', task_key, 't_submit:' .. exec_id, now_str)
+
+  -- 2. 统计处于 PENDING 或 RUNNING 的依赖（同一批次中先注册的节点已是 PENDING）
+  local dep_cnt = 0
+  if dep_str ~= '' then
+    for dep_id in string.gmatch(dep_str, '([^,]+)') do
+      local state = redis.call('HGET', task_key, 'state:' .. dep_id)
+      -- 同一依赖出现多次时只计数一次，否则 dep_cnt 永远无法归零
+      if (state == 'PENDING' or state == 'RUNNING')
+          and redis.call('SADD', task_waiter_key .. ':' .. dep_id, exec_id) == 1 then
+        dep_cnt = dep_cnt + 1
+      end
     end
   end
+
+  -- 3. 写回 dep_cnt
+  redis.call('HSET', task_key, 'dep_cnt:' .. exec_id, dep_cnt)
+  if dep_cnt == 0 then
+    redis.call('HSET', task_key, 't_ready:' .. exec_id, now_str)
+  end
+  dep_cnts[#dep_cnts + 1] = dep_cnt
 end
 
--- 3. 写回 dep_cnt 并返回
-redis.call('HSET', task_key, 'dep_cnt:' .. exec_id, dep_cnt)
-return dep_cnt
+return dep_cnts
@@ -0,0 +1,203 @@
+import argparse
+
+from core.Utils import deserialize
+
+
+# runner-node:{task_id} 中的时间戳字段（秒，浮点字符串）
+TIMESTAMPS = ("t_submit", "t_ready", "t_dequeue", "t_start", "t_finish")
+
+
+class ProfileNode:
+    """One exec_id of a task, rebuilt from ``runner-node:{task_id}``."""
+
+    __slots__ = ("exec_id", "op", "state", "deps", "inner") + TIMESTAMPS
+
+    def __init__(self, exec_id):
+        self.exec_id = exec_id
+        self.op = "?"
+        self.state = None
+        self.deps = []
+        self.inner = None
+        for name in TIMESTAMPS:
+            setattr(self, name, None)
+
+    def span(self, begin, end):
+        begin, end = getattr(self, begin), getattr(self, end)
+        if begin is None or end is None:
+            return None
+        return max(end - begin, 0.0)
+
+    @property
+    def queue_wait(self):
+        """进入队列到 Runner 收到消息（含 Runner 本地通道缓冲）。"""
+        return self.span("t_ready", "t_dequeue")
+
+    @property
+    def setup(self):
+        """收到消息到开始 compute：读取参数、取出算子实例。"""
+        return self.span("t_dequeue", "t_start")
+
+    @property
+    def run(self):
+        return self.span("t_start", "t_finish")
+
+
+def load_nodes(redis, task_id):
+    """Read the task hash and return ``{exec_id: ProfileNode}``."""
+    nodes = {}
+    for field, value in redis.hgetall(f"runner-node:{task_id}").items():
+        name, _, exec_id = field.partition(":")
+        if not exec_id.isdigit():
+            continue
+        node = nodes.get(int(exec_id))
+        if node is None:
+            node = nodes[int(exec_id)] = ProfileNode(int(exec_id))
+        if name == "job":
+            node.op = deserialize(value).get("task", "?")
+        elif name == "state":
+            node.state = value
+        elif name == "dep":
+            node.deps = [int(d) for d in value.split(",") if d]
+        elif name == "inner":
+            node.inner = int(value)
+        elif name in TIMESTAMPS:
+            setattr(node, name, float(value))
+    return nodes
+
+
+def completion_times(nodes):
+    """
+    ``{exec_id: 完成时间}``：返回 ComputableResult 的节点在 inner 完成时才算完成。
+    缺少时间戳（未结束或由旧版本 Runner 执行）的节点为 None。
+    """
+    ends = {}
+    for exec_id in nodes:
+        chain = [exec_id]
+        # 沿 inner 链找到真正产出结果的节点（非递归，长链不会超出递归深度）
+        while nodes[chain[-1]].inner in nodes and chain[-1] not in ends:
+            chain.append(nodes[chain[-1]].inner)
+        end = ends.get(chain[-1], nodes[chain[-1]].t_finish)
+        for eid in chain:
+            ends[eid] = end
+    return ends
+
+
+def critical_path(nodes, ends=None):
+    """
+    Walk back from the node that completed last and return the chain that determined it.
+
+    At each node the blocking dependency is the one that completed last. A node whose
+    result is another ComputableResult waits for its inner node; the chain of that inner
+    node is followed back to the nodes submitted during the outer node's run, then the
+    walk resumes at the outer node.
+    """
+    ends = completion_times(nodes) if ends is None else ends
+    finished = [n for n in nodes.values() if ends.get(n.exec_id) is not None]
+    if not finished:
+        return []
+
+    cur = max(finished, key=lambda n: ends[n.exec_id])
+    path, resume = [], []
+    floor, follow_inner = None, True
+    while True:
+        if follow_inner and cur.inner in nodes:
+            resume.append((cur, floor))
+            cur, floor = nodes[cur.inner], cur.t_start
+            continue
+        path.append(cur)
+        follow_inner = True
+        deps = [
+            nodes[d] for d in cur.deps
+            if d in nodes and ends.get(d) is not None
+            and (floor is None or (nodes[d].t_submit or 0) >= floor)
+        ]
+        if deps:
+            cur = max(deps, key=lambda n: ends[n.exec_id])
+            continue
+        if not resume:
+            break
+        cur, floor = resume.pop()
+        follow_inner = False
+    path.reverse()
+    return path
+
+
+def operator_totals(nodes):
+    """Per operator: ``(op, count, errors, run total, run max, queue wait total)``, slowest first."""
+    totals = {}
+    for node in nodes.values():
+        entry = totals.setdefault(node.op, [0, 0, 0.0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += node.state == "ERROR"
+        entry[2] += node.run or 0.0
+        entry[3] = max(entry[3], node.run or 0.0)
+        entry[4] += node.queue_wait or 0.0
+    rows = [(op, *values) for op, values in totals.items()]
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def _fmt(seconds):
+    return "-" if seconds is None else f"{seconds:.3f}s"
+
+
+def print_profile(task_id, nodes, max_path=40):
+    if not nodes:
+        print(f"task {task_id}: no nodes found (never submitted, or expired)")
+        return
+    ends = completion_times(nodes)
+    submits = [n.t_submit for n in nodes.values() if n.t_submit is not None]
+    done = [end for end in ends.values() if end is not None]
+    wall = max(done) - min(submits) if submits and done else None
+
+    states = {}
+    for node in nodes.values():
+        states[node.state] = states.get(node.state, 0) + 1
+    print(f"task {task_id}: {len(nodes)} nodes ({', '.join(f'{n} {s}' for s, n in sorted(states.items(), key=str))}), "
+          f"wall {_fmt(wall)}")
+
+    path = critical_path(nodes, ends)
+    print()
+    print(f"critical path ({len(path)} nodes)")
+    print(f"{'exec_id':>8}  {'operator':<44} {'queue':>9} {'setup':>9} {'run':>9} {'inner':>9} {'done at':>9}")
+    origin = min(submits) if submits else 0.0
+    shown = path if len(path) <= max_path else path[:max_path // 2] + [None] + path[-(max_path // 2):]
+    for node in shown:
+        if node is None:
+            print(f"{'...':>8}  {len(path) - 2 * (max_path // 2)} more")
+            continue
+        # 等待 inner 的时间：本节点 compute 结束到 inner 完成
+        inner = None
+        if node.inner is not None and ends.get(node.exec_id) is not None and node.t_finish is not None:
+            inner = ends[node.exec_id] - node.t_finish
+        done_at = None if ends.get(node.exec_id) is None else ends[node.exec_id] - origin
+        print(f"{node.exec_id:>8}  {node.op[-44:]:<44} {_fmt(node.queue_wait):>9} {_fmt(node.setup):>9} "
+              f"{_fmt(node.run):>9} {_fmt(inner):>9} {_fmt(done_at):>9}")
+
+    path_queue = sum(node.queue_wait or 0.0 for node in path)
+    path_run = sum(node.run or 0.0 for node in path)
+    all_queue = sum(node.queue_wait or 0.0 for node in nodes.values())
+    all_busy = sum((node.queue_wait or 0.0) + (node.setup or 0.0) + (node.run or 0.0) for node in nodes.values())
+    print()
+    if wall:
+        print(f"critical path: queue wait {_fmt(path_queue)} ({path_queue / wall:.1%} of wall), "
+              f"run {_fmt(path_run)} ({path_run / wall:.1%} of wall)")
+    if all_busy:
+        print(f"all nodes: queue wait {_fmt(all_queue)} ({all_queue / all_busy:.1%} of queue + setup + run)")
+
+    print()
+    print(f"{'operator':<48} {'count':>6} {'errors':>6} {'run':>10} {'max run':>9} {'queue wait':>11}")
+    for op, count, errors, run, max_run, queue_wait in operator_totals(nodes):
+        print(f"{op[-48:]:<48} {count:>6} {errors:>6} {_fmt(run):>10} {_fmt(max_run):>9} {_fmt(queue_wait):>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Critical path, queue waits and per-operator time of a task DAG.")
+    parser.add_argument("task_id")
+    parser.add_argument("--max-path", type=int, default=40, help="critical path rows to print before eliding")
+    cli_args = parser.parse_args()
+
+    from core.Context import Context
+
+    with Context() as ctx:
+        print_profile(cli_args.task_id, load_nodes(ctx.redis, cli_args.task_id), max_path=cli_args.max_path)
@@ -0,0 +1,27 @@
+-- KEYS[1]  => runner-retry (zset: {task_id}:{exec_id} -> 重试到期时间)
+-- ARGV[1]  => 当前时间
+-- ARGV[2]  => 本次最多取出的数量
+-- 取出到期的重试并返回对应的 job，按 {queue, job, queue, job, ...} 排列
+-- 多个 Runner 同时轮询时，每个到期项只会被一个 Runner 取走
+
+local retry_key = KEYS[1]
+local now = ARGV[1]
+
+local due = redis.call('ZRANGEBYSCORE', retry_key, '-inf', now, 'LIMIT', 0, tonumber(ARGV[2]))
+local ready = {}
+for _, member in ipairs(due) do
+  redis.call('ZREM', retry_key, member)
+  -- task_id 中可能含有冒号，exec_id 为最后一段
+  local sep = string.find(member, ':[^:]*$')
+  local task_key = 'runner-node:' .. string.sub(member, 1, sep - 1)
+  local exec_id = string.sub(member, sep + 1)
+  local job = redis.call('HGET', task_key, 'job:' .. exec_id)
+  -- 任务已过期或节点已被取消 / 置为 ERROR 时跳过
+  if job and redis.call('HGET', task_key, 'state:' .. exec_id) == 'PENDING' then
+    redis.call('HSET', task_key, 't_ready:' .. exec_id, now)
+    ready[#ready + 1] = redis.call('HGET', task_key, 'queue:' .. exec_id) or ''
+    ready[#ready + 1] = job
+  end
+end
+
+return ready
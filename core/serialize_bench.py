@@ -0,0 +1,137 @@
+"""
+序列化格式基准：对比旧格式（纯 msgpack + ``__type__`` 字典）与 v1 线格式
+在典型 job / 结果上的字节数与编解码耗时。
+
+    python -m core.serialize_bench [--number 2000]
+
+``redis`` 列是以 latin1 字符串写入 Redis 后实际占用的字节数（高位字节按 UTF-8 存为两字节）。
+"""
+import argparse
+import random
+import timeit
+
+import msgpack
+
+from core import Utils
+from core.BlobStore import BlobRef
+from core.ComputableResult import ComputableResult
+
+
+def _legacy_default(obj):
+    if isinstance(obj, ComputableResult):
+        return {"__type__": "ComputableResult", "exec_id": obj.exec_id}
+    if isinstance(obj, BlobRef):
+        return {"__type__": "BlobRef", "digest": obj.digest, "size": obj.size, "store": obj.store}
+    return obj
+
+
+def _legacy_serialize(obj):
+    data = msgpack.packb(obj, use_bin_type=True, default=_legacy_default)
+    return data, data.decode('latin1')
+
+
+def _legacy_deserialize(s):
+    return msgpack.unpackb(s.encode('latin1'), raw=False, object_hook=Utils.cr_object_hook)
+
+
+def _job(exec_id, task, args, kwargs=None, init_args=(), init_kwargs=None):
+    return {
+        "exec_id": exec_id,
+        "task_id": "3f9a6c0e1b7d4c2a8e5f0a1b2c3d4e5f",
+        "task": task,
+        "args": args,
+        "kwargs": kwargs or {},
+        "init_args": init_args,
+        "init_kwargs": init_kwargs or {},
+    }
+
+
+def job_shapes():
+    rng = random.Random(0)
+    problem = (
+        "城市道路网有 n 个路口，m 条双向道路，每条道路有通行时间 t。"
+        "现在要找到从起点 S 到终点 T 的最短时间路径。\n"
+        "输入：第一行 n, m, S, T；接下来 m 行：每行 u, v, t。\n"
+        "输出：一个整数，表示最短时间；如果不可达输出 -1。\n"
+    ) * 6
+    prompt = "【角色】你是一名“极简题面生成器”，只输出数学形式，不讲故事。\n【输入】\n" + problem + (
+        "【任务】生成一份“纯技术规格”文档：删除所有背景、故事；用符号表达输入、输出、约束。\n"
+    ) * 3
+    student_code = (
+        "#include <bits/stdc++.h>\nusing namespace std;\n"
+        "int main(){int n,m,s,t;cin>>n>>m>>s>>t;vector<vector<pair<int,int>>> g(n+1);\n"
+        "for(int i=0;i<m;i++){int u,v,w;cin>>u>>v>>w;g[u].push_back({v,w});g[v].push_back({u,w});}\n"
+        "priority_queue<pair<long long,int>,vector<pair<long long,int>>,greater<>> pq;\n"
+        "vector<long long> d(n+1,LLONG_MAX);d[s]=0;pq.push({0,s});\n"
+        "while(!pq.empty()){auto [du,u]=pq.top();pq.pop();if(du>d[u])continue;\n"
+        "for(auto [v,w]:g[u])if(d[v]>du+w){d[v]=du+w;pq.push({d[v],v});}}\n"
+        "cout<<(d[t]==LLONG_MAX?-1:d[t])<<endl;}\n"
+    )
+    test_input = "1000 5000 1 1000\n" + "".join(
+        f"{rng.randint(1, 1000)} {rng.randint(1, 1000)} {rng.randint(1, 10 ** 6)}\n" for _ in range(5000)
+    )
+    llm_output = {
+        "content": "## 问题定义\n\n### 输入\n- 变量：`n`, `m`\n- 类型：整数\n" * 40,
+        "reasoning_content": "首先分析题目给出的约束条件，然后逐步推导。" * 120,
+        "structured_output": None,
+    }
+    embedding = [rng.uniform(-1, 1) for _ in range(1024)]
+
+    return {
+        "basic_ops job": _job(7, "coper.basic_ops.Add", [ComputableResult(5), ComputableResult(6)]),
+        "LLM prompt job": _job(
+            3, "coper.LLM.LLM", [], {"prompt": prompt}, init_args=["deepseek-chat", "DEEPSEEK"]
+        ),
+        "LLM job (blob ref)": _job(
+            3, "coper.LLM.LLM", [], {"prompt": BlobRef("9" * 64, len(prompt), "redis")},
+            init_args=["deepseek-chat", "DEEPSEEK"],
+        ),
+        "sandbox job": _job(
+            11, "coper.Service.Service", ["run", student_code, test_input, "C++14"], init_args=["code-sandbox"]
+        ),
+        "LLM result": llm_output,
+        "embedding result": embedding,
+    }
+
+
+def _measure(encode, decode, obj, number):
+    data, text = encode(obj)
+    encode_us = timeit.timeit(lambda: encode(obj), number=number) / number * 1e6
+    decode_us = timeit.timeit(lambda: decode(text), number=number) / number * 1e6
+    return len(data), len(text.encode('utf-8')), encode_us, decode_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark job / result serialization formats.")
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    number = parser.parse_args().number
+
+    codec_names = {Utils.CODEC_ZSTD: "zstd", Utils.CODEC_LZ4: "lz4", Utils.CODEC_ZLIB: "zlib"}
+    formats = [
+        ("legacy", _legacy_serialize, _legacy_deserialize),
+        ("v1 raw", lambda o: Utils.serialize(o, compress=False), Utils.deserialize),
+    ]
+    for codec in (Utils.CODEC_ZSTD, Utils.CODEC_LZ4, Utils.CODEC_ZLIB):
+        if codec == Utils.CODEC_ZSTD and Utils.zstandard is None or codec == Utils.CODEC_LZ4 and Utils.lz4 is None:
+            continue
+
+        def encode(obj, codec=codec):
+            Utils.COMPRESS_CODEC = codec
+            return Utils.serialize(obj)
+
+        formats.append((f"v1 {codec_names[codec]}", encode, Utils.deserialize))
+
+    print(f"{'shape':<20} {'format':<10} {'bytes':>8} {'redis':>8} {'enc µs':>9} {'dec µs':>9}")
+    default_codec = Utils.COMPRESS_CODEC
+    try:
+        for shape, obj in job_shapes().items():
+            for name, encode, decode in formats:
+                size, stored, enc, dec = _measure(encode, decode, obj, number)
+                print(f"{shape:<20} {name:<10} {size:>8} {stored:>8} {enc:>9.1f} {dec:>9.1f}")
+            print()
+    finally:
+        Utils.COMPRESS_CODEC = default_codec
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# 默认测量的模块：Runner / 服务 / CLI 启动时会导入的入口
+DEFAULT_MODULES = (
+    "core.Utils",
+    "core.Context",
+    "core.Computable",
+    "core.Runner",
+    "core.profile",
+    "coper.basic_ops",
+    "coper.LLM",
+    "coper.Service",
+    "coper.VectorDB",
+    "coper.Minio",
+)
+
+# 应当延迟到第一次使用时才导入的重量级依赖
+HEAVY_MODULES = ("redis", "pika", "minio", "pymilvus", "litellm", "pandas", "numpy", "urllib3")
+
+# 在新的解释器中执行，输出一行 JSON；只计入 {setup} 之后 {stmt} 的耗时
+_SNIPPET = """
+import json, sys, time
+{setup}
+start = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+CONTEXT_CASES = {
+    # 构造分布式 Context：读取配置，不建立连接
+    "Context()": ("from core.Context import Context", "Context()"),
+    "Context(mode='local') enter/exit": (
+        "from core.Context import Context",
+        "with Context(task_id='bench', mode='local'):\n    pass",
+    ),
+}
+# 需要中间件连接参数（middleware/.env 或环境变量）的用例
+REMOTE_CASES = {"Context()"}
+
+
+def remote_configured(root):
+    """Whether ``Context()`` can read connection settings (``middleware/.env`` or ``HEADER_ADDRESS`` in the env)."""
+    return os.path.exists(os.path.join(root, "middleware", ".env")) or "HEADER_ADDRESS" in os.environ
+
+
+def measure(setup, stmt, repeat=5, cwd=None):
+    """Run ``stmt`` after ``setup`` in ``repeat`` fresh interpreters: ``(samples in ms, heavy modules loaded)``."""
+    code = _SNIPPET.format(setup=setup, stmt=stmt, heavy=HEAVY_MODULES)
+    samples, heavy = [], []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()
+            raise RuntimeError(error[-1] if error else f"exit code {proc.returncode}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        heavy = result["heavy"]
+    return samples, heavy
+
+
+def run(modules, repeat=5, contexts=True):
+    """
+    ``[(name, samples or None, heavy modules, note)]`` for each module import and Context case;
+    ``note`` says why a case has no samples (an error, or skipped without remote config).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cases = [(f"import {module}", "", f"import {module}") for module in modules]
+    if contexts:
+        cases += [(name, setup, stmt) for name, (setup, stmt) in CONTEXT_CASES.items()]
+    rows = []
+    for name, setup, stmt in cases:
+        if name in REMOTE_CASES and not remote_configured(root):
+            rows.append((name, None, [], "skipped: no remote config"))
+            continue
+        try:
+            samples, heavy = measure(setup, stmt, repeat, cwd=root)
+            rows.append((name, samples, heavy, None))
+        except RuntimeError as e:
+            rows.append((name, None, [], f"error: {e}"))
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'case':<40} {'median':>9} {'min':>9} {'max':>9}  heavy modules loaded")
+    for name, samples, heavy, note in rows:
+        if samples is None:
+            print(f"{name:<40} {'-':>9} {'-':>9} {'-':>9}  {note[:87]}")
+            continue
+        print(f"{name:<40} {statistics.median(samples):>7.1f}ms {min(samples):>7.1f}ms {max(samples):>7.1f}ms  "
+              f"{', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import and Context construction time, each in a fresh interpreter.")
+    parser.add_argument("modules", nargs="*", help=f"modules to import (default: {' '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per case")
+    parser.add_argument("--no-context", action="store_true", help="skip the Context construction cases")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="exit with status 1 if any case's median exceeds this many milliseconds")
+    cli_args = parser.parse_args()
+
+    result_rows = run(cli_args.modules or DEFAULT_MODULES, cli_args.repeat, not cli_args.no_context)
+    print_rows(result_rows)
+    if cli_args.budget_ms is not None:
+        over = [name for name, samples, _, _ in result_rows
+                if samples is not None and statistics.median(samples) > cli_args.budget_ms]
+        if over:
+            print(f"over budget ({cli_args.budget_ms:.0f}ms): {', '.join(over)}")
+            sys.exit(1)
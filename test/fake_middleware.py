@@ -0,0 +1,161 @@
+"""
+测试用的进程内中间件：fakeredis 执行真实的 Lua 脚本，RabbitMQ 的发布记录在内存队列中，
+由 :func:`drain` 交给 Runner 执行。不需要 Redis / RabbitMQ / MinIO 服务，``python -m pytest test`` 即可运行。
+"""
+import collections
+import os
+
+import fakeredis
+
+# remote_config() 需要的连接参数，不会真正连接
+for _name, _value in {
+    "HEADER_ADDRESS": "localhost", "REDIS_PORT": "6379", "REDIS_PASSWORD": "test",
+    "RABBITMQ_PORT": "5672", "RABBITMQ_USER": "test", "RABBITMQ_PASSWORD": "test",
+    "MINIO_API_PORT": "9000", "MINIO_ROOT_USER": "test", "MINIO_ROOT_PASSWORD": "test",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from core.Computable import Computable  # noqa: E402
+from core.Connections import LUA_SCRIPTS, lua_source  # noqa: E402
+from core.Context import Context  # noqa: E402
+from core.Retry import RetryPolicy  # noqa: E402
+
+
+class RecordingPublisher:
+    """代替 PublisherPool：按发布顺序记录 ``(routing_key, body, properties)``。"""
+
+    def __init__(self):
+        self.messages = collections.deque()
+
+    def publish(self, routing_key, body, properties=None, declare=False):
+        self.messages.append((routing_key, body, properties))
+
+    def publish_many(self, messages, declare=False):
+        self.messages.extend(messages)
+
+    def stats(self):
+        return {"published": len(self.messages)}
+
+
+class FakeConnections:
+    """``Context(connections=...)`` 所需的共享连接，Redis 为 fakeredis。"""
+
+    def __init__(self):
+        self.redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        self.scripts = {name: self.redis.register_script(lua_source(name)) for name in LUA_SCRIPTS}
+        self.publishers = RecordingPublisher()
+        self.minio = None
+
+
+class FakeChannel:
+    def __init__(self):
+        self.acks = []
+
+    def basic_ack(self, delivery_tag=None, multiple=False):
+        self.acks.append(delivery_tag)
+
+
+class FakeConnection:
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+    def call_later(self, delay, callback):
+        pass
+
+
+class Method:
+    def __init__(self, delivery_tag, routing_key):
+        self.delivery_tag = delivery_tag
+        self.routing_key = routing_key
+
+
+def make_context(task_id="test-task", **kwargs):
+    """A Context on fresh fake middleware, with the channel / connection Runner expects."""
+    ctx = Context(task_id=task_id, connections=FakeConnections(), **kwargs).bind()
+    ctx._channel = FakeChannel()
+    ctx._connection = FakeConnection()
+    return ctx
+
+
+def published(ctx):
+    return ctx.connections.publishers.messages
+
+
+def drain(runner, limit=10000):
+    """Run every published job (and the jobs they release) on ``runner``; returns the number run."""
+    messages = published(runner.ctx)
+    count = 0
+    while messages and count < limit:
+        routing_key, body, properties = messages.popleft()
+        runner._on_message(runner.ctx.channel, Method(count, routing_key), properties, body)
+        count += 1
+    return count
+
+
+# 测试用算子（Runner 按 "fake_middleware.<类名>" 加载）
+
+class Value(Computable):
+    def compute(self, *values):
+        return values[0] if len(values) == 1 else list(values)
+
+
+class Repeat(Computable):
+    def compute(self, text, times):
+        return text * times
+
+
+class Count(Computable):
+    """逐个产出 ``0..n-1``，返回 ``n``。"""
+
+    def compute(self, n):
+        for i in range(n):
+            yield i
+        return n
+
+
+class Handles(Computable):
+    """返回子任务句柄的列表（结果中嵌套句柄，而不是整体交给 inner）。"""
+
+    def compute(self, *values):
+        return [Value()(value) for value in values]
+
+
+class Fail(Computable):
+    def compute(self, message="boom"):
+        raise ValueError(message)
+
+
+class Disconnect(Computable):
+    """抛出瞬时错误，但沿用默认（不重试）的策略。"""
+
+    def compute(self):
+        raise ConnectionError("transient")
+
+
+class Lookup(Computable):
+    """可缓存的算子：前 ``failures`` 次调用像 Embedding 一样吞掉错误返回 None。"""
+
+    memoize = True
+
+    def compute(self, key, failures, value):
+        if self.redis.incr(f"test-lookup:{key}") <= failures:
+            return None
+        return value
+
+
+class Flaky(Computable):
+    """前 ``failures`` 次执行抛出 ConnectionError，之后返回 ``value``。"""
+
+    retry = RetryPolicy(max_attempts=3, base_delay=0)
+
+    def compute(self, key, failures, value):
+        if self.redis.incr(f"test-flaky:{key}") <= failures:
+            raise ConnectionError("transient")
+        return value
+
+
+class Outer(Computable):
+    """返回 ``op(*args)`` 的句柄：当前节点等待 inner 完成。"""
+
+    def compute(self, op, *args):
+        return {"value": Value, "fail": Fail}[op]()(*args)
@@ -0,0 +1,23 @@
+import asyncio
+import uuid
+
+
+async def main():
+    from core.Context import Context
+    from coper.basic_ops import Mul
+    from coper.basic_ops import Add
+
+    async with Context(task_id=str(uuid.uuid4())):
+        mul = Mul()
+        add = Add()
+
+        a = await mul.acall(3, 2)
+        b = await add.acall(3, 2)
+
+        c = await add.acall(a, b)
+
+        print(f"{await c}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+import uuid
+
+if __name__ == "__main__":
+    from core.Context import Context
+    from coper.basic_ops import Add, Mul
+
+    with Context(task_id=str(uuid.uuid4())) as ctx:
+        mul = Mul()
+        add = Add()
+
+        # 块内的节点在退出时一次注册、一次性发布
+        with ctx.batch():
+            a = mul(3, 2)
+            b = add(3, 2)
+            c = add(a, b)
+            d = add(c, c)
+
+        print(f"{c.result()} {d.result()}")
+
+        # 在块内直接取结果会先自动 flush
+        with ctx.batch():
+            e = add(d, 1)
+            print(f"{e.result()}")
@@ -0,0 +1,87 @@
+import collections
+
+from core.FairScheduler import FairScheduler
+from core.Runner import Runner
+
+from fake_middleware import Method, Value, drain, make_context, published
+
+QUEUE = "runner_task_queue"
+
+
+def _submit(ctx, tenant, count):
+    with ctx.scope(f"task-{tenant}", tenant=tenant):
+        for i in range(count):
+            Value()(i)
+
+
+def _fair_context():
+    ctx = make_context()
+    ctx.fair_scheduling = True
+    with ctx.scope("task-runner"):
+        runner = Runner()
+    return ctx, runner
+
+
+def test_weighted_tenants_are_released_in_proportion():
+    ctx, runner = _fair_context()
+    _submit(ctx, "alice", 40)
+    _submit(ctx, "bob", 40)
+    ctx.redis.hset("runner-fair-weight", mapping={"alice": 3, "bob": 1})
+    scheduler = FairScheduler(ctx, window=8, cap=8)
+
+    rounds = []
+    while True:
+        released = scheduler.schedule_once()
+        if not released:
+            break
+        tenants = collections.Counter(props.headers["fair-tenant"] for _, _, props in published(ctx))
+        rounds.append(dict(tenants))
+        assert drain(runner) == released
+
+    # 两个租户都有积压时按 3:1 放行，alice 清空后 bob 独占窗口
+    assert rounds[:5] == [{"alice": 6, "bob": 2}] * 5
+    assert sum(r.get("alice", 0) for r in rounds) == 40
+    assert sum(r.get("bob", 0) for r in rounds) == 40
+    assert all(r == {"bob": 8} for r in rounds[7:])
+
+
+def test_slots_are_released_under_the_header_tenant():
+    ctx, runner = _fair_context()
+    _submit(ctx, "alice", 4)
+    _submit(ctx, "bob", 2)
+    scheduler = FairScheduler(ctx, window=16, cap=3)
+    assert scheduler.schedule_once() == 5
+    inflight = f"runner-fair-inflight:{QUEUE}"
+    assert ctx.redis.hgetall(inflight) == {"alice": "3", "bob": "2"}
+
+    expected = {"alice": 3, "bob": 2}
+    messages = published(ctx)
+    # Runner 的上下文租户与消息头不同：名额按消息头归还
+    with ctx.scope("task-other", tenant="other"):
+        while messages:
+            routing_key, body, props = messages.popleft()
+            runner._on_message(ctx.channel, Method(0, routing_key), props, body)
+            expected[props.headers["fair-tenant"]] -= 1
+            assert {t: int(n) for t, n in ctx.redis.hgetall(inflight).items()} == expected
+
+    # 归还后 alice 的第 4 个 job 才能放行
+    assert scheduler.schedule_once() == 1
+    assert published(ctx)[0][2].headers == {"fair-tenant": "alice", "fair-queue": QUEUE}
+    assert "other" not in ctx.redis.hgetall(inflight)
+
+
+def test_cancelled_jobs_return_their_slots():
+    ctx, runner = _fair_context()
+    _submit(ctx, "alice", 3)
+    assert FairScheduler(ctx, window=16, cap=8).schedule_once() == 3
+    with ctx.scope("task-alice"):
+        ctx.cancel()
+    assert drain(runner) == 3
+    assert ctx.redis.hget(f"runner-fair-inflight:{QUEUE}", "alice") == "0"
+
+
+if __name__ == "__main__":
+    test_weighted_tenants_are_released_in_proportion()
+    test_slots_are_released_under_the_header_tenant()
+    test_cancelled_jobs_return_their_slots()
+    print("ok")
@@ -0,0 +1,18 @@
+import uuid
+
+if __name__ == "__main__":
+    import core
+    from core.Context import Context
+    from coper.basic_ops import Add
+
+    with Context(task_id=str(uuid.uuid4())):
+        add = Add()
+        results = [add(i, i) for i in range(10)]
+
+        # 按完成顺序处理
+        for handle in core.as_completed(results, timeout=60):
+            print(f"{handle} -> {handle.result()}")
+
+        # 一次等待全部结果；再次 .result() 直接命中本地缓存
+        print(core.gather(*results, timeout=60))
+        print(results[0].result())
@@ -0,0 +1,26 @@
+import sys
+import time
+import uuid
+
+if __name__ == "__main__":
+    import core
+    from core.Context import Context
+    from coper.basic_ops import Add, Mul
+
+    # mode="local" 不连接 Redis / RabbitMQ / MinIO / Milvus；传入 distributed 可对比调度开销
+    mode = sys.argv[1] if len(sys.argv) > 1 else "local"
+
+    with Context(task_id=str(uuid.uuid4()), mode=mode):
+        a = Mul()(3, 2)
+        b = Add()(3, 2)
+        c = a + b
+        print(f"{c.result()} {(c * 2).result()}")
+
+        start = time.perf_counter()
+        leaves = [Add()(i, 1) for i in range(200)]
+        total = leaves[0]
+        for leaf in leaves[1:]:
+            # 显式调用算子：``total + leaf`` 会被融合成一个 Fused job，不能体现逐节点的调度开销
+            total = Add()(total, leaf)
+        print(f"{total.result()} {sum(core.gather(*leaves))}")
+        print(f"{mode}: 399 nodes in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,165 @@
+import pytest
+
+from core.DeadLetter import DeadLetter
+from core.Errors import TaskCancelled, UpstreamError
+from core.Runner import Runner
+from core.Utils import deserialize
+
+from fake_middleware import Outer, Value, drain, make_context, published
+
+
+def _field(ctx, task_id, name, exec_id):
+    return ctx.redis.hget(f"runner-node:{task_id}", f"{name}:{exec_id}")
+
+
+def _queued(ctx):
+    return [deserialize(body)["exec_id"] for _, body, _ in published(ctx)]
+
+
+def test_diamond_releases_the_join_once_both_parents_finish():
+    ctx = make_context()
+    with ctx.scope("task-diamond"):
+        runner = Runner()
+        root = Value()(1)
+        left = Value()(root, "left")
+        right = Value()(root, "right")
+        joined = Value()(left, right)
+        assert _field(ctx, "task-diamond", "dep_cnt", joined.exec_id) == "2"
+        assert len(published(ctx)) == 1
+
+        # root 完成后两个分支同时就绪
+        assert drain(runner, limit=1) == 1
+        assert sorted(_queued(ctx)) == sorted([left.exec_id, right.exec_id])
+
+        # 只完成一个父节点：join 仍在等待
+        assert drain(runner, limit=1) == 1
+        assert _field(ctx, "task-diamond", "dep_cnt", joined.exec_id) == "1"
+        assert _field(ctx, "task-diamond", "state", joined.exec_id) == "PENDING"
+        assert _field(ctx, "task-diamond", "t_ready", joined.exec_id) is None
+
+        assert drain(runner, limit=1) == 1
+        assert _field(ctx, "task-diamond", "dep_cnt", joined.exec_id) == "0"
+        assert _field(ctx, "task-diamond", "t_ready", joined.exec_id) is not None
+        assert _queued(ctx) == [joined.exec_id]
+
+        assert drain(runner) == 1
+        assert joined.result(timeout=1) == [[1, "left"], [1, "right"]]
+
+
+def test_failure_cascades_through_finish_pointer():
+    ctx = make_context()
+    with ctx.scope("task-cascade"):
+        runner = Runner()
+        outer = Outer()("fail", "inner broke")
+        child = Value()(outer)
+        grandchild = Value()(child)
+        # outer 返回 inner 的句柄：inner 失败前 outer 一直等待
+        assert drain(runner, limit=1) == 1
+        inner_id = int(_field(ctx, "task-cascade", "inner", outer.exec_id))
+        assert _field(ctx, "task-cascade", "finish_pointer", inner_id) == str(outer.exec_id)
+        assert _field(ctx, "task-cascade", "state", outer.exec_id) == "RUNNING"
+
+        assert drain(runner) == 1
+        for handle in (outer, child, grandchild):
+            assert _field(ctx, "task-cascade", "state", handle.exec_id) == "ERROR"
+            with pytest.raises(UpstreamError) as raised:
+                handle.result(timeout=1)
+            assert raised.value.error["upstream"] == inner_id
+            assert "inner broke" in str(raised.value)
+        cascaded = _field(ctx, "task-cascade", "cascaded", inner_id).split(",")
+        assert sorted(cascaded) == sorted(str(h.exec_id) for h in (outer, child, grandchild))
+        assert not published(ctx)
+
+
+def test_complete_task_reports_an_inner_that_already_failed():
+    ctx = make_context()
+    with ctx.scope("task-inner-failed"):
+        outer = Value()(1)
+        inner = Value()(2)
+    task_key = "runner-node:task-inner-failed"
+    ctx.redis.hset(task_key, f"state:{inner.exec_id}", "ERROR")
+    keys = [task_key, "runner-node-waiters:task-inner-failed", "runner-node-result:task-inner-failed",
+            "runner-node-stream:task-inner-failed"]
+    # Runner 收到 nil 后调用 fail_task 级联 inner 的错误
+    assert ctx.complete_task(keys=keys, args=[outer.exec_id, "", inner.exec_id, "runner-node-done:x"]) is None
+    assert ctx.redis.hget(task_key, f"finish_pointer:{inner.exec_id}") == str(outer.exec_id)
+
+
+def test_result_timeout_expires():
+    ctx = make_context()
+    with ctx.scope("task-timeout"):
+        pending = Value()(1)
+        # fakeredis 在 pipeline 中不阻塞，这里只检查超时后的行为
+        with pytest.raises(TimeoutError):
+            pending.result(timeout=0.2)
+        # 超时不会取走结果：之后执行完成仍能读到
+        drain(Runner())
+        assert pending.result(timeout=1) == 1
+
+
+def test_cancel_while_children_are_queued():
+    ctx = make_context()
+    with ctx.scope("task-cancel"):
+        runner = Runner()
+        root = Value()(1)
+        left = Value()(root)
+        right = Value()(root)
+        joined = Value()(left, right)
+        assert drain(runner, limit=1) == 1
+        assert sorted(_queued(ctx)) == sorted([left.exec_id, right.exec_id])
+
+        # 两个子任务已在队列中，join 尚未就绪：三者都被取消，root 保持完成
+        assert ctx.cancel(reason="user abort") == 3
+        assert ctx.cancel() == 0
+        assert drain(runner) == 2
+        assert not published(ctx)
+        assert len(ctx.channel.acks) == 3
+
+        assert root.result(timeout=1) == 1
+        for handle in (left, right, joined):
+            assert _field(ctx, "task-cancel", "state", handle.exec_id) == "ERROR"
+            with pytest.raises(TaskCancelled) as raised:
+                handle.result(timeout=1)
+            assert raised.value.error["cancelled"] == "user abort"
+            # Runner 出队时跳过：不改为 RUNNING，也不写入第二份错误
+            assert ctx.redis.llen(f"runner-node-result:task-cancel:{handle.exec_id}") == 1
+    # 出队时跳过的 job 不进入死信
+    assert DeadLetter(ctx).entries(task_id="task-cancel") == []
+
+
+def test_deadline_cancels_before_the_node_runs():
+    ctx = make_context()
+    with ctx.scope("task-deadline", deadline=0):
+        runner = Runner()
+        root = Value()(1)
+        child = Value()(root)
+        states = []
+        pubsub = ctx.redis.pubsub()
+        pubsub.subscribe("runner-node-done:task-deadline")
+        pubsub.get_message(timeout=1)
+
+        # 第一个出队的 Runner 发现超时，取消整个任务
+        assert drain(runner) == 1
+        for handle in (root, child):
+            states.append(_field(ctx, "task-deadline", "state", handle.exec_id))
+            assert ctx.redis.llen(f"runner-node-result:task-deadline:{handle.exec_id}") == 1
+            with pytest.raises(TaskCancelled) as raised:
+                handle.result(timeout=1)
+            assert raised.value.error["cancelled"] == "deadline"
+        assert states == ["ERROR", "ERROR"]
+
+        # 每个节点只通知一次完成
+        done = []
+        while (message := pubsub.get_message(timeout=0.1)) is not None:
+            done.append(int(message["data"]))
+        assert sorted(done) == sorted([root.exec_id, child.exec_id])
+
+
+if __name__ == "__main__":
+    test_diamond_releases_the_join_once_both_parents_finish()
+    test_failure_cascades_through_finish_pointer()
+    test_complete_task_reports_an_inner_that_already_failed()
+    test_result_timeout_expires()
+    test_cancel_while_children_are_queued()
+    test_deadline_cancels_before_the_node_runs()
+    print("ok")
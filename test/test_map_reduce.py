@@ -0,0 +1,18 @@
+import uuid
+
+if __name__ == "__main__":
+    import core
+    from core.Context import Context
+    from coper.basic_ops import Add, Multiply, Sum
+
+    with Context(task_id=str(uuid.uuid4())):
+        # 一次批量提交 200 个节点，每 64 个一段
+        squares = Multiply().map(range(200), range(200), chunk_size=64)
+        print(core.gather(*squares[:5], timeout=60))
+
+        # 在 Runner 上逐层归约，调用方只取回根节点的结果
+        total = core.reduce(Sum(), squares, arity=8)
+        print(f"{total.result(timeout=60)} == {sum(i * i for i in range(200))}")
+
+        pairs = core.reduce(Add(), [[i] for i in range(5)])
+        print(pairs.result(timeout=60))
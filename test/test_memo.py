@@ -0,0 +1,30 @@
+from core.Runner import Runner
+
+from fake_middleware import Lookup, drain, make_context
+
+
+def test_failed_call_is_not_cached():
+    ctx = make_context()
+    with ctx.scope("task-first"):
+        runner = Runner()
+        first = Lookup()("embed", 1, [0.5, 0.25])
+        drain(runner)
+        assert first.result(timeout=1) is None
+
+    # 另一个任务的相同调用重新执行，而不是命中缓存中的 None
+    with ctx.scope("task-second"):
+        second = Lookup()("embed", 1, [0.5, 0.25])
+        drain(runner)
+        assert second.result(timeout=1) == [0.5, 0.25]
+
+    # 成功的结果照常缓存：第三次不再调用 compute
+    with ctx.scope("task-third"):
+        third = Lookup()("embed", 1, [0.5, 0.25])
+        drain(runner)
+        assert third.result(timeout=1) == [0.5, 0.25]
+    assert ctx.redis.get("test-lookup:embed") == "2"
+
+
+if __name__ == "__main__":
+    test_failed_call_is_not_cached()
+    print("ok")
@@ -0,0 +1,61 @@
+import pika
+from prometheus_client import generate_latest
+
+from core.Metrics import ClusterCollector
+
+from fake_middleware import make_context
+
+
+class QueueChannel:
+    """Answers passive queue_declare like RabbitMQ: a missing queue closes the channel with 404."""
+
+    def __init__(self, queues):
+        self.queues = queues
+        self.is_open = True
+
+    def queue_declare(self, queue, passive=False, **kwargs):
+        assert passive, "the collector must not create queues"
+        assert self.is_open
+        if queue not in self.queues:
+            self.is_open = False
+            raise pika.exceptions.ChannelClosedByBroker(404, f"NOT_FOUND - no queue '{queue}'")
+        messages, consumers = self.queues[queue]
+
+        class Frame:
+            class method:
+                message_count = messages
+                consumer_count = consumers
+        return Frame
+
+
+def test_cluster_collector_skips_missing_queues():
+    ctx = make_context()
+    existing = {"runner_task_queue": (3, 2), "runner_task_queue.llm": (5, 1)}
+    channels = []
+
+    def channel():
+        channels.append(QueueChannel(existing))
+        return channels[-1]
+
+    ctx.connection.channel = channel
+    # fakeredis 不支持 INFO
+    ctx.redis.info = lambda section: {"used_memory": 1024}
+    collector = ClusterCollector(ctx, queue_classes=["default", "cpu", "llm"], lanes=["default"])
+    collector.collect()
+    text = generate_latest(collector.registry).decode()
+
+    assert 'rabbitmq_queue_messages{queue="runner_task_queue"} 3.0' in text
+    assert 'rabbitmq_queue_messages{queue="runner_task_queue.llm"} 5.0' in text
+    assert 'rabbitmq_queue_consumers{queue="runner_task_queue.llm"} 1.0' in text
+    assert "runner_task_queue.cpu" not in text
+    # cpu 队列不存在时 channel 被关闭，查询 llm 前重新打开
+    assert len(channels) == 2
+
+    existing["runner_task_queue.cpu"] = (0, 4)
+    collector.collect()
+    assert 'rabbitmq_queue_consumers{queue="runner_task_queue.cpu"} 4.0' in generate_latest(collector.registry).decode()
+
+
+if __name__ == "__main__":
+    test_cluster_collector_skips_missing_queues()
+    print("ok")
@@ -0,0 +1,49 @@
+from core.Runner import Runner
+
+from fake_middleware import Value, drain, make_context, published
+
+
+def test_duplicate_publish_runs_the_node_once():
+    ctx = make_context()
+    with ctx.scope("task-dup"):
+        runner = Runner()
+        root = Value()(1)
+        left = Value()(root)
+        right = Value()(root)
+        joined = Value()(left, right)
+        # 发布器重连后重发了未确认的消息：同一个 job 投递两次
+        messages = published(ctx)
+        assert len(messages) == 1
+        messages.append(messages[0])
+
+        assert drain(runner) == 5
+        assert joined.result(timeout=1) == [1, 1]
+
+    task_key = "runner-node:task-dup"
+    for handle in (root, left, right, joined):
+        assert ctx.redis.llen(f"runner-node-result:task-dup:{handle.exec_id}") == 1
+        assert ctx.redis.hget(task_key, f"state:{handle.exec_id}") == "FINISHED"
+    assert ctx.redis.hget(task_key, f"dep_cnt:{joined.exec_id}") == "0"
+    assert len(ctx.channel.acks) == 5
+
+
+def test_complete_task_is_a_no_op_once_finished():
+    ctx = make_context()
+    with ctx.scope("task-dup"):
+        root = Value()(1)
+        child = Value()(root)
+    keys = ["runner-node:task-dup", "runner-node-waiters:task-dup", "runner-node-result:task-dup",
+            "runner-node-stream:task-dup"]
+    args = [root.exec_id, "1", "", "runner-node-done:task-dup"]
+
+    # 同一节点的两份消息被两个 Runner 同时执行：只有先完成的一份生效
+    assert len(ctx.complete_task(keys=keys, args=args)) == 2
+    assert ctx.complete_task(keys=keys, args=args) == []
+    assert ctx.redis.llen(f"runner-node-result:task-dup:{root.exec_id}") == 1
+    assert ctx.redis.hget(keys[0], f"dep_cnt:{child.exec_id}") == "0"
+
+
+if __name__ == "__main__":
+    test_duplicate_publish_runs_the_node_once()
+    test_complete_task_is_a_no_op_once_finished()
+    print("ok")
@@ -0,0 +1,41 @@
+import uuid
+
+from core.ComputableResult import ComputableResult
+from core.Context import Context
+from core.Runner import Runner
+
+from fake_middleware import Handles, Value, drain, make_context, published
+
+
+def test_handles_nested_in_a_dependency_result_are_passed_through():
+    ctx = make_context()
+    with ctx.scope("task-handles"):
+        runner = Runner()
+        handles = Handles()(1, 2)
+        consumer = Value()(handles)
+        assert drain(runner, limit=1) == 1
+
+        # consumer 在两个子任务之前执行：收到的是句柄本身，不读取尚未完成的结果
+        messages = published(ctx)
+        messages.rotate(1)
+        assert drain(runner, limit=1) == 1
+        inner = consumer.result(timeout=1)
+        assert all(isinstance(h, ComputableResult) for h in inner)
+        assert [h.exec_id for h in inner] == [handle.exec_id for handle in handles.result(timeout=1)]
+
+        assert drain(runner) == 2
+        assert [h.result(timeout=1) for h in inner] == [1, 2]
+
+
+def test_local_mode_passes_nested_handles_through():
+    with Context(task_id=str(uuid.uuid4()), mode="local"):
+        handles = Handles()(1, 2)
+        inner = Value()(handles).result(timeout=5)
+        assert all(isinstance(h, ComputableResult) for h in inner)
+        assert [h.result(timeout=5) for h in inner] == [1, 2]
+
+
+if __name__ == "__main__":
+    test_handles_nested_in_a_dependency_result_are_passed_through()
+    test_local_mode_passes_nested_handles_through()
+    print("ok")
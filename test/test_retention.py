@@ -0,0 +1,65 @@
+from core.Runner import Runner
+
+from fake_middleware import Count, Fail, Repeat, Value, drain, make_context
+
+
+def _ttl_ok(ctx, key, retention=600):
+    return 0 < ctx.redis.ttl(key) <= retention
+
+
+def test_keys_created_after_finish_inherit_the_task_ttl():
+    ctx = make_context()
+    with ctx.scope("task-late"):
+        runner = Runner()
+        value = Value()(1)
+        counted = Count()(3)
+        failed = Fail()("late")
+        child = Value()(failed)
+        large = Repeat()("x", 100000)
+        # 调用方已结束任务，节点随后才执行完
+        ctx.finish_task(retention=600)
+        assert drain(runner) == 4
+
+        assert value.result(timeout=1) == 1
+        assert list(counted.stream(timeout=1)) == [0, 1, 2]
+        assert large.result(timeout=1) == "x" * 100000
+
+    keys = [
+        f"runner-node-result:task-late:{value.exec_id}",
+        f"runner-node-result:task-late:{counted.exec_id}",
+        f"runner-node-stream:task-late:{counted.exec_id}",
+        f"runner-node-result:task-late:{failed.exec_id}",
+        f"runner-node-result:task-late:{child.exec_id}",
+        f"runner-node-result:task-late:{large.exec_id}",
+        "runner-blob-index:task-late",
+    ]
+    keys += ctx.redis.keys("runner-blob:task-late:*")
+    assert len(keys) == 8
+    for key in keys:
+        assert _ttl_ok(ctx, key), key
+
+
+def test_cancel_after_finish_inherits_the_task_ttl():
+    ctx = make_context()
+    with ctx.scope("task-cancel-late"):
+        pending = Value()(1)
+        ctx.finish_task(retention=600)
+        assert ctx.cancel() == 1
+    assert _ttl_ok(ctx, f"runner-node-result:task-cancel-late:{pending.exec_id}")
+
+
+def test_unfinished_task_keys_do_not_expire():
+    ctx = make_context()
+    with ctx.scope("task-open"):
+        runner = Runner()
+        counted = Count()(2)
+        drain(runner)
+    assert ctx.redis.ttl(f"runner-node-result:task-open:{counted.exec_id}") == -1
+    assert ctx.redis.ttl(f"runner-node-stream:task-open:{counted.exec_id}") == -1
+
+
+if __name__ == "__main__":
+    test_keys_created_after_finish_inherit_the_task_ttl()
+    test_cancel_after_finish_inherits_the_task_ttl()
+    test_unfinished_task_keys_do_not_expire()
+    print("ok")
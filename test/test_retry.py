@@ -0,0 +1,134 @@
+import time
+
+from core.DeadLetter import DeadLetter
+from core.FairScheduler import FairScheduler
+from core.Runner import Runner
+from core.Utils import deserialize
+
+from fake_middleware import Disconnect, Fail, Flaky, Value, drain, make_context, published
+
+
+def _fair_ready(ctx, tenant, queue="runner_task_queue"):
+    return ctx.redis.lrange(f"runner-fair-ready:{queue}:{tenant}", 0, -1)
+
+
+def test_retried_and_replayed_jobs_return_to_their_tenant():
+    ctx = make_context()
+    ctx.fair_scheduling = True
+    with ctx.scope("task-alice", tenant="alice"):
+        runner = Runner()
+        flaky = Flaky()("alice", 1, "ok")
+        failed = Fail()("permanent")
+        assert len(_fair_ready(ctx, "alice")) == 2
+
+        FairScheduler(ctx).schedule_once()
+        assert drain(runner) == 2
+        assert ctx.redis.zcard("runner-retry") == 1
+
+    # 重试轮询与死信重放运行在其他租户（或没有租户）的上下文中
+    with ctx.scope("task-bob", tenant="bob"):
+        runner._poll_retries()
+        entry_id, _ = DeadLetter(ctx).entries(task_id="task-alice")[0]
+        DeadLetter(ctx).replay(entry_id)
+
+    ready = [deserialize(job) for job in _fair_ready(ctx, "alice")]
+    assert sorted(job["exec_id"] for job in ready) == sorted([flaky.exec_id, failed.exec_id])
+    assert _fair_ready(ctx, "bob") == []
+    assert _fair_ready(ctx, "None") == []
+
+
+def _retry_until_settled(runner):
+    # 重试的 base_delay 为 0：轮询一次即到期
+    while drain(runner) or runner.ctx.redis.zcard("runner-retry"):
+        runner._poll_retries()
+
+
+def test_default_policy_does_not_retry():
+    ctx = make_context()
+    with ctx.scope("task-default"):
+        runner = Runner()
+        handle = Disconnect()()
+        assert drain(runner) == 1
+
+    assert ctx.redis.zcard("runner-retry") == 0
+    assert ctx.redis.hget("runner-node:task-default", f"state:{handle.exec_id}") == "ERROR"
+    assert len(DeadLetter(ctx).entries(task_id="task-default")) == 1
+
+
+def test_retry_due_returns_only_due_pending_jobs():
+    ctx = make_context()
+    with ctx.scope("task:with:colons"):
+        due, cancelled, later = Value()(1), Value()(2), Value()(3)
+    task_key = "runner-node:task:with:colons"
+    ctx.redis.hset(task_key, mapping={
+        f"state:{due.exec_id}": "PENDING",
+        f"state:{cancelled.exec_id}": "ERROR",
+        f"state:{later.exec_id}": "PENDING",
+    })
+    now = time.time()
+    ctx.redis.zadd("runner-retry", {
+        f"task:with:colons:{due.exec_id}": now - 1,
+        f"task:with:colons:{cancelled.exec_id}": now - 1,
+        f"task:with:colons:{later.exec_id}": now + 60,
+        # 任务的 key 已过期
+        "task-expired:0": now - 1,
+    })
+
+    ready = ctx.retry_due(keys=["runner-retry"], args=[f"{now:.6f}", 100])
+    assert len(ready) == 2
+    assert deserialize(ready[1].encode('latin1'))["exec_id"] == due.exec_id
+    assert ctx.redis.zrange("runner-retry", 0, -1) == [f"task:with:colons:{later.exec_id}"]
+    assert ctx.redis.hget(task_key, f"t_ready:{due.exec_id}") is not None
+
+
+def test_delayed_retry_is_requeued_once_due():
+    ctx = make_context()
+    with ctx.scope("task-delay"):
+        runner = Runner()
+        handle = Flaky()("delay", 1, "ok")
+        assert drain(runner) == 1
+        member = f"task-delay:{handle.exec_id}"
+        assert ctx.redis.zscore("runner-retry", member) is not None
+        assert ctx.redis.hget("runner-node:task-delay", f"state:{handle.exec_id}") == "PENDING"
+
+        # 未到期：轮询不重新入队
+        ctx.redis.zadd("runner-retry", {member: time.time() + 60})
+        runner._poll_retries()
+        assert not published(ctx)
+        assert ctx.redis.zcard("runner-retry") == 1
+
+        ctx.redis.zadd("runner-retry", {member: time.time() - 1})
+        runner._poll_retries()
+        assert drain(runner) == 1
+        assert handle.result(timeout=1) == "ok"
+    assert ctx.redis.hget("runner-node:task-delay", f"attempt:{handle.exec_id}") == "1"
+    assert ctx.redis.zcard("runner-retry") == 0
+
+
+def test_replay_restores_cascaded_nodes():
+    ctx = make_context()
+    with ctx.scope("task-replay"):
+        runner = Runner()
+        # 三次执行全部失败后进入死信，第四次（重放）成功
+        flaky = Flaky()("replay", 3, 5)
+        child = Value()(flaky)
+        _retry_until_settled(runner)
+        task_key = "runner-node:task-replay"
+        assert ctx.redis.hget(task_key, f"state:{child.exec_id}") == "ERROR"
+        [(entry_id, entry)] = DeadLetter(ctx).entries(task_id="task-replay")
+        assert entry["attempts"] == "3"
+
+        assert DeadLetter(ctx).replay(entry_id) == 2
+        assert ctx.redis.hget(task_key, f"state:{child.exec_id}") == "PENDING"
+        assert drain(runner) == 2
+        assert child.result(timeout=1) == 5
+    assert DeadLetter(ctx).entries(task_id="task-replay") == []
+
+
+if __name__ == "__main__":
+    test_retried_and_replayed_jobs_return_to_their_tenant()
+    test_default_policy_does_not_retry()
+    test_retry_due_returns_only_due_pending_jobs()
+    test_delayed_retry_is_requeued_once_due()
+    test_replay_restores_cascaded_nodes()
+    print("ok")
@@ -0,0 +1,30 @@
+import pytest
+
+from fake_middleware import Value, make_context
+
+
+def test_scope_finishes_the_task_when_the_body_raises():
+    ctx = make_context()
+    with pytest.raises(ValueError):
+        with ctx.scope("task-raises", finish_on_exit=True):
+            Value()(1)
+            raise ValueError("request failed")
+
+    assert ctx.redis.ttl("runner-node:task-raises") > 0
+    assert ctx.redis.ttl("runner-node-counter:task-raises") > 0
+
+
+def test_scope_leaves_the_task_open_without_finish_on_exit():
+    ctx = make_context()
+    with pytest.raises(ValueError):
+        with ctx.scope("task-open"):
+            Value()(1)
+            raise ValueError("request failed")
+
+    assert ctx.redis.ttl("runner-node:task-open") == -1
+
+
+if __name__ == "__main__":
+    test_scope_finishes_the_task_when_the_body_raises()
+    test_scope_leaves_the_task_open_without_finish_on_exit()
+    print("ok")
@@ -0,0 +1,25 @@
+import time
+import uuid
+
+from core.Computable import Computable
+
+
+class Countdown(Computable):
+    """逐步产出进度，最后返回汇总（分布式模式下 Runner 需能导入算子所在模块，这里使用本地模式）"""
+
+    def compute(self, n):
+        for i in range(n, 0, -1):
+            time.sleep(0.2)
+            yield f"{i}..."
+        return f"done after {n} steps"
+
+
+if __name__ == "__main__":
+    from core.Context import Context
+
+    with Context(task_id=str(uuid.uuid4()), mode="local"):
+        handle = Countdown()(5)
+        # chunk 到达即打印，不等 compute 返回
+        for chunk in handle.stream(timeout=30):
+            print(chunk, flush=True)
+        print(handle.result())